@@ -6,6 +6,7 @@ import time
 
 from protocol import State, Direction
 from facing import Facing
+from movement import MovementEncoder
 from atoms import Position, Velocity, Face
 from observer import Emitter, Listener, Event
 from packet_event import PacketEvent
@@ -42,7 +43,7 @@ class ModelReactor:
         self.stop_emitter = Emitter(StopEvent)
 
         RESPONSE_PACKETS = ('client_command', 'teleport_confirm', 'flying',
-                            'position_look', 'block_dig',
+                            'position', 'look', 'position_look', 'block_dig',
                             'entity_action', 'block_place', 'chat',
                             'use_entity')
 
@@ -63,19 +64,24 @@ class ModelReactor:
         self.position = Position()
         self.velocity = Velocity()
 
+        # a physics.PlayerPhysics, if our movement is simulated (velocity is
+        # just added to the position each tick otherwise)
+        self.physics = None
+        self.on_ground = True
+
+        self.movement = MovementEncoder(self.flying_packet, self.position_packet,
+                                        self.look_packet, self.position_look_packet)
+
         self.last_time = None
-        self.tick_counter = 0
 
         self.game_info = GameInfo()
 
-        self.dig_ticks_remaining = None
+        # effect ID --> amplifier (level - 1) of the status effects we have
+        self.effects = {}
 
         self.respond = True
         self.responder_thread = threading.Thread(target=self.responder)
 
-        # map of (x,z) --> chunk data
-        self.chunks = {}
-
     def stop(self):
 
         # TODO use a queue.Queue for this instead?
@@ -117,54 +123,18 @@ class ModelReactor:
 
             return
 
-        if not self.velocity.stopped and self.tick_counter % 2 == 0:
-
-            pkt = self.position_look_packet()
-            pkt.fields.x = self.position.x + self.velocity.x
-            pkt.fields.y = self.position.y + self.velocity.y
-            pkt.fields.z = self.position.z + self.velocity.z
-            pkt.fields.yaw = self.facing.yaw
-            pkt.fields.pitch = self.facing.pitch
-            pkt.fields.onGround = True
-
-            self.connection.send(pkt)
-
-            self.position.x += self.velocity.x
-            self.position.y += self.velocity.y
-            self.position.z += self.velocity.z
-
-        if self.dig_ticks_remaining is not None:
-
-            self.dig_ticks_remaining -= 1
-
-            if self.dig_ticks_remaining == 0:
+        if self.physics is not None:
 
-                self.dig_ticks_remaining = None
+            self.position = Position(*self.physics.step(*self.position, self.facing.yaw))
 
-                dig = self.block_dig_packet()
+            self.on_ground = self.physics.on_ground
 
-                dig.fields.status = 2
-                dig.fields.location.x = 0
-                dig.fields.location.y = 0
-                dig.fields.location.z = 0
-                dig.fields.face = 0
-                self.connection.send(dig)
+        elif not self.velocity.stopped:
+            self.position = self.position + self.velocity
 
-        if self.tick_counter % 20 == 0:
+        pkt = self.movement.encode(self.position, self.facing, self.on_ground)
 
-            pkt = self.position_look_packet()
-            pkt.fields.x = self.position.x
-            pkt.fields.y = self.position.y
-            pkt.fields.z = self.position.z
-            pkt.fields.yaw = self.facing.yaw
-            pkt.fields.pitch = self.facing.pitch
-            pkt.fields.onGround = True
-            self.connection.send(pkt)
-
-        elif self.tick_counter % 1 == 0:
-
-            pkt = self.flying_packet()
-            pkt.fields.onGround = True
+        if pkt is not None:
             self.connection.send(pkt)
 
     @Listener(PacketEvent, area=State.PLAY, key='login')
@@ -223,14 +193,28 @@ class ModelReactor:
         packet.fields.actionId = 0
         self.connection.send(packet)
 
+    @Listener(PacketEvent, area=State.PLAY, key='entity_effect')
+    def on_entity_effect(self, event):
+
+        fields = event.packet.fields
+
+        if fields.entityId == self.game_info.entity_id:
+            self.effects[fields.effectId] = fields.amplifier
+
+    @Listener(PacketEvent, area=State.PLAY, key='remove_entity_effect')
+    def on_remove_entity_effect(self, event):
+
+        fields = event.packet.fields
+
+        if fields.entityId == self.game_info.entity_id:
+            self.effects.pop(fields.effectId, None)
+
     @Listener(PacketEvent, area=State.PLAY, key='position')
     def on_position(self, event):
 
         packet = event.packet
 
-        self.position.x = packet.fields.x
-        self.position.y = packet.fields.y
-        self.position.z = packet.fields.z
+        self.position = Position(packet.fields.x, packet.fields.y, packet.fields.z)
 
         print('on_position, X: {}, Y: {}, Z: {}, '
               'Yaw: {}, Pitch: {}, teleport ID: {}'.format(
@@ -240,33 +224,25 @@ class ModelReactor:
 
         self.do_stop()
 
+        # make sure the server hears where we are (and where we're looking)
+        self.movement.reset()
+
+        if self.physics is not None:
+            self.physics.reset()
+
         teleport_id = packet.fields.teleportId
 
         tpc = self.teleport_confirm_packet()
         tpc.fields.teleportId = teleport_id
         self.connection.send(tpc)
 
-    @Listener(PacketEvent, area=State.PLAY, key='map_chunk')
-    def on_map_chunk(self, event):
-
-        packet = event.packet
-
-        x, z = packet.fields.x, packet.fields.z
-
-        self.chunks[(x, z)] = packet
-
-    @Listener(PacketEvent, area=State.PLAY, key='unload_chunk')
-    def on_unload_chunk(self, event):
-
-        packet = event.packet
-
-        x, z = packet.fields.chunkX, packet.fields.chunkZ
+    def do_stop(self):
 
-        self.chunks.pop((x, z), None)
+        self.velocity = Velocity()
 
-    def do_stop(self):
+        if self.physics is not None:
+            self.physics.stop()
 
-        self.velocity.reset()
         self.stop_emitter()
 
     def crouch(self):
@@ -291,29 +267,33 @@ class ModelReactor:
 
         self.connection.send(ea)
 
-    def dig(self, target_location):
+    def _send_dig(self, status, location, face):
 
-        if self.dig_ticks_remaining is not None:
-            return
-
-        # start digging
         dig = self.block_dig_packet()
 
-        dig.fields.status = 0
-        dig.fields.location.x = target_location.x
-        dig.fields.location.y = target_location.y
-        dig.fields.location.z = target_location.z
-        # TODO this isn't accurate...but does it need to be?
-        dig.fields.face = 0
+        dig.fields.status = status
+        dig.fields.location.x = location[0]
+        dig.fields.location.y = location[1]
+        dig.fields.location.z = location[2]
+        dig.fields.face = face
 
         self.connection.send(dig)
 
-        # schedule a "stop digging" response
-        # TODO can we figure out how long this should actually be? or can
-        # we wait for a packet from the server and then stop?
-        self.dig_ticks_remaining = 20
+    # the timing of these is up to digging.Digger
+
+    def start_digging(self, location, face=Face.Top):
+
+        self._send_dig(0, location, face)
+
+    def cancel_digging(self, location, face=Face.Top):
+
+        self._send_dig(1, location, face)
+
+    def finish_digging(self, location, face=Face.Top):
+
+        self._send_dig(2, location, face)
 
-    def place_block(self, target_location, face):
+    def place_block(self, target_location, face, cursor=(0.5, 0.5, 0.5)):
 
         assert isinstance(face, Face)
 
@@ -327,9 +307,7 @@ class ModelReactor:
 
         bp.fields.hand = 0
 
-        bp.fields.cursorX = 0.5
-        bp.fields.cursorY = 0.5
-        bp.fields.cursorZ = 0.5
+        bp.fields.cursorX, bp.fields.cursorY, bp.fields.cursorZ = cursor
 
         self.connection.send(bp)
 
@@ -1,8 +1,10 @@
 '''
 '''
 
+from array import array
 import math
 from enum import Enum, IntEnum
+from itertools import repeat
 
 
 class Face(IntEnum):
@@ -44,72 +46,161 @@ class Direction(Enum):
     ED = ('~1', '~-1', '~')
 
 
+_set = object.__setattr__
+
+
 class Vector3:
+    '''An immutable x, y, z.
+
+    Vectors can't be changed once made (so one can be handed to another
+    thread without it changing underneath it), arithmetic makes new ones.
+    '''
+
+    __slots__ = ('x', 'y', 'z')
+
     def __init__(self, x=0.0, y=0.0, z=0.0):
 
-        self.x = x
-        self.y = y
-        self.z = z
+        _set(self, 'x', x)
+        _set(self, 'y', y)
+        _set(self, 'z', z)
+
+    def __setattr__(self, name, value):
+
+        raise AttributeError('{} is immutable'.format(type(self).__name__))
+
+    __delattr__ = __setattr__
+
+    def __reduce__(self):
+
+        return type(self), (self.x, self.y, self.z)
 
     def __str__(self):
 
         return '{:.1f} {:.1f} {:.1f}'.format(self.x, self.y, self.z)
 
+    def __repr__(self):
+
+        return '{}({!r}, {!r}, {!r})'.format(type(self).__name__, self.x, self.y, self.z)
+
+    def __iter__(self):
+
+        yield self.x
+        yield self.y
+        yield self.z
+
+    def __add__(self, other):
+
+        return type(self)(self.x + other.x, self.y + other.y, self.z + other.z)
+
+    def __sub__(self, other):
+
+        return type(self)(self.x - other.x, self.y - other.y, self.z - other.z)
+
     def distance(self, other):
 
         x = other.x - self.x
         y = other.y - self.y
         z = other.z - self.z
 
-        result = math.sqrt((x * x) + (y * y) + (z * z))
+        return math.sqrt((x * x) + (y * y) + (z * z))
 
-        return result
+    def __eq__(self, tgt):
 
-    def reset(self):
+        if not isinstance(tgt, Vector3):
+            return NotImplemented
 
-        self.x = self.y = self.z = 0.0
+        return self.x == tgt.x and self.y == tgt.y and self.z == tgt.z
 
-    def __eq__(self, tgt):
+    def __hash__(self):
 
-        return self.x == tgt.x and self.y == tgt.y and self.z == tgt.z
+        return hash((self.x, self.y, self.z))
 
 
-class Position(Vector3):
-    def impulse(self, dest):
+def _clamp(value):
+
+    if value > 1:
+        return 1.0
+    if value < -1:
+        return -1.0
 
-        values = []
+    return value
 
-        for a, b in ((self.x, dest.x), (self.y, dest.y), (self.z, dest.z)):
 
-            result = b - a
+def _relative(value, arg):
+    '''Return the coordinate arg (absolute or ~relative to value).'''
 
-            if result > 0:
-                result = min(result, 1)
-            else:
-                result = max(result, -1)
+    if not arg.startswith('~'):
+        return int(arg)
 
-            values.append(result)
+    if len(arg) == 1:
+        return value
 
-        return Velocity(*values)
+    return value + int(arg[1:])
+
+
+class Position(Vector3):
+
+    __slots__ = ()
+
+    def impulse(self, dest):
+
+        return Velocity(_clamp(dest.x - self.x), _clamp(dest.y - self.y), _clamp(dest.z - self.z))
 
     @classmethod
     def from_args(clz, current, args):
 
-        values = [current.x, current.y, current.z]
+        if len(args) != 3:
+            raise ValueError('Expected x, y and z but got {}.'.format(' '.join(args)))
 
-        for n in range(0, 3):
-            if args[n].startswith('~'):
-                if len(args[n]) == 1:
-                    continue
-                values[n] += int(args[n][1:])
-            else:
-                values[n] = int(args[n])
-
-        return Position(*values)
+        return clz(*map(_relative, current, args))
 
 
 class Velocity(Vector3):
+
+    __slots__ = ()
+
     @property
     def stopped(self):
 
         return self.x == self.y == self.z == 0.0
+
+
+#
+# batches of positions
+#
+
+class Positions:
+    '''Many positions, kept as a struct-of-arrays (like the EntityManager's)
+    so that the distances to all of them are worked out in one pass over
+    flat arrays of numbers, without making a Position for each.'''
+
+    def __init__(self, positions=()):
+
+        self.xs = array('d')
+        self.ys = array('d')
+        self.zs = array('d')
+
+        for position in positions:
+            self.append(position)
+
+    def __len__(self):
+
+        return len(self.xs)
+
+    def __getitem__(self, index):
+
+        return Position(self.xs[index], self.ys[index], self.zs[index])
+
+    def __iter__(self):
+
+        return map(Position, self.xs, self.ys, self.zs)
+
+    def append(self, position):
+
+        self.xs.append(position.x)
+        self.ys.append(position.y)
+        self.zs.append(position.z)
+
+    def distances(self, origin):
+
+        return array('d', map(math.dist, zip(self.xs, self.ys, self.zs), repeat(tuple(origin))))
@@ -0,0 +1,48 @@
+'''
+Micro benchmarks for the datatype codecs.
+
+Run with: python -m benchmarks.bench_datatypes
+'''
+
+import timeit
+
+import datatypes
+
+
+SAMPLES = (
+    ('varint', 2 ** 28),
+    ('string', 'The quick brown fox jumps over the lazy dog'),
+    ('i16', -1234),
+    ('i32', 123456789),
+    ('i64', -1234567890123),
+    ('f32', 1.5),
+    ('f64', 12345.678),
+    ('bool', True),
+    ('UUID', (0x0123456789abcdef, 0xfedcba9876543210)),
+    ('position', datatypes.Position(-123, 64, 4567)),
+    ('slot', datatypes.Slot(276, 1, 0, nbt=b'\x0a\x00\x00\x01\x00\x01a\x01\x00')),
+)
+
+NUMBER = 100000
+
+
+def main():
+
+    print('{:<10} {:>14} {:>14}'.format('type', 'decode (ns)', 'encode (ns)'))
+
+    for name, value in SAMPLES:
+
+        data_type = datatypes.DATA_TYPE_REGISTRY[name]
+
+        wire = b'\x00\x00' + bytes(data_type.to_wire(value))
+        fullsize = len(wire)
+
+        decode = timeit.timeit(lambda: data_type.from_wire(wire, 2, fullsize), number=NUMBER)
+        encode = timeit.timeit(lambda: data_type.to_wire(value), number=NUMBER)
+
+        print('{:<10} {:>14.0f} {:>14.0f}'.format(name, decode / NUMBER * 1e9, encode / NUMBER * 1e9))
+
+
+if __name__ == '__main__':
+
+    main()
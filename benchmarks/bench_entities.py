@@ -0,0 +1,41 @@
+'''
+Benchmarks the EntityManager spatial queries.
+
+Run with: python -m benchmarks.bench_entities
+'''
+
+import random
+import timeit
+
+from atoms import Position
+from entity_manager import EntityKind, EntityManager
+
+
+NUMBER = 1000
+
+
+def main():
+
+    rng = random.Random(1)
+
+    for count in (1000, 5000):
+
+        entities = EntityManager()
+
+        for entity_id in range(count):
+            entities.add(entity_id, EntityKind.MOB, rng.randint(0, 20),
+                         rng.uniform(-128, 128), rng.uniform(50, 80), rng.uniform(-128, 128))
+
+        origin = Position(0.0, 64.0, 0.0)
+
+        for radius in (8, 32):
+
+            elapsed = timeit.timeit(lambda: entities.nearest(origin, radius, entity_type=5), number=NUMBER)
+
+            print('{:>5} entities, radius {:>2}: nearest() {:8.1f} us'.format(
+                count, radius, elapsed / NUMBER * 1e6))
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,66 @@
+'''
+Benchmarks decoding the NBT files in nbt/test_data.
+
+Run with: python -m benchmarks.bench_nbt
+'''
+
+from array import array
+import glob
+import gzip
+import io
+import os
+import timeit
+
+from nbt import nbt
+
+
+TEST_DATA = os.path.join(os.path.dirname(__file__), '..', 'nbt', 'test_data')
+
+
+def main():
+
+    for filename in sorted(glob.glob(os.path.join(TEST_DATA, '*'))):
+
+        with open(filename, 'rb') as fin:
+            data = fin.read()
+
+        if data[:2] == nbt.GZIP_MAGIC:
+            data = gzip.decompress(data)
+
+        number = max(1, 200000 // len(data))
+
+        decode = timeit.timeit(lambda: nbt.decode(data), number=number) / number
+        skip = timeit.timeit(lambda: nbt.tag_end(data, 0), number=number) / number
+
+        root = nbt.decode(data)[0]
+
+        encode = timeit.timeit(lambda: nbt.encode(root), number=number) / number
+
+        print('{:<20} {:>7} bytes: decode {:9.1f} us ({:6.1f} MB/s), skip {:8.1f} us, encode {:9.1f} us'.format(
+            os.path.basename(filename), len(data), decode * 1e6, len(data) / decode / 1e6, skip * 1e6,
+            encode * 1e6))
+
+    # looking up a single value with a fresh view (as for a new item)
+    data = gzip.decompress(open(os.path.join(TEST_DATA, 'bigtest.nbt'), 'rb').read())
+
+    number = 10000
+
+    query = timeit.timeit(lambda: nbt.view(data).query('nested compound test.egg.name'), number=number) / number
+    decode = timeit.timeit(lambda: nbt.decode(data)[0]['nested compound test']['egg']['name'].value,
+                           number=number) / number
+
+    print('bigtest.nbt path query: view {:6.1f} us, full decode {:6.1f} us'.format(query * 1e6, decode * 1e6))
+
+    # streaming a big long array (i.e. a structure capture) from a buffer
+    values = array('q', range(1000000))
+
+    number = 10
+
+    elapsed = timeit.timeit(lambda: nbt.Writer(io.BytesIO()).write_array('blocks', 12, values), number=number) / number
+
+    print('write_array of 1,000,000 longs: {:6.1f} ms'.format(elapsed * 1e3))
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,76 @@
+'''
+Benchmarks A* over a ChunkManager for 100 and 1000 block paths.
+
+Run with: python -m benchmarks.bench_pathfinding
+'''
+
+import random
+import timeit
+
+from map_chunk import ChunkManager
+from pathfinding import Pathfinder
+
+
+STONE = 1 << 4
+FLOOR = 63
+
+NUMBER = 5
+
+
+def build_world(length, rng):
+    '''A strip of columns 3 chunks wide with a stone floor and a scattering
+    of two block high pillars to walk around.'''
+
+    chunk_manager = ChunkManager()
+
+    for chunk_x in range(-1, length // 16 + 2):
+        for chunk_z in range(-1, 2):
+
+            chunk_manager.get(chunk_x, chunk_z)
+            chunk_manager.set_blocks(chunk_x, chunk_z, [
+                (x, FLOOR, z, STONE) for x in range(16) for z in range(16)
+            ])
+
+    for _ in range(length // 4):
+
+        x = rng.randint(2, length - 2)
+        z = rng.randint(-15, 30)
+
+        chunk_manager.set_block(x, FLOOR + 1, z, STONE)
+        chunk_manager.set_block(x, FLOOR + 2, z, STONE)
+
+    return chunk_manager
+
+
+def main():
+
+    rng = random.Random(1)
+
+    for length in (100, 1000):
+
+        world = build_world(length, rng)
+        pathfinder = Pathfinder(world)
+
+        start = (0, FLOOR + 1, 0)
+        goal = (length, FLOOR + 1, 8)
+
+        path = pathfinder.find_path(start, goal)
+
+        elapsed = timeit.timeit(lambda: pathfinder.find_path(start, goal), number=NUMBER)
+
+        print('{:>4} block path ({} waypoints): find_path() {:8.2f} ms'.format(
+            length, len(path), elapsed / NUMBER * 1e3))
+
+        # replanning after the path is blocked half way along
+        middle = path.waypoints[len(path) // 2]
+
+        world.set_block(middle[0], middle[1], middle[2], STONE)
+
+        elapsed = timeit.timeit(lambda: pathfinder.repair(path, 0), number=NUMBER)
+
+        print('{:>4} block path: repair() {:8.2f} ms'.format(length, elapsed / NUMBER * 1e3))
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,79 @@
+'''
+Benchmarks finding the nearest block of a type with ChunkManager's block
+index, against checking every block within the radius.
+
+Run with: python -m benchmarks.bench_search
+'''
+
+import random
+import timeit
+
+from atoms import Position
+from map_chunk import ChunkManager
+
+
+STONE = 1 << 4
+IRON_ORE = 15 << 4
+
+NUMBER = 10
+
+
+def build_world(rng):
+    '''A 9 x 9 chunk area of stone up to y=63 with some iron ore in it.'''
+
+    chunk_manager = ChunkManager()
+
+    for chunk_x in range(-4, 5):
+        for chunk_z in range(-4, 5):
+
+            chunk_manager.get(chunk_x, chunk_z)
+            chunk_manager.set_blocks(chunk_x, chunk_z, [
+                (x, y, z, STONE) for x in range(16) for y in range(64) for z in range(16)
+            ])
+
+    for _ in range(200):
+        chunk_manager.set_block(rng.randint(-64, 79), rng.randint(0, 63), rng.randint(-64, 79), IRON_ORE)
+
+    return chunk_manager
+
+
+def brute_force(chunk_manager, origin, radius):
+
+    nearest = None
+    best = radius * radius
+
+    ox, oy, oz = int(origin.x), int(origin.y), int(origin.z)
+
+    for x in range(ox - radius, ox + radius + 1):
+        for y in range(max(oy - radius, 0), min(oy + radius, 255) + 1):
+            for z in range(oz - radius, oz + radius + 1):
+
+                if chunk_manager.get_block(x, y, z) >> 4 == IRON_ORE >> 4:
+
+                    distance = (x - ox) ** 2 + (y - oy) ** 2 + (z - oz) ** 2
+
+                    if distance <= best:
+                        nearest = (x, y, z)
+                        best = distance
+
+    return nearest
+
+
+def main():
+
+    chunk_manager = build_world(random.Random(1))
+
+    origin = Position(8.0, 64.0, 8.0)
+
+    for radius in (8, 16, 32):
+
+        indexed = timeit.timeit(lambda: chunk_manager.find_nearest({IRON_ORE >> 4}, origin, radius), number=NUMBER)
+        scanned = timeit.timeit(lambda: brute_force(chunk_manager, origin, radius), number=NUMBER)
+
+        print('radius {:>2}: find_nearest() {:10.1f} us, every block {:10.1f} us'.format(
+            radius, indexed / NUMBER * 1e6, scanned / NUMBER * 1e6))
+
+
+if __name__ == '__main__':
+
+    main()
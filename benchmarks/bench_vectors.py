@@ -0,0 +1,48 @@
+'''
+Benchmarks distances to many positions, one Position at a time and as a
+batch.
+
+Run with: python -m benchmarks.bench_vectors
+'''
+
+import random
+import timeit
+
+from atoms import Position, Positions
+
+
+NUMBER = 200
+
+
+def main():
+
+    rng = random.Random(1)
+
+    origin = Position(0.0, 64.0, 0.0)
+
+    for count in (100, 1000):
+
+        targets = [Position(rng.uniform(-64, 64), rng.uniform(50, 80), rng.uniform(-64, 64))
+                   for _ in range(count)]
+
+        positions = Positions(targets)
+
+        def each():
+
+            for target in targets:
+                origin.distance(target)
+
+        def batch():
+
+            positions.distances(origin)
+
+        for name, function in (('each', each), ('batch', batch)):
+
+            elapsed = timeit.timeit(function, number=NUMBER)
+
+            print('{:>5} positions, {:>5}: {:8.1f} us'.format(count, name, elapsed / NUMBER * 1e6))
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,246 @@
+'''
+'''
+
+from array import array
+import json
+import os
+import sys
+
+import mcdata_cache
+
+# block states are (block ID << 4) | metadata, so this covers all of them
+BLOCK_STATES = 1 << 16
+
+# per block state flags
+SOLID = 1
+PASSABLE = 2
+TRANSPARENT = 4
+
+# translation tables that turn a string of flags into a string of binary
+# digits - int(digits[::-1], 2) then gives a bitmask with bit n set for
+# block n (this lets us build masks without a Python level loop)
+_DIGITS = {
+    flag: b''.join(b'1' if flags & flag else b'0' for flags in range(256))
+    for flag in (SOLID, PASSABLE, TRANSPARENT)
+}
+
+_SOLID_DIGITS = _DIGITS[SOLID]
+_PASSABLE_DIGITS = _DIGITS[PASSABLE]
+
+# what we assume about blocks we know nothing about (stone)
+DEFAULT_HARDNESS = 1.5
+
+# the hardness of blocks that can't be broken (bedrock, barriers...)
+UNBREAKABLE = float('inf')
+
+# blocks without a collision box that shouldn't be walked into
+HAZARDOUS_BLOCK_NAMES = frozenset((
+    'lava',
+    'flowing_lava',
+    'web',
+    'fire',
+    'portal',
+    'end_portal',
+))
+
+# used when minecraft-data isn't available: the IDs (1.11) of the common
+# blocks that can't be stood on, the rest are assumed to be solid
+NON_SOLID_BLOCKS = frozenset((
+    0,       # air
+    6,       # sapling
+    8, 9,    # water
+    10, 11,  # lava
+    27, 28, 30, 31, 32, 37, 38, 39, 40, 50, 51, 55, 59, 63, 65, 66, 68, 69,
+    70, 72, 75, 76, 77, 78, 83, 90, 104, 105, 106, 115, 119, 131, 132, 141,
+    142, 143, 147, 148, 157, 171, 175, 176, 177, 207,
+))
+
+HAZARDOUS_BLOCKS = frozenset((
+    10, 11,  # lava
+    30,      # cobweb
+    51,      # fire
+    90,      # nether portal
+    119,     # end portal
+))
+
+
+class BlockRegistry:
+    '''Per block state properties, loaded from minecraft-data's blocks.json.
+
+    Properties are kept in flat tables indexed by block state (flags and
+    hardness) so that whole slices can be classified with a single map()
+    over their blocks.  Names and materials are interned, and the block ID
+    is the small int used for them everywhere else.
+
+    Building a registry from blocks.json is cached between runs by
+    mcdata_cache, just like the protocol.
+    '''
+
+    # bump this when the registry's attributes change, so that registries
+    # cached by mcdata_cache are rebuilt
+    CACHE_KIND = 'BlockRegistry.1'
+
+    _default = None
+
+    def __init__(self, blocks=()):
+
+        self.blocks = {}
+        self.names = {}
+
+        # block ID --> name / material (for the blocks we know about)
+        self.block_names = {}
+        self.materials = {}
+
+        # block ID --> frozenset of the item IDs that can harvest it (blocks
+        # without an entry can be harvested by hand)
+        self.harvest_tools = {}
+
+        # anything we don't know about is assumed to be solid
+        self.flags = bytearray([SOLID]) * BLOCK_STATES
+
+        self.hardness = array('f', [DEFAULT_HARDNESS]) * BLOCK_STATES
+
+        for block in blocks:
+
+            block_id = block['id']
+            name = sys.intern(block['name'])
+
+            self.blocks[block_id] = block
+            self.names[name] = block
+            self.block_names[block_id] = name
+
+            if block.get('material') is not None:
+                self.materials[block_id] = sys.intern(block['material'])
+
+            if block.get('harvestTools'):
+                self.harvest_tools[block_id] = frozenset(int(item_id) for item_id in block['harvestTools'])
+
+            hardness = block.get('hardness')
+
+            if hardness is None or hardness < 0 or block.get('diggable') is False:
+                hardness = UNBREAKABLE
+
+            self.set_block_type(block_id,
+                                solid=block.get('boundingBox') == 'block',
+                                hazardous=name in HAZARDOUS_BLOCK_NAMES,
+                                transparent=block.get('transparent', False),
+                                hardness=hardness)
+
+    @classmethod
+    def from_minecraft_data(clz, mcdata_base_dir, game_version, cache_directory=mcdata_cache.DEFAULT_DIRECTORY):
+
+        base_path = os.path.join(mcdata_base_dir, 'data', 'pc')
+
+        with open(os.path.join(base_path, game_version, 'version.json'), 'r') as fin:
+            version_data = json.load(fin)
+
+        return mcdata_cache.cached(os.path.join(base_path, version_data['majorVersion'], 'blocks.json'),
+                                   clz.from_file, clz.CACHE_KIND, cache_directory)
+
+    @classmethod
+    def from_file(clz, path):
+
+        with open(path, 'r') as fin:
+            return clz(json.load(fin))
+
+    @classmethod
+    def default(clz):
+        '''A registry built from the built in table of non-solid blocks.'''
+
+        if clz._default is None:
+
+            registry = clz()
+
+            for block_id in NON_SOLID_BLOCKS:
+                registry.set_block_type(block_id, solid=False,
+                                        hazardous=block_id in HAZARDOUS_BLOCKS,
+                                        transparent=True, hardness=0.0)
+
+            clz._default = registry
+
+        return clz._default
+
+    def set_block_type(self, block_id, solid, hazardous=False, transparent=False, hardness=None):
+
+        if solid:
+            flags = SOLID
+        elif hazardous:
+            flags = 0
+        else:
+            flags = PASSABLE
+
+        if transparent:
+            flags |= TRANSPARENT
+
+        base = block_id << 4
+
+        self.flags[base:base + 16] = bytes([flags]) * 16
+
+        if hardness is not None:
+            self.hardness[base:base + 16] = array('f', [hardness]) * 16
+
+    def name(self, block_state):
+        '''Return the name of a block state's block (None if it's unknown).'''
+
+        return self.block_names.get(block_state >> 4)
+
+    def block_id(self, name):
+        '''Return the ID of the named block (None if it's unknown).'''
+
+        block = self.names.get(name)
+
+        return None if block is None else block['id']
+
+    def material(self, block_state):
+
+        return self.materials.get(block_state >> 4)
+
+    def tools_for(self, block_state):
+        '''Return the item IDs that can harvest a block state, or None if it
+        doesn't need a tool.'''
+
+        return self.harvest_tools.get(block_state >> 4)
+
+    def is_solid(self, block_state):
+
+        return self.flags[block_state] & SOLID == SOLID
+
+    def is_passable(self, block_state):
+
+        return self.flags[block_state] & PASSABLE == PASSABLE
+
+    def is_transparent(self, block_state):
+
+        return self.flags[block_state] & TRANSPARENT == TRANSPARENT
+
+    def get_hardness(self, block_state):
+
+        return self.hardness[block_state]
+
+    #
+    # whole slice lookups
+    #
+
+    def flags_of(self, blocks):
+        '''Return the flags for an array of block states, as bytes.'''
+
+        return bytes(map(self.flags.__getitem__, blocks))
+
+    def hardness_of(self, blocks):
+        '''Return the hardness of an array of block states, as an array.'''
+
+        return array('f', map(self.hardness.__getitem__, blocks))
+
+    def mask(self, blocks, flag):
+        '''Return a bitmask with bit n set if blocks[n] has flag.'''
+
+        return int(self.flags_of(blocks).translate(_DIGITS[flag])[::-1], 2)
+
+    def masks(self, blocks):
+        '''Return (solid, passable) bitmasks for an array of block states,
+        with bit n describing blocks[n].'''
+
+        flags = self.flags_of(blocks)
+
+        return (int(flags.translate(_SOLID_DIGITS)[::-1], 2),
+                int(flags.translate(_PASSABLE_DIGITS)[::-1], 2))
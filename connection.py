@@ -140,11 +140,16 @@ class Connection:
                 sb.buffer = zlib.decompress(sb.buffer[data_length_size:],
                                             zlib.MAX_WBITS)
 
+                # the decompressed payload starts with the packet ID
+                data_length_size = 0
+
         # read the packet ID
         packet_id, id_length = VarInt.from_wire(sb.buffer, data_length_size,
                                                 sb.size)
 
+        packet_data = sb.buffer[data_length_size + id_length:]
+
         self.raw_packet_emitter(
             packet_id=packet_id,
-            packet_data=sb.buffer[data_length_size + id_length:],
-            packet_length=sb.size)
+            packet_data=packet_data,
+            packet_length=len(packet_data))
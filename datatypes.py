@@ -1,12 +1,37 @@
 '''
 '''
 
+from array import array
 import struct
 
+from nbt.nbt import tag_end
+
 
 # this gets populated via the class decorators on the DataType subclasses
 DATA_TYPE_REGISTRY = {}
 
+#
+# precompiled structs - these are shared by all of the codecs so that we
+# never have to parse a format string on the hot path
+#
+
+_I8 = struct.Struct('!b')
+_U8 = struct.Struct('!B')
+_I16 = struct.Struct('!h')
+_U16 = struct.Struct('!H')
+_I32 = struct.Struct('!i')
+_U32 = struct.Struct('!I')
+_I64 = struct.Struct('!q')
+_U64 = struct.Struct('!Q')
+_F32 = struct.Struct('!f')
+_F64 = struct.Struct('!d')
+_UUID = struct.Struct('!QQ')
+_SLOT_HEADER = struct.Struct('!hbh')
+_ROTATION = struct.Struct('!fff')
+
+_TRUE = b'\x01'
+_FALSE = b'\x00'
+
 
 def data_type(name):
     '''Decorator that:
@@ -45,6 +70,27 @@ class DataType:
             'from_wire not implemented for {}'.format(cls))
 
 
+class StructDataType(DataType):
+    '''A fixed width data type that is (de)serialized by a single
+    precompiled struct.'''
+
+    STRUCT = None
+
+    @classmethod
+    def default(cls):
+        return 0
+
+    @classmethod
+    def from_wire(cls, data, offset, fullsize):
+
+        return cls.STRUCT.unpack_from(data, offset)[0], cls.STRUCT.size
+
+    @classmethod
+    def to_wire(cls, data):
+
+        return cls.STRUCT.pack(data)
+
+
 @data_type(name='varint')
 class VarInt(DataType):
     @classmethod
@@ -53,30 +99,31 @@ class VarInt(DataType):
 
     @classmethod
     def from_wire(cls, data, offset, fullsize):
-        '''Receives a bytearray and returns an integer.'''
+        '''Receives a bytearray and returns a (signed 32 bit) integer.'''
 
-        acc = []
+        result = 0
+        shift = 0
+        position = offset
 
         while True:
 
-            acc.insert(0, data[offset] & 0x7f)
+            byte = data[position]
+            position += 1
 
-            if data[offset] & 0x80 == 0:
-                break
+            result |= (byte & 0x7f) << shift
 
-            offset += 1
-
-        shifts = (len(acc) - 1) * 7
-
-        data = 0
+            if not byte & 0x80:
+                break
 
-        for x in acc:
+            shift += 7
 
-            data += (x << shifts)
+            if shift > 28:
+                raise ValueError('VarInt at offset {} is too long.'.format(offset))
 
-            shifts -= 7
+        if result & 0x80000000:
+            result -= 0x100000000
 
-        return data, len(acc)
+        return result, position - offset
 
     @classmethod
     def to_wire(cls, data):
@@ -84,17 +131,13 @@ class VarInt(DataType):
 
         acc = bytearray()
 
-        val = data
+        val = data & 0xffffffff
 
         while val > 0x7f:
 
-            seg = val & 0x7f
-
-            rem = val >> 7
-
-            acc.append(seg | 0x80)
+            acc.append((val & 0x7f) | 0x80)
 
-            val = rem
+            val >>= 7
 
         acc.append(val)
 
@@ -113,18 +156,17 @@ class String(DataType):
         # read length as varint
         string_length, varint_length = VarInt.from_wire(data, offset, fullsize)
 
-        # read length bytes and convert to python string
-        value = data[offset + varint_length:
-                     offset + varint_length + string_length]
+        start = offset + varint_length
 
-        value = value.decode()
+        # str() accepts any buffer so memoryviews are decoded without a copy
+        value = str(data[start:start + string_length], 'utf-8')
 
         return value, varint_length + string_length
 
     @classmethod
     def to_wire(cls, data):
 
-        assert isinstance(data, (type(''), type(u'')))
+        assert isinstance(data, str)
 
         retval = bytearray()
 
@@ -137,148 +179,71 @@ class String(DataType):
 
 
 @data_type(name='i8')
-class Int8(DataType):
-    @classmethod
-    def default(cls):
-        return 0
+class Int8(StructDataType):
 
-    @classmethod
-    def from_wire(cls, data, offset, fullsize):
-
-        return struct.unpack('!b', data[offset:offset + 1])[0], 1
-
-    @classmethod
-    def to_wire(cls, data):
-
-        return struct.pack('!b', data)
+    STRUCT = _I8
 
 
 @data_type(name='u8')
-class UnsignedInt8(DataType):
-    @classmethod
-    def default(cls):
-        return 0
+class UnsignedInt8(StructDataType):
 
-    @classmethod
-    def to_wire(cls, data):
-
-        return struct.pack('!B', data)
-
-    @classmethod
-    def from_wire(cls, data, offset, fullsize):
-
-        return struct.unpack('!B', data[offset:offset + 1])[0], 1
+    STRUCT = _U8
 
 
 @data_type(name='u16')
-class UnsignedInt16(DataType):
-    @classmethod
-    def default(cls):
-        return 0
-
-    @classmethod
-    def to_wire(cls, data):
+class UnsignedInt16(StructDataType):
 
-        # NOTE int.to_bytes is python3 specific
-        return data.to_bytes(2, byteorder='big', signed=False)
+    STRUCT = _U16
 
 
 @data_type(name='i16')
-class Int16(DataType):
-    @classmethod
-    def default(cls):
-        return 0
+class Int16(StructDataType):
 
-    @classmethod
-    def from_wire(cls, data, offset, fullsize):
-
-        return int.from_bytes(data[offset:offset + 2], 'big', signed=True), 2
-
-    @classmethod
-    def to_wire(cls, data):
-
-        return data.to_bytes(2, byteorder='big', signed=True)
+    STRUCT = _I16
 
 
 @data_type(name='i32')
-class Int32(DataType):
-    @classmethod
-    def default(cls):
-        return 0
-
-    @classmethod
-    def from_wire(cls, data, offset, fullsize):
-
-        return struct.unpack('!l', data[offset:offset + 4])[0], 4
-
-    @classmethod
-    def to_wire(cls, data):
+class Int32(StructDataType):
 
-        return data.to_bytes(4, byteorder='big', signed=True)
+    STRUCT = _I32
 
 
 @data_type(name='u32')
-class UnsignedInt32(DataType):
-    @classmethod
-    def default(cls):
-        return 0
+class UnsignedInt32(StructDataType):
 
-    @classmethod
-    def from_wire(cls, data, offset, fullsize):
-
-        return struct.unpack('!L', data[offset:offset + 4])[0], 4
-
-    @classmethod
-    def to_wire(cls, data):
-
-        return data.to_bytes(4, byteorder='big', signed=False)
+    STRUCT = _U32
 
 
 @data_type(name='i64')
-class Int64(DataType):
-    @classmethod
-    def default(cls):
-        return 0
+class Int64(StructDataType):
 
-    @classmethod
-    def from_wire(cls, data, offset, fullsize):
-
-        return struct.unpack('!q', data[offset:offset + 8])[0], 8
+    STRUCT = _I64
 
 
 @data_type(name='u64')
-class UnsignedInt64(DataType):
-    @classmethod
-    def default(cls):
-        return 0
+class UnsignedInt64(StructDataType):
 
-    @classmethod
-    def from_wire(cls, data, offset, fullsize):
+    STRUCT = _U64
 
-        return struct.unpack('!Q', data[offset:offset + 8])[0], 8
 
-    @classmethod
-    def to_wire(cls, data):
-
-        return struct.pack('!Q', data)
+@data_type(name='f32')
+class Float32(StructDataType):
 
+    STRUCT = _F32
 
-@data_type(name='entityMetadata')
-class EntityMetadata(DataType):
     @classmethod
     def default(cls):
-        return None
+        return 0.0
 
-    @classmethod
-    def from_wire(cls, data, offset, fullsize):
 
-        # TODO
-        return None, 0
+@data_type(name='f64')
+class Float64(StructDataType):
 
-    @classmethod
-    def to_wire(cls, data):
+    STRUCT = _F64
 
-        raise NotImplementedError()
+    @classmethod
+    def default(cls):
+        return 0.0
 
 
 @data_type(name='slot')
@@ -291,38 +256,45 @@ class Slot(DataType):
     @classmethod
     def from_wire(cls, data, offset, fullsize):
 
-        new_offset = offset
-
-        block_id, consumed = Int16.from_wire(data, new_offset, fullsize)
-        new_offset += consumed
+        block_id = _I16.unpack_from(data, offset)[0]
 
         if block_id == -1:
 
-            return Slot(block_id=block_id), consumed
+            return Slot(block_id=block_id), _I16.size
+
+        block_id, item_count, item_damage = _SLOT_HEADER.unpack_from(data, offset)
 
-        item_count, consumed = Int8.from_wire(data, new_offset, fullsize)
-        new_offset += consumed
+        nbt_offset = offset + _SLOT_HEADER.size
 
-        item_damage, consumed = Int16.from_wire(data, new_offset, fullsize)
-        new_offset += consumed
+        # we don't parse the NBT data - just find where it ends and store
+        # the raw tag until someone actually needs it
 
-        # we don't parse this - just store the raw data until
-        # someone actually needs it
+        end = tag_end(data, nbt_offset)
 
-        nbt_data = data[new_offset:new_offset + (fullsize-new_offset)]
-        new_offset = fullsize
+        nbt_data = None
+
+        if end - nbt_offset > 1:
+            nbt_data = bytes(data[nbt_offset:end])
 
         return Slot(
             block_id=block_id,
             item_count=item_count,
             item_damage=item_damage,
             nbt=nbt_data
-        ), new_offset
+        ), end - offset
 
     @classmethod
     def to_wire(cls, data):
 
-        raise NotImplementedError()
+        if data.block_id == -1:
+            return _I16.pack(-1)
+
+        retval = bytearray(
+            _SLOT_HEADER.pack(data.block_id, data.item_count, data.item_damage))
+
+        retval.extend(data.nbt if data.nbt else _FALSE)
+
+        return retval
 
     def __init__(self, block_id=-1, item_count=None, item_damage=None, nbt=None):
 
@@ -334,59 +306,24 @@ class Slot(DataType):
 
 @data_type(name='UUID')
 class UUID(DataType):
-    @classmethod
-    def default(cls):
-        return (None, None)
-
-    @classmethod
-    def from_wire(cls, data, offset, fullsize):
-
-        lower = struct.unpack('!Q', data[offset:offset + 8])[0], 8
-        upper = struct.unpack('!Q', data[offset:offset + 8])[0], 8
-
-        return (upper, lower), 16
+    '''UUIDs are represented as an (upper, lower) tuple of unsigned
+    64 bit integers.'''
 
-    @classmethod
-    def to_wire(cls, data):
-
-        upper, lower = data
-
-        return struct.pack('!Q', lower)
-        return struct.pack('!Q', upper)
-
-
-@data_type(name='f32')
-class Float32(DataType):
     @classmethod
     def default(cls):
-        return 0.0
+        return (0, 0)
 
     @classmethod
     def from_wire(cls, data, offset, fullsize):
 
-        return struct.unpack('!f', data[offset:offset + 4])[0], 4
+        return _UUID.unpack_from(data, offset), _UUID.size
 
     @classmethod
     def to_wire(cls, data):
 
-        return struct.pack('!f', data)
-
-
-@data_type(name='f64')
-class Float64(DataType):
-    @classmethod
-    def default(cls):
-        return 0.0
-
-    @classmethod
-    def from_wire(cls, data, offset, fullsize):
-
-        return struct.unpack('!d', data[offset:offset + 8])[0], 8
-
-    @classmethod
-    def to_wire(cls, data):
+        upper, lower = data
 
-        return struct.pack('!d', data)
+        return _UUID.pack(upper, lower)
 
 
 @data_type(name='bool')
@@ -398,18 +335,12 @@ class Bool(DataType):
     @classmethod
     def from_wire(cls, data, offset, fullsize):
 
-        if data[offset] == 0x1:
-            return True, 1
-        else:
-            return False, 1
+        return data[offset] != 0, 1
 
     @classmethod
     def to_wire(cls, data):
 
-        if data is True:
-            return b'1'
-        else:
-            return b'0'
+        return _TRUE if data else _FALSE
 
 
 @data_type(name='restBuffer')
@@ -421,7 +352,12 @@ class RestBuffer(DataType):
     @classmethod
     def from_wire(cls, data, offset, fullsize):
 
-        return data[offset:fullsize - offset], fullsize - offset
+        return data[offset:fullsize], fullsize - offset
+
+    @classmethod
+    def to_wire(cls, data):
+
+        return bytes(data)
 
 
 @data_type(name='buffer')
@@ -436,9 +372,10 @@ class Buffer(DataType):
         # read the length (varint)
         buffer_length, varint_length = VarInt.from_wire(data, offset, fullsize)
 
+        start = offset + varint_length
+
         # get the rest of the buffer
-        return data[offset + varint_length:
-                    offset + varint_length + buffer_length], varint_length + buffer_length
+        return data[start:start + buffer_length], varint_length + buffer_length
 
     @classmethod
     def to_wire(cls, data):
@@ -446,26 +383,19 @@ class Buffer(DataType):
         retval = bytearray()
 
         retval.extend(VarInt.to_wire(len(data)))
-        retval.extend([x for x in data])
+        retval.extend(data)
 
         return retval
 
 
 @data_type(name='array')
 class Array(DataType):
-    @classmethod
-    def default(cls):
-        return None
+    '''Arrays are decoded by the TypeCompiler (which knows the count and
+    element types), this just provides the default value.'''
 
     @classmethod
-    def from_wire(cls, data, offset, fullsize):
-
-        # read the length (varint)
-        packet_length, varint_length = VarInt.from_wire(data, offset, fullsize)
-
-        # get the rest of the array
-        return data[offset + varint_length:
-                    packet_length], varint_length + packet_length
+    def default(cls):
+        return []
 
 
 @data_type(name='position')
@@ -477,45 +407,296 @@ class Position(DataType):
     @classmethod
     def to_wire(cls, position):
 
-        x = int(position.x)
-        y = int(position.y)
-        z = int(position.z)
-
-        if x < 0:
-            x = x - (1 << 26)
-
-        if y < 0:
-            y = y - (1 << 12)
-
-        if z < 0:
-            z = z - (1 << 26)
-
-        val = ((x & 0x3FFFFFF) << 38) | ((y & 0xFFF) << 26) | (z & 0x3FFFFFF)
+        x = int(position.x) & 0x3ffffff
+        y = int(position.y) & 0xfff
+        z = int(position.z) & 0x3ffffff
 
-        return UnsignedInt64.to_wire(val)
+        return _U64.pack((x << 38) | (y << 26) | z)
 
     @classmethod
     def from_wire(cls, data, offset, fullsize):
 
-        value, bytes_consumed = UnsignedInt64.from_wire(data, offset, fullsize)
+        value = _U64.unpack_from(data, offset)[0]
 
         x = value >> 38
-        y = (value >> 26) & 0xFFF
+        y = (value >> 26) & 0xfff
         z = value & 0x3ffffff
 
         if x >= (1 << 25):
-            x = x - (1 << 26)
+            x -= (1 << 26)
 
-        if y > (1 << 11):
-            y = y - (1 << 12)
+        if y >= (1 << 11):
+            y -= (1 << 12)
 
-        if z > (1 << 25):
-            z = z - (1 << 26)
+        if z >= (1 << 25):
+            z -= (1 << 26)
 
-        obj = Position(x, y, z)
-
-        return obj, bytes_consumed
+        return Position(x, y, z), _U64.size
 
     def __init__(self, x=0, y=0, z=0):
 
         self.x, self.y, self.z = (x, y, z)
+
+    def __eq__(self, other):
+
+        if not isinstance(other, Position):
+            return NotImplemented
+
+        return (self.x, self.y, self.z) == (other.x, other.y, other.z)
+
+    def __hash__(self):
+
+        return hash((self.x, self.y, self.z))
+
+    def __repr__(self):
+
+        return 'Position({}, {}, {})'.format(self.x, self.y, self.z)
+
+
+class Metadata:
+    '''A lazy view of the entity metadata within a packet.
+
+    Decoding only builds a table of index --> (type, offset) over the raw
+    packet data, the values themselves are decoded (and cached) the first
+    time they are asked for.
+    '''
+
+    __slots__ = ('_data', '_indexes', '_types', '_offsets', '_values')
+
+    def __init__(self, data, indexes, types, offsets):
+
+        self._data = data
+        self._indexes = indexes
+        self._types = types
+        self._offsets = offsets
+        self._values = {}
+
+    def _position(self, index):
+
+        if not 0 <= index < 0xff:
+            return -1
+
+        return self._indexes.find(index)
+
+    def __contains__(self, index):
+
+        return self._position(index) >= 0
+
+    def __getitem__(self, index):
+
+        try:
+            return self._values[index]
+        except KeyError:
+            pass
+
+        position = self._position(index)
+
+        if position < 0:
+            raise KeyError(index)
+
+        value = _METADATA_DECODERS[self._types[position]](
+            self._data, self._offsets[position])
+
+        self._values[index] = value
+
+        return value
+
+    def __len__(self):
+
+        return len(self._indexes)
+
+    def __iter__(self):
+
+        return iter(self._indexes)
+
+    def get(self, index, default=None):
+
+        if index in self:
+            return self[index]
+
+        return default
+
+    def keys(self):
+
+        return list(self._indexes)
+
+    def type_of(self, index):
+        '''Return the metadata type ID of the value at index.'''
+
+        position = self._position(index)
+
+        if position < 0:
+            raise KeyError(index)
+
+        return self._types[position]
+
+    def __repr__(self):
+
+        return 'Metadata({})'.format({index: self[index] for index in self})
+
+
+@data_type(name='entityMetadata')
+class EntityMetadata(DataType):
+    '''Entity metadata is decoded into a lazy Metadata view.
+
+    Type IDs follow the 1.11 numbering:
+
+        0 byte, 1 varint, 2 float, 3 string, 4 chat, 5 slot, 6 boolean,
+        7 rotation, 8 position, 9 optional position, 10 direction,
+        11 optional UUID, 12 optional block ID, 13 NBT
+    '''
+
+    END_OF_METADATA = 0xff
+
+    @classmethod
+    def default(cls):
+        return None
+
+    @classmethod
+    def from_wire(cls, data, offset, fullsize):
+
+        indexes = bytearray()
+        types = bytearray()
+        offsets = array('I')
+
+        position = offset
+
+        while True:
+
+            index = data[position]
+            position += 1
+
+            if index == cls.END_OF_METADATA:
+                break
+
+            # a single unsigned byte in 1.11
+            type_id = data[position]
+            position += 1
+
+            # without knowing its size there's no way to find the next entry
+            if type_id >= len(_METADATA_SKIPPERS):
+                raise ValueError('Unknown entity metadata type {} (index {}) at offset {}'.format(
+                    type_id, index, position - 1))
+
+            indexes.append(index)
+            types.append(type_id)
+            offsets.append(position)
+
+            position = _METADATA_SKIPPERS[type_id](data, position)
+
+        return Metadata(data, indexes, types, offsets), position - offset
+
+
+#
+# entity metadata value codecs, indexed by type ID
+#
+
+
+def _skip_fixed(size):
+
+    def skip(data, offset):
+        return offset + size
+
+    return skip
+
+
+def _skip_varint(data, offset):
+
+    while data[offset] & 0x80:
+        offset += 1
+
+    return offset + 1
+
+
+def _skip_string(data, offset):
+
+    length, consumed = VarInt.from_wire(data, offset, None)
+
+    return offset + consumed + length
+
+
+def _skip_slot(data, offset):
+
+    return offset + Slot.from_wire(data, offset, None)[1]
+
+
+def _skip_optional(size):
+
+    def skip(data, offset):
+        return offset + 1 + (size if data[offset] else 0)
+
+    return skip
+
+
+def _skip_nbt(data, offset):
+
+    return tag_end(data, offset)
+
+
+def _decoder(data_type):
+
+    from_wire = data_type.from_wire
+
+    def decode(data, offset):
+        return from_wire(data, offset, None)[0]
+
+    return decode
+
+
+def _decode_rotation(data, offset):
+
+    return _ROTATION.unpack_from(data, offset)
+
+
+def _optional_decoder(data_type):
+
+    from_wire = data_type.from_wire
+
+    def decode(data, offset):
+
+        if not data[offset]:
+            return None
+
+        return from_wire(data, offset + 1, None)[0]
+
+    return decode
+
+
+def _decode_nbt(data, offset):
+
+    return bytes(data[offset:tag_end(data, offset)])
+
+
+_METADATA_SKIPPERS = (
+    _skip_fixed(1),             # byte
+    _skip_varint,               # varint
+    _skip_fixed(4),             # float
+    _skip_string,               # string
+    _skip_string,               # chat
+    _skip_slot,                 # slot
+    _skip_fixed(1),             # boolean
+    _skip_fixed(_ROTATION.size),  # rotation
+    _skip_fixed(_U64.size),     # position
+    _skip_optional(_U64.size),  # optional position
+    _skip_varint,               # direction
+    _skip_optional(_UUID.size),  # optional UUID
+    _skip_varint,               # optional block ID
+    _skip_nbt,                  # NBT
+)
+
+_METADATA_DECODERS = (
+    _decoder(Int8),
+    _decoder(VarInt),
+    _decoder(Float32),
+    _decoder(String),
+    _decoder(String),
+    _decoder(Slot),
+    _decoder(Bool),
+    _decode_rotation,
+    _decoder(Position),
+    _optional_decoder(Position),
+    _decoder(VarInt),
+    _optional_decoder(UUID),
+    _decoder(VarInt),
+    _decode_nbt,
+)
@@ -0,0 +1,261 @@
+'''
+'''
+
+from collections import deque
+import json
+import math
+import os
+
+from atoms import Face
+import mcdata_cache
+from physics import EYE_HEIGHT
+from raycast import eye
+
+# status effect IDs
+HASTE = 3
+MINING_FATIGUE = 4
+
+# enchantment IDs
+AQUA_AFFINITY = 6
+EFFICIENCY = 32
+
+# mining fatigue slows digging by this much at each level (I, II, III, IV+)
+MINING_FATIGUE_MULTIPLIERS = (0.3, 0.09, 0.0027, 0.00081)
+
+# slots of the player's inventory window
+HELMET_SLOT = 5
+HOTBAR_SLOT = 36
+
+WATER_BLOCKS = frozenset((8, 9))
+
+# used when minecraft-data's materials.json isn't available: how much
+# faster than a hand each tool (1.11 item ID) breaks a block material
+_WOOD, _STONE, _IRON, _DIAMOND, _GOLD = 2.0, 4.0, 6.0, 8.0, 12.0
+
+TOOL_SPEEDS = {
+    'rock': {270: _WOOD, 274: _STONE, 257: _IRON, 278: _DIAMOND, 285: _GOLD},
+    'dirt': {269: _WOOD, 273: _STONE, 256: _IRON, 277: _DIAMOND, 284: _GOLD},
+    'wood': {271: _WOOD, 275: _STONE, 258: _IRON, 279: _DIAMOND, 286: _GOLD},
+    'plant': {268: 1.5, 272: 1.5, 267: 1.5, 276: 1.5, 283: 1.5},
+    'web': {268: 15.0, 272: 15.0, 267: 15.0, 276: 15.0, 283: 15.0, 359: 15.0},
+    'leaves': {359: 15.0},
+    'wool': {359: 5.0},
+}
+
+
+class DigTimer:
+    '''Works out how many ticks it takes to break a block state, the same
+    way the client does: from the block's hardness, whether the held item
+    is the right tool (and its efficiency), haste and mining fatigue, and
+    whether we're under water or in the air.'''
+
+    def __init__(self, registry, tool_speeds=TOOL_SPEEDS):
+
+        self.registry = registry
+
+        # material --> {item ID: speed}
+        self.tool_speeds = tool_speeds
+
+    @classmethod
+    def from_minecraft_data(clz, registry, mcdata_base_dir, game_version):
+
+        base_path = os.path.join(mcdata_base_dir, 'data', 'pc')
+
+        with open(os.path.join(base_path, game_version, 'version.json'), 'r') as fin:
+            version_data = json.load(fin)
+
+        materials_path = os.path.join(base_path, version_data['majorVersion'], 'materials.json')
+
+        if not os.path.exists(materials_path):
+            return clz(registry)
+
+        materials = mcdata_cache.load_json(materials_path)
+
+        return clz(registry, {
+            material: {int(item_id): float(speed) for item_id, speed in speeds.items()}
+            for material, speeds in materials.items()
+        })
+
+    def ticks(self, block_state, item=None, helmet=None, effects=None, in_water=False, on_ground=True):
+        '''Return the number of ticks between starting and finishing digging
+        block_state (0 if it breaks straight away), or None if it can't be
+        broken.'''
+
+        registry = self.registry
+
+        hardness = registry.get_hardness(block_state)
+
+        if math.isinf(hardness):
+            return None
+
+        if hardness <= 0:
+            return 0
+
+        item_id = None if item is None else item.block_id
+
+        speed = self.tool_speeds.get(registry.material(block_state), {}).get(item_id)
+
+        if speed is None:
+            speed = 1.0
+        else:
+
+            efficiency = dict(item.enchantments).get(EFFICIENCY, 0)
+
+            if efficiency > 0:
+                speed += efficiency * efficiency + 1
+
+        if effects:
+
+            if HASTE in effects:
+                speed *= 1.0 + 0.2 * (effects[HASTE] + 1)
+
+            if MINING_FATIGUE in effects:
+                speed *= MINING_FATIGUE_MULTIPLIERS[min(effects[MINING_FATIGUE], 3)]
+
+        if in_water and (helmet is None or AQUA_AFFINITY not in dict(helmet.enchantments)):
+            speed /= 5.0
+
+        if not on_ground:
+            speed /= 5.0
+
+        tools = registry.tools_for(block_state)
+
+        # blocks that need a tool still break without one, just slower
+        if tools is None or item_id in tools:
+            damage = speed / hardness / 30.0
+        else:
+            damage = speed / hardness / 100.0
+
+        if damage >= 1.0:
+            return 0
+
+        return math.ceil(1.0 / damage)
+
+
+class Digger:
+    '''Breaks a queue of blocks, one after another.
+
+    Each dig is finished on exactly the tick the block breaks, and the next
+    one is started in that same tick, so no ticks are spent idle between
+    blocks.  Blocks that break instantly only need starting.  Call tick()
+    once per game tick.
+
+    tick() can be given a tasks.Budget to pay for the packets it sends; a
+    dig that can't be paid for waits for the next tick.
+    '''
+
+    def __init__(self, model, inventory, world, timer, raycaster=None):
+
+        self.model = model
+        self.inventory = inventory
+        self.world = world
+        self.timer = timer
+
+        # a raycast.Raycaster, to dig at the face of the block we can see
+        self.raycaster = raycaster
+
+        self.queue = deque()
+
+        # (x, y, z), face, ticks until it breaks
+        self.current = None
+
+    @property
+    def busy(self):
+
+        return self.current is not None or len(self.queue) > 0
+
+    def dig(self, target):
+        '''Queue the block at target (a Position or x, y, z) to be broken.'''
+
+        try:
+            x, y, z = target.x, target.y, target.z
+        except AttributeError:
+            x, y, z = target
+
+        self.queue.append((math.floor(x), math.floor(y), math.floor(z)))
+
+    def cancel(self):
+
+        if self.current is not None:
+            self.model.cancel_digging(*self.current[:2])
+
+        self.current = None
+        self.queue.clear()
+
+    def held_item(self):
+
+        return self.inventory.slots.get(HOTBAR_SLOT + self.inventory.active_hotbar_slot)
+
+    def dig_ticks(self, location):
+        '''Return how long the block at location will take to break (None if
+        there's nothing there that can be broken).'''
+
+        block_state = self.world.get_block(*location)
+
+        if not block_state:
+            return None
+
+        position = self.model.position
+
+        head = self.world.get_block(math.floor(position.x), math.floor(position.y + EYE_HEIGHT), math.floor(position.z))
+
+        return self.timer.ticks(block_state,
+                                item=self.held_item(),
+                                helmet=self.inventory.slots.get(HELMET_SLOT),
+                                effects=self.model.effects,
+                                in_water=head is not None and head >> 4 in WATER_BLOCKS,
+                                on_ground=self.model.on_ground)
+
+    def face(self, location):
+        '''Return the face of the block at location to dig at: one we can
+        see, or the top if we can't see any.'''
+
+        if self.raycaster is not None:
+
+            hit = self.raycaster.reach(eye(self.model.position), location)
+
+            if hit is not None:
+                return hit.face
+
+        return Face.Top
+
+    def tick(self, budget=None):
+
+        if self.current is not None:
+
+            location, face, remaining = self.current
+
+            remaining -= 1
+
+            if remaining > 0 or (budget is not None and not budget.spend()):
+                self.current = (location, face, remaining)
+                return
+
+            self.model.finish_digging(location, face)
+
+            self.current = None
+
+        while self.queue:
+
+            location = self.queue[0]
+
+            ticks = self.dig_ticks(location)
+
+            if ticks is None:
+                self.queue.popleft()
+                continue
+
+            if budget is not None and not budget.spend():
+                return
+
+            self.queue.popleft()
+
+            face = self.face(location)
+
+            self.model.start_digging(location, face)
+
+            if ticks > 0:
+                self.current = (location, face, ticks)
+
+            # start at most one block per tick
+            return
@@ -0,0 +1,491 @@
+'''
+'''
+
+from array import array
+from enum import IntEnum
+import math
+import threading
+
+from observer import Listener
+from packet_event import PacketEvent
+from protocol import State
+
+
+class EntityKind(IntEnum):
+    '''The spawn packet that introduced an entity - entity type IDs are only
+    unique within a kind (i.e. object type 1 is a boat, mob type 1 is an
+    item).'''
+
+    OBJECT = 0
+    MOB = 1
+    PLAYER = 2
+    EXPERIENCE_ORB = 3
+    PAINTING = 4
+
+
+class EntityManager:
+    '''Tracks the entities around the robot.
+
+    Entities are stored as a struct-of-arrays (one array per attribute,
+    indexed by slot) so that queries only touch flat arrays of numbers, and
+    are bucketed into a uniform grid of CELL_SIZE x CELL_SIZE columns so that
+    range queries only look at the cells that overlap the search area.
+    '''
+
+    CELL_SIZE = 16
+
+    # relative moves are in 1/4096ths of a block and velocities are in
+    # 1/8000ths of a block per tick
+    RELATIVE_MOVE_SCALE = 1 / 4096
+    VELOCITY_SCALE = 1 / 8000
+
+    def __init__(self):
+
+        self._lock = threading.Lock()
+
+        self.clear()
+
+        # map of (chunk_x, chunk_z) --> list of raw block entity NBT data
+        self.block_entities = {}
+
+    def clear(self):
+
+        self.ids = array('i')
+        self.kinds = array('b')
+        self.types = array('i')
+
+        self.xs = array('d')
+        self.ys = array('d')
+        self.zs = array('d')
+
+        self.vxs = array('d')
+        self.vys = array('d')
+        self.vzs = array('d')
+
+        # entity ID --> slot
+        self._slots = {}
+
+        # (cell_x, cell_z) --> set of entity IDs
+        self._cells = {}
+
+        # entity ID --> {metadata index --> Metadata view holding the value}
+        self._metadata = {}
+
+    def __len__(self):
+
+        return len(self.ids)
+
+    def __contains__(self, entity_id):
+
+        return entity_id in self._slots
+
+    def _cell(self, x, z):
+
+        return (math.floor(x / self.CELL_SIZE), math.floor(z / self.CELL_SIZE))
+
+    #
+    # updates
+    #
+
+    def add(self, entity_id, kind, entity_type, x, y, z, vx=0.0, vy=0.0, vz=0.0):
+
+        with self._lock:
+
+            if entity_id in self._slots:
+                self._remove(entity_id)
+
+            self._slots[entity_id] = len(self.ids)
+
+            self.ids.append(entity_id)
+            self.kinds.append(kind)
+            self.types.append(entity_type)
+
+            self.xs.append(x)
+            self.ys.append(y)
+            self.zs.append(z)
+
+            self.vxs.append(vx)
+            self.vys.append(vy)
+            self.vzs.append(vz)
+
+            self._cells.setdefault(self._cell(x, z), set()).add(entity_id)
+
+    def remove(self, entity_id):
+
+        with self._lock:
+            self._remove(entity_id)
+
+    def _remove(self, entity_id):
+
+        slot = self._slots.pop(entity_id, None)
+
+        if slot is None:
+            return
+
+        cell = self._cell(self.xs[slot], self.zs[slot])
+        members = self._cells[cell]
+        members.discard(entity_id)
+
+        if not members:
+            del self._cells[cell]
+
+        self._metadata.pop(entity_id, None)
+
+        # move the last entity into the vacated slot so the arrays stay dense
+        last = len(self.ids) - 1
+
+        if slot != last:
+
+            moved_id = self.ids[last]
+            self._slots[moved_id] = slot
+
+            for column in (self.ids, self.kinds, self.types, self.xs, self.ys,
+                           self.zs, self.vxs, self.vys, self.vzs):
+                column[slot] = column[last]
+
+        for column in (self.ids, self.kinds, self.types, self.xs, self.ys,
+                       self.zs, self.vxs, self.vys, self.vzs):
+            del column[last]
+
+    def move(self, entity_id, x, y, z):
+
+        with self._lock:
+            self._move(entity_id, x, y, z)
+
+    def move_relative(self, entity_id, dx, dy, dz):
+
+        with self._lock:
+
+            slot = self._slots.get(entity_id)
+
+            if slot is not None:
+                self._move(entity_id, self.xs[slot] + dx, self.ys[slot] + dy, self.zs[slot] + dz)
+
+    def _move(self, entity_id, x, y, z):
+
+        slot = self._slots.get(entity_id)
+
+        if slot is None:
+            return
+
+        old_cell = self._cell(self.xs[slot], self.zs[slot])
+        new_cell = self._cell(x, z)
+
+        if old_cell != new_cell:
+
+            members = self._cells[old_cell]
+            members.discard(entity_id)
+
+            if not members:
+                del self._cells[old_cell]
+
+            self._cells.setdefault(new_cell, set()).add(entity_id)
+
+        self.xs[slot] = x
+        self.ys[slot] = y
+        self.zs[slot] = z
+
+    def set_velocity(self, entity_id, vx, vy, vz):
+
+        with self._lock:
+
+            slot = self._slots.get(entity_id)
+
+            if slot is not None:
+                self.vxs[slot] = vx
+                self.vys[slot] = vy
+                self.vzs[slot] = vz
+
+    def update_metadata(self, entity_id, metadata):
+
+        with self._lock:
+
+            if entity_id not in self._slots or metadata is None:
+                return
+
+            values = self._metadata.setdefault(entity_id, {})
+
+            for index in metadata:
+                values[index] = metadata
+
+    #
+    # queries
+    #
+
+    def position(self, entity_id):
+
+        slot = self._slots[entity_id]
+
+        return (self.xs[slot], self.ys[slot], self.zs[slot])
+
+    def entity_type(self, entity_id):
+
+        slot = self._slots[entity_id]
+
+        return (EntityKind(self.kinds[slot]), self.types[slot])
+
+    def metadata(self, entity_id, index, default=None):
+
+        view = self._metadata.get(entity_id, {}).get(index)
+
+        if view is None:
+            return default
+
+        return view[index]
+
+    def within(self, origin, radius, entity_type=None, kind=None):
+        '''Return a list of (distance, entity ID) for all of the entities
+        within radius of origin (nearest first), optionally restricted to
+        a kind and/or type.'''
+
+        ox, oy, oz = origin.x, origin.y, origin.z
+        radius_squared = radius * radius
+
+        min_cx, min_cz = self._cell(ox - radius, oz - radius)
+        max_cx, max_cz = self._cell(ox + radius, oz + radius)
+
+        results = []
+
+        with self._lock:
+
+            xs, ys, zs = self.xs, self.ys, self.zs
+            kinds, types = self.kinds, self.types
+            slots = self._slots
+            cells = self._cells
+
+            for cx in range(min_cx, max_cx + 1):
+                for cz in range(min_cz, max_cz + 1):
+
+                    members = cells.get((cx, cz))
+
+                    if not members:
+                        continue
+
+                    for entity_id in members:
+
+                        slot = slots[entity_id]
+
+                        if kind is not None and kinds[slot] != kind:
+                            continue
+
+                        if entity_type is not None and types[slot] != entity_type:
+                            continue
+
+                        dx = xs[slot] - ox
+                        dy = ys[slot] - oy
+                        dz = zs[slot] - oz
+
+                        distance_squared = dx * dx + dy * dy + dz * dz
+
+                        if distance_squared <= radius_squared:
+                            results.append((distance_squared, entity_id))
+
+        results.sort()
+
+        return [(math.sqrt(distance_squared), entity_id) for distance_squared, entity_id in results]
+
+    def nearest(self, origin, radius, entity_type=None, kind=None):
+        '''Return the ID of the nearest matching entity within radius of
+        origin (or None).'''
+
+        ox, oy, oz = origin.x, origin.y, origin.z
+
+        min_cx, min_cz = self._cell(ox - radius, oz - radius)
+        max_cx, max_cz = self._cell(ox + radius, oz + radius)
+
+        size = self.CELL_SIZE
+
+        # the cells that overlap the search area, by how far away their
+        # nearest edge is, so the closest entities are usually seen first
+        # and the cells further away than them can be skipped
+        by_distance = []
+
+        for cx in range(min_cx, max_cx + 1):
+
+            gap_x = max(cx * size - ox, 0.0, ox - (cx + 1) * size)
+
+            for cz in range(min_cz, max_cz + 1):
+
+                gap_z = max(cz * size - oz, 0.0, oz - (cz + 1) * size)
+
+                by_distance.append((gap_x * gap_x + gap_z * gap_z, cx, cz))
+
+        by_distance.sort()
+
+        # the closest so far (ties go to the lowest ID, as with within)
+        limit = radius * radius
+        nearest = None
+
+        with self._lock:
+
+            xs, ys, zs = self.xs, self.ys, self.zs
+            kinds, types = self.kinds, self.types
+            slots = self._slots
+            cells = self._cells
+
+            for gap, cx, cz in by_distance:
+
+                if gap > limit:
+                    break
+
+                members = cells.get((cx, cz))
+
+                if not members:
+                    continue
+
+                for entity_id in members:
+
+                    slot = slots[entity_id]
+
+                    if kind is not None and kinds[slot] != kind:
+                        continue
+
+                    if entity_type is not None and types[slot] != entity_type:
+                        continue
+
+                    dx = xs[slot] - ox
+                    dy = ys[slot] - oy
+                    dz = zs[slot] - oz
+
+                    distance_squared = dx * dx + dy * dy + dz * dz
+
+                    if distance_squared > limit:
+                        continue
+
+                    if distance_squared < limit or nearest is None or entity_id < nearest:
+                        limit = distance_squared
+                        nearest = entity_id
+
+        return nearest
+
+    #
+    # block entities
+    #
+
+    def set_block_entities(self, chunk_x, chunk_z, block_entities):
+
+        self.block_entities[(chunk_x, chunk_z)] = list(block_entities or [])
+
+    def remove_block_entities(self, chunk_x, chunk_z):
+
+        self.block_entities.pop((chunk_x, chunk_z), None)
+
+    #
+    # packet handlers
+    #
+
+    @Listener(PacketEvent, area=State.PLAY, key='login')
+    def on_login(self, event):
+
+        with self._lock:
+            self.clear()
+
+        self.block_entities = {}
+
+    @Listener(PacketEvent, area=State.PLAY, key='respawn')
+    def on_respawn(self, event):
+
+        with self._lock:
+            self.clear()
+
+        self.block_entities = {}
+
+    @Listener(PacketEvent, area=State.PLAY, key='unload_chunk')
+    def on_unload_chunk(self, event):
+
+        fields = event.packet.fields
+
+        self.remove_block_entities(fields.chunkX, fields.chunkZ)
+
+    @Listener(PacketEvent, area=State.PLAY, key='spawn_entity')
+    def on_spawn_entity(self, event):
+
+        fields = event.packet.fields
+        scale = self.VELOCITY_SCALE
+
+        self.add(fields.entityId, EntityKind.OBJECT, fields.type,
+                 fields.x, fields.y, fields.z,
+                 fields.velocityX * scale, fields.velocityY * scale, fields.velocityZ * scale)
+
+    @Listener(PacketEvent, area=State.PLAY, key='spawn_entity_living')
+    def on_spawn_entity_living(self, event):
+
+        fields = event.packet.fields
+        scale = self.VELOCITY_SCALE
+
+        self.add(fields.entityId, EntityKind.MOB, fields.type,
+                 fields.x, fields.y, fields.z,
+                 fields.velocityX * scale, fields.velocityY * scale, fields.velocityZ * scale)
+
+        self.update_metadata(fields.entityId, fields.metadata)
+
+    @Listener(PacketEvent, area=State.PLAY, key='named_entity_spawn')
+    def on_named_entity_spawn(self, event):
+
+        fields = event.packet.fields
+
+        self.add(fields.entityId, EntityKind.PLAYER, 0, fields.x, fields.y, fields.z)
+
+        self.update_metadata(fields.entityId, fields.metadata)
+
+    @Listener(PacketEvent, area=State.PLAY, key='spawn_entity_experience_orb')
+    def on_spawn_entity_experience_orb(self, event):
+
+        fields = event.packet.fields
+
+        self.add(fields.entityId, EntityKind.EXPERIENCE_ORB, 0, fields.x, fields.y, fields.z)
+
+    @Listener(PacketEvent, area=State.PLAY, key='spawn_entity_painting')
+    def on_spawn_entity_painting(self, event):
+
+        fields = event.packet.fields
+        location = fields.location
+
+        self.add(fields.entityId, EntityKind.PAINTING, 0, location.x, location.y, location.z)
+
+    @Listener(PacketEvent, area=State.PLAY, key='entity_destroy')
+    def on_entity_destroy(self, event):
+
+        with self._lock:
+
+            for entity_id in event.packet.fields.entityIds:
+                self._remove(entity_id)
+
+    @Listener(PacketEvent, area=State.PLAY, key='rel_entity_move')
+    def on_rel_entity_move(self, event):
+
+        fields = event.packet.fields
+        scale = self.RELATIVE_MOVE_SCALE
+
+        self.move_relative(fields.entityId, fields.dX * scale, fields.dY * scale, fields.dZ * scale)
+
+    @Listener(PacketEvent, area=State.PLAY, key='entity_move_look')
+    def on_entity_move_look(self, event):
+
+        fields = event.packet.fields
+        scale = self.RELATIVE_MOVE_SCALE
+
+        self.move_relative(fields.entityId, fields.dX * scale, fields.dY * scale, fields.dZ * scale)
+
+    @Listener(PacketEvent, area=State.PLAY, key='entity_teleport')
+    def on_entity_teleport(self, event):
+
+        fields = event.packet.fields
+
+        self.move(fields.entityId, fields.x, fields.y, fields.z)
+
+    @Listener(PacketEvent, area=State.PLAY, key='entity_velocity')
+    def on_entity_velocity(self, event):
+
+        fields = event.packet.fields
+        scale = self.VELOCITY_SCALE
+
+        self.set_velocity(fields.entityId, fields.velocityX * scale,
+                          fields.velocityY * scale, fields.velocityZ * scale)
+
+    @Listener(PacketEvent, area=State.PLAY, key='entity_metadata')
+    def on_entity_metadata(self, event):
+
+        fields = event.packet.fields
+
+        self.update_metadata(fields.entityId, fields.metadata)
@@ -1,6 +1,23 @@
 import math
 
 
+def _angles(dx, dy, dz):
+    '''Return the yaw and pitch of looking along dx, dy, dz.'''
+
+    #
+    # adapted from: http://wiki.vg/Protocol#Player_Look
+    #
+
+    r = math.sqrt(dx * dx + dy * dy + dz * dz)
+
+    yaw = math.degrees(-1.0 * math.atan2(dx, dz))
+    if yaw < 0.0:
+        yaw = yaw + 360.0
+    pitch = math.degrees(-math.asin(dy / r))
+
+    return yaw, pitch
+
+
 class Facing:
     def __init__(self, pitch=0.0, yaw=0.0):
 
@@ -12,19 +29,4 @@ class Facing:
         if current == target:
             return
 
-        #
-        # adapted from: http://wiki.vg/Protocol#Player_Look
-        #
-
-        dx = target.x - current.x
-        dy = target.y - current.y
-        dz = target.z - current.z
-        r = math.sqrt(dx * dx + dy * dy + dz * dz)
-
-        yaw = math.degrees(-1.0 * math.atan2(dx, dz))
-        if yaw < 0.0:
-            yaw = yaw + 360.0
-        pitch = math.degrees(-math.asin(dy / r))
-
-        self.yaw = yaw
-        self.pitch = pitch
+        self.yaw, self.pitch = _angles(target.x - current.x, target.y - current.y, target.z - current.z)
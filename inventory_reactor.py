@@ -1,20 +1,293 @@
 '''
 '''
 
+from array import array
+from collections import Counter, deque
+from collections.abc import Mapping
+
+from datatypes import Slot
 from observer import Listener
 from packet_event import PacketEvent
 from protocol import State, Direction
 from item import Item
 
+PLAYER_WINDOW = 0
+
+# the player's own window: crafting output and grid, armour, the main
+# inventory, the hotbar and the off hand
+PLAYER_WINDOW_SIZE = 46
+PLAYER_MAIN_SLOT = 9
+PLAYER_SLOTS = 36
+HOTBAR_SLOTS = 9
+
+# set_slot's window and slot for the item held by the cursor
+CURSOR_WINDOW = -1
+CURSOR_SLOT = -1
+
+# clicking this slot drops the item held by the cursor
+OUTSIDE_SLOT = -999
+
+# window_click modes
+PICKUP = 0
+SWAP = 2
+THROW = 4
+
+MAX_STACK = 64
+
+# how many clicks can be waiting for the server to confirm them
+MAX_PENDING_CLICKS = 8
+
+
+class Window:
+    '''The slots of a window (the player's inventory, a chest, ...).
+
+    Slots are kept as compact arrays of item IDs (-1 for empty), counts and
+    damage values, with the NBT data of the few items that have any kept to
+    one side, and a running total of each item ID so how many of something
+    the window holds is a lookup.  Items are only made when asked for.
+    '''
+
+    def __init__(self, window_id, size, kind=None, title=None, stack_sizes=None):
+
+        self.window_id = window_id
+        self.kind = kind
+        self.title = title
+
+        # item ID --> how many fit in a slot (MAX_STACK if it isn't there)
+        self.stack_sizes = stack_sizes or {}
+
+        self.ids = array('h', [-1]) * size
+        self.counts = array('h', bytes(2 * size))
+        self.damages = array('h', bytes(2 * size))
+
+        # slot --> NBT data
+        self.data = {}
+
+        # item ID --> how many there are
+        self.totals = Counter()
+
+        self.next_action = 1
+
+    def __len__(self):
+
+        return len(self.ids)
+
+    @property
+    def player_offset(self):
+        '''The first of the player's main inventory slots (followed by the
+        hotbar), which come after the window's own slots in every window
+        other than the player's.'''
+
+        if self.window_id == PLAYER_WINDOW:
+            return PLAYER_MAIN_SLOT
+
+        return len(self.ids) - PLAYER_SLOTS
+
+    def load(self, slots):
+        '''Replace every slot from a list of datatypes.Slot (as sent in
+        window_items).'''
+
+        self.ids = array('h', [slot.block_id for slot in slots])
+        self.counts = array('h', [0 if slot.block_id == -1 else slot.item_count for slot in slots])
+        self.damages = array('h', [0 if slot.block_id == -1 else slot.item_damage for slot in slots])
+
+        self.data = {index: slot.nbt for index, slot in enumerate(slots) if slot.block_id != -1 and slot.nbt}
+
+        self.totals = Counter()
+
+        for item_id, count in zip(self.ids, self.counts):
+            if item_id != -1:
+                self.totals[item_id] += count
+
+    def set(self, slot, item_id, count=0, damage=0, data=None):
+        '''Set a slot (item_id -1 empties it).'''
+
+        old = self.ids[slot]
+
+        if old != -1:
+
+            self.totals[old] -= self.counts[slot]
+
+            if not self.totals[old]:
+                del self.totals[old]
+
+        if item_id == -1 or count <= 0:
+            item_id, count, damage, data = -1, 0, 0, None
+        else:
+            self.totals[item_id] += count
+
+        self.ids[slot] = item_id
+        self.counts[slot] = count
+        self.damages[slot] = damage
+
+        if data:
+            self.data[slot] = data
+        else:
+            self.data.pop(slot, None)
+
+    def set_item(self, slot, item):
+
+        if item is None:
+            self.set(slot, -1)
+        else:
+            self.set(slot, item.block_id, item.count, item.damage, item.data)
+
+    def get(self, slot):
+        '''Return the Item in a slot (None if it's empty).'''
+
+        item_id = self.ids[slot]
+
+        if item_id == -1:
+            return None
+
+        return Item(block_id=item_id, count=self.counts[slot], damage=self.damages[slot], data=self.data.get(slot))
+
+    def count(self, item_id, damage=None):
+        '''Return how many of an item (with any damage value, unless one is
+        given) the window holds.'''
+
+        if damage is None:
+            return self.totals.get(item_id, 0)
+
+        return sum(self.counts[slot] for slot in self.find(item_id) if self.damages[slot] == damage)
+
+    def find(self, item_id):
+        '''Return the slots holding an item.'''
+
+        ids = self.ids
+
+        return [slot for slot in range(len(ids)) if ids[slot] == item_id] if item_id in self.totals else []
+
+    def occupied(self):
+
+        ids = self.ids
+
+        return [slot for slot in range(len(ids)) if ids[slot] != -1]
+
+    def _stacks_with(self, slot, item):
+
+        return (self.ids[slot] == item.block_id and self.damages[slot] == item.damage and
+                self.data.get(slot) == (item.data or None))
+
+    def click(self, slot, button, mode, cursor):
+        '''Apply a click the way the server will, returning what's held by
+        the cursor afterwards.'''
+
+        if mode == SWAP:
+
+            # swap with hotbar slot number button
+            hotbar = self.player_offset + PLAYER_SLOTS - HOTBAR_SLOTS + button
+
+            item, other = self.get(slot), self.get(hotbar)
+
+            self.set_item(slot, other)
+            self.set_item(hotbar, item)
+
+            return cursor
+
+        if mode == THROW:
+
+            if self.ids[slot] != -1:
+                count = 0 if button == 1 else self.counts[slot] - 1
+                self.set(slot, self.ids[slot], count, self.damages[slot], self.data.get(slot))
+
+            return cursor
+
+        if slot == OUTSIDE_SLOT:
+
+            if cursor is None or button == 0 or cursor.count == 1:
+                return None
+
+            return Item(cursor.block_id, cursor.count - 1, cursor.damage, cursor.data)
+
+        item = self.get(slot)
+
+        if cursor is None:
+
+            if item is None:
+                return None
+
+            # pick up all (or half, rounding up)
+            taken = item.count if button == 0 else (item.count + 1) // 2
+
+            self.set(slot, item.block_id, item.count - taken, item.damage, item.data)
+
+            return Item(item.block_id, taken, item.damage, item.data)
+
+        if item is None or self._stacks_with(slot, cursor):
+
+            # put down all (or one)
+            held = 0 if item is None else item.count
+
+            placed = min(cursor.count if button == 0 else 1,
+                         self.stack_sizes.get(cursor.block_id, MAX_STACK) - held)
+
+            self.set(slot, cursor.block_id, held + placed, cursor.damage, cursor.data)
+
+            if placed == cursor.count:
+                return None
+
+            return Item(cursor.block_id, cursor.count - placed, cursor.damage, cursor.data)
+
+        # swap what's held for what's in the slot
+        self.set_item(slot, cursor)
+
+        return item
+
+
+class Slots(Mapping):
+    '''A read-only slot --> Item view of a Window's occupied slots.'''
+
+    def __init__(self, window):
+
+        self.window = window
+
+    def __getitem__(self, slot):
+
+        if not 0 <= slot < len(self.window):
+            raise KeyError(slot)
+
+        item = self.window.get(slot)
+
+        if item is None:
+            raise KeyError(slot)
+
+        return item
+
+    def __iter__(self):
+
+        return iter(self.window.occupied())
+
+    def __len__(self):
+
+        return len(self.window.occupied())
+
 
 class InventoryReactor:
+    '''Keeps track of the player's inventory and any other window that's
+    open, and clicks on their slots.
+
+    Clicks are applied to our copy of the window straight away (the
+    server only tells us whether it agreed) and sent without waiting for
+    the earlier ones to be confirmed, up to MAX_PENDING_CLICKS at a time.
+    If the server rejects one it resends the whole window, so the clicks
+    that hadn't been sent yet (which were planned from what we thought
+    was there) are dropped - and it ignores the ones already sent after it
+    until we apologise, so we stop waiting to hear about those.
+    '''
 
-    def __init__(self, packet_factory, connection):
+    def __init__(self, packet_factory, connection, items=None):
 
         self.connection = connection
 
+        # an items.ItemRegistry, for item names and stack sizes
+        self.items = items
+
+        self.stack_sizes = None if items is None else items.stack_sizes
+
         RESPONSE_PACKETS = (
-            'held_item_slot', 'block_dig'
+            'held_item_slot', 'block_dig', 'window_click', 'transaction',
+            'close_window'
         )
 
         for name in RESPONSE_PACKETS:
@@ -28,7 +301,32 @@ class InventoryReactor:
 
         self._active_hotbar_slot = 0
 
-        self.slots = {}
+        # window ID --> Window
+        self.windows = {PLAYER_WINDOW: Window(PLAYER_WINDOW, PLAYER_WINDOW_SIZE, stack_sizes=self.stack_sizes)}
+
+        # the window other than our own that's open (if any)
+        self.window = None
+
+        # what the cursor is holding
+        self.cursor = None
+
+        # (window ID, slot, button, mode) of the clicks waiting to be sent,
+        # and (window ID, action) of the ones waiting to be confirmed
+        self.queued = deque()
+        self.pending = deque()
+
+        self.counters = Counter()
+
+    @property
+    def slots(self):
+        '''The Items in the player's inventory, by slot.'''
+
+        return Slots(self.windows[PLAYER_WINDOW])
+
+    def count(self, item_id, damage=None):
+        '''Return how many of an item we have.'''
+
+        return self.windows[PLAYER_WINDOW].count(item_id, damage)
 
     @property
     def active_hotbar_slot(self):
@@ -79,32 +377,194 @@ class InventoryReactor:
     @Listener(PacketEvent, area=State.PLAY, key='set_slot')
     def on_set_slot(self, event):
 
-        packet = event.packet
-
-#        import pprint
-
-#         pprint.pprint({
-#             'event': event,
-#             'windowId': packet.fields.windowId,
-#             'slot': packet.fields.slot,
-#             'item': {
-#                 'block_id': packet.fields.item.block_id,
-#                 'count': packet.fields.item.item_count,
-#                 'damage': packet.fields.item.item_damage
-#             }
-#         })
-
-        fields = packet.fields
+        fields = event.packet.fields
         item = fields.item
 
         if item.block_id == -1:
-            # clear the slot
-            self.slots.pop(fields.slot, None)
+            item = None
         else:
-
-            self.slots[fields.slot] = Item(
+            item = Item(
                 block_id=item.block_id,
                 count=item.item_count,
                 damage=item.item_damage,
                 data=item.nbt
             )
+
+        if fields.windowId == CURSOR_WINDOW and fields.slot == CURSOR_SLOT:
+            self.cursor = item
+            return
+
+        window = self.windows.get(fields.windowId)
+
+        if window is None or not 0 <= fields.slot < len(window):
+            return
+
+        window.set_item(fields.slot, item)
+
+        if window.window_id != PLAYER_WINDOW and fields.slot >= window.player_offset:
+            self.windows[PLAYER_WINDOW].set_item(fields.slot - window.player_offset + PLAYER_MAIN_SLOT, item)
+
+    @Listener(PacketEvent, area=State.PLAY, key='window_items')
+    def on_window_items(self, event):
+
+        fields = event.packet.fields
+
+        window = self.windows.get(fields.windowId)
+
+        if window is None:
+            return
+
+        window.load(fields.items)
+
+        self._mirror(window)
+
+    @Listener(PacketEvent, area=State.PLAY, key='open_window')
+    def on_open_window(self, event):
+
+        fields = event.packet.fields
+
+        self.window = Window(fields.windowId, fields.slotCount + PLAYER_SLOTS,
+                             kind=fields.inventoryType, title=fields.windowTitle,
+                             stack_sizes=self.stack_sizes)
+
+        self.windows[fields.windowId] = self.window
+
+    @Listener(PacketEvent, area=State.PLAY, key='close_window')
+    def on_close_window(self, event):
+
+        self._closed(event.packet.fields.windowId)
+
+    @Listener(PacketEvent, area=State.PLAY, key='transaction')
+    def on_transaction(self, event):
+
+        fields = event.packet.fields
+
+        try:
+            self.pending.remove((fields.windowId, fields.action))
+        except ValueError:
+            pass
+
+        if not fields.accepted:
+
+            self.counters['rejected'] += 1
+
+            # the server waits for us to say sorry before carrying on
+            apology = self.transaction_packet()
+
+            apology.fields.windowId = fields.windowId
+            apology.fields.action = fields.action
+            apology.fields.accepted = False
+
+            self.connection.send(apology)
+
+            self.counters['dropped'] += len(self.queued)
+            self.queued.clear()
+
+            # the server ignored the clicks in flight after this one
+            self._forget(fields.windowId)
+
+        self._send_clicks()
+
+    def _mirror(self, window):
+        '''Copy the player's slots of a window into the player's own
+        window.'''
+
+        if window.window_id == PLAYER_WINDOW:
+            return
+
+        player = self.windows[PLAYER_WINDOW]
+        offset = window.player_offset
+
+        for n in range(PLAYER_SLOTS):
+            player.set_item(PLAYER_MAIN_SLOT + n, window.get(offset + n))
+
+    def _closed(self, window_id):
+
+        if window_id != PLAYER_WINDOW:
+            self.windows.pop(window_id, None)
+
+        if self.window is not None and self.window.window_id == window_id:
+            self.window = None
+
+        self.queued = deque(click for click in self.queued if click[0] != window_id)
+
+        self._forget(window_id)
+
+    def _forget(self, window_id):
+        '''Stop waiting for the server to confirm the clicks on a window.'''
+
+        pending = deque(click for click in self.pending if click[0] != window_id)
+
+        self.counters['unconfirmed'] += len(self.pending) - len(pending)
+
+        self.pending = pending
+
+    def close_window(self):
+        '''Close the open window (if there is one).'''
+
+        if self.window is None:
+            return
+
+        packet = self.close_window_packet()
+        packet.fields.windowId = self.window.window_id
+
+        self.connection.send(packet)
+
+        self._closed(self.window.window_id)
+
+    def click(self, slot, button=0, mode=PICKUP, window_id=None):
+        '''Queue a click on a slot of a window (the open one, by default).
+
+        Only the PICKUP (left or right click), SWAP (with hotbar slot
+        button) and THROW (one or, with button 1, all) modes are supported,
+        since the result of each click has to be worked out here.
+        '''
+
+        if mode not in (PICKUP, SWAP, THROW):
+            raise ValueError('Unsupported click mode: {}'.format(mode))
+
+        if window_id is None:
+            window_id = PLAYER_WINDOW if self.window is None else self.window.window_id
+
+        self.queued.append((window_id, slot, button, mode))
+
+        self._send_clicks()
+
+    def _send_clicks(self):
+
+        while self.queued and len(self.pending) < MAX_PENDING_CLICKS:
+
+            window_id, slot, button, mode = self.queued.popleft()
+
+            window = self.windows.get(window_id)
+
+            if window is None:
+                continue
+
+            # the server checks this against what was in the slot
+            clicked = window.get(slot) if mode == PICKUP and slot != OUTSIDE_SLOT else None
+
+            action = window.next_action
+            window.next_action = action % 32767 + 1
+
+            self.cursor = window.click(slot, button, mode, self.cursor)
+
+            self._mirror(window)
+
+            packet = self.window_click_packet()
+
+            packet.fields.windowId = window_id
+            packet.fields.slot = slot
+            packet.fields.mouseButton = button
+            packet.fields.action = action
+            packet.fields.mode = mode
+
+            if clicked is None:
+                packet.fields.item = Slot()
+            else:
+                packet.fields.item = Slot(block_id=clicked.block_id, item_count=clicked.count,
+                                          item_damage=clicked.damage, nbt=clicked.data)
+
+            self.connection.send(packet)
+
+            self.pending.append((window_id, action))
@@ -1,3 +1,6 @@
+from nbt import nbt
+
+
 class Item:
 
     def __init__(self, block_id, count, damage, data):
@@ -7,6 +10,39 @@ class Item:
         self.damage = damage
         self.data = data
 
+        self._nbt = None
+
     def __str__(self):
 
         return 'block: {:3d}, count: {:2d}, damage: {}'.format(self.block_id, self.count, self.damage)
+
+    @property
+    def nbt(self):
+        '''A lazy view of the item's NBT data (or None if it doesn't have
+        any), which is only decoded as far as it is looked into.'''
+
+        if self._nbt is None and self.data:
+            self._nbt = nbt.view(self.data)
+
+        return self._nbt
+
+    @property
+    def display_name(self):
+        '''The name the item has been given (i.e. on an anvil), if any.'''
+
+        if self.nbt is None:
+            return None
+
+        return self.nbt.query('display.Name')
+
+    @property
+    def enchantments(self):
+        '''A list of (enchantment ID, level) - enchanted books keep theirs
+        as stored enchantments.'''
+
+        if self.nbt is None:
+            return []
+
+        enchantments = self.nbt.get('ench') or self.nbt.get('StoredEnchantments') or []
+
+        return [(enchantment['id'], enchantment['lvl']) for enchantment in enchantments]
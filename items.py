@@ -0,0 +1,212 @@
+'''
+'''
+
+from bisect import bisect_left, insort
+import json
+import os
+import re
+
+import mcdata_cache
+
+DEFAULT_STACK_SIZE = 64
+
+_WORD = re.compile('[a-z0-9]+')
+
+
+def tokenize(name):
+    '''Return the lower case words of a name ("minecraft:dark_prismarine"
+    and "Dark Prismarine" both give ['dark', 'prismarine']).'''
+
+    name = name.lower()
+
+    if name.startswith('minecraft:'):
+        name = name[len('minecraft:'):]
+
+    return _WORD.findall(name)
+
+
+class ItemRegistry:
+    '''Item (and block) names, from minecraft-data's items.json and
+    blocks.json.
+
+    Every item is an entry, as is each of its named variations (i.e.
+    "Dark Prismarine" is prismarine with a damage value of 2).  Names are
+    looked up exactly first, then by the words in them - each word of the
+    query matching the start of a word of the name, in any order - using a
+    sorted list of every word so prefixes are found with a binary search.
+    '''
+
+    CACHE_KIND = 'ItemRegistry.1'
+
+    def __init__(self, items=(), blocks=()):
+
+        # (item ID, damage or None for any) for each entry, and its name
+        self.entries = []
+        self.entry_names = []
+
+        # item ID --> minecraft-data name (i.e. 'dark_oak_stairs')
+        self.names = {}
+
+        # item ID --> display name, and (item ID, damage) --> variation
+        # display name
+        self.display_names = {}
+        self.variation_names = {}
+
+        self.stack_sizes = {}
+
+        # ' '.join(tokenize(name)) --> entry index
+        self.exact = {}
+
+        # word --> entry indices, and every word in sorted order
+        self.words = {}
+        self.sorted_words = []
+
+        # items come after blocks so that their names win (i.e. the sugar
+        # cane item over the block)
+        for entry in list(blocks) + list(items):
+            self.add(entry)
+
+    @classmethod
+    def from_minecraft_data(clz, mcdata_base_dir, game_version, cache_directory=mcdata_cache.DEFAULT_DIRECTORY):
+
+        base_path = os.path.join(mcdata_base_dir, 'data', 'pc')
+
+        with open(os.path.join(base_path, game_version, 'version.json'), 'r') as fin:
+            version_data = json.load(fin)
+
+        return mcdata_cache.cached(os.path.join(base_path, version_data['majorVersion'], 'items.json'),
+                                   clz.from_file, clz.CACHE_KIND, cache_directory)
+
+    @classmethod
+    def from_file(clz, path):
+        '''Build a registry from an items.json (and the blocks.json next to
+        it, if there is one).'''
+
+        with open(path, 'r') as fin:
+            items = json.load(fin)
+
+        blocks_path = os.path.join(os.path.dirname(path), 'blocks.json')
+
+        blocks = []
+
+        if os.path.exists(blocks_path):
+            with open(blocks_path, 'r') as fin:
+                blocks = json.load(fin)
+
+        return clz(items, blocks)
+
+    def add(self, item):
+        '''Add an item (or block) from minecraft-data.'''
+
+        item_id = item['id']
+
+        self.names[item_id] = item['name']
+        self.display_names[item_id] = item['displayName']
+        self.stack_sizes[item_id] = item.get('stackSize', DEFAULT_STACK_SIZE)
+
+        self._add_entry(item_id, None, item['displayName'])
+        self._add_entry(item_id, None, item['name'])
+
+        for variation in item.get('variations') or ():
+
+            self.variation_names[(item_id, variation['metadata'])] = variation['displayName']
+
+            self._add_entry(item_id, variation['metadata'], variation['displayName'])
+
+    def _add_entry(self, item_id, damage, name):
+
+        words = tokenize(name)
+
+        if not words:
+            return
+
+        key = ' '.join(words)
+
+        existing = self.exact.get(key)
+
+        # a variation with the same name as its item (i.e. "Stone" with a
+        # damage of 0) doesn't need an entry of its own
+        if existing is not None and self.entries[existing][0] == item_id:
+            return
+
+        index = len(self.entries)
+
+        self.entries.append((item_id, damage))
+        self.entry_names.append(key)
+
+        # later items win, but a variation never hides another item
+        if existing is None or damage is None or self.entries[existing][1] is not None:
+            self.exact[key] = index
+
+        for word in set(words):
+
+            if word not in self.words:
+                self.words[word] = []
+                insort(self.sorted_words, word)
+
+            self.words[word].append(index)
+
+    def display_name(self, item_id, damage=0):
+        '''Return the name of an item (None if it's unknown).'''
+
+        return self.variation_names.get((item_id, damage)) or self.display_names.get(item_id)
+
+    def stack_size(self, item_id):
+
+        return self.stack_sizes.get(item_id, DEFAULT_STACK_SIZE)
+
+    def _prefixed(self, prefix):
+        '''Return the indices of the entries with a word starting with
+        prefix.'''
+
+        words = self.sorted_words
+
+        found = set()
+
+        for n in range(bisect_left(words, prefix), len(words)):
+
+            if not words[n].startswith(prefix):
+                break
+
+            found.update(self.words[words[n]])
+
+        return found
+
+    def search(self, query, limit=10):
+        '''Return up to limit (item ID, damage) matches for query, best
+        first (damage is None when any will do).'''
+
+        words = tokenize(query)
+
+        if not words:
+            return []
+
+        matches = None
+
+        for word in words:
+
+            found = self._prefixed(word)
+
+            matches = found if matches is None else matches & found
+
+            if not matches:
+                return []
+
+        entry_names = self.entry_names
+
+        # the closest names are the ones with the fewest extra letters
+        ranked = sorted(matches, key=lambda index: (len(entry_names[index]), index))
+
+        return [self.entries[index] for index in ranked[:limit]]
+
+    def lookup(self, name):
+        '''Return the (item ID, damage) best matching name, or None.'''
+
+        index = self.exact.get(' '.join(tokenize(name)))
+
+        if index is not None:
+            return self.entries[index]
+
+        matches = self.search(name, limit=1)
+
+        return matches[0] if matches else None
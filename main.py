@@ -3,27 +3,51 @@
 TODO format documentation according to: http://google.github.io/styleguide/pyguide.html
 '''
 
+from concurrent.futures import ThreadPoolExecutor
 import os
 import json
+import math
 import traceback
 
 from agent_reactor import ModelReactor, StopEvent, TickEvent
 from atoms import Position, Face, Direction
+from blocks import BlockRegistry
 from connection import Connection
+from digging import Digger, DigTimer
 from dispatchers import ThreadedDispatcher
+from entity_manager import EntityManager
 from inventory_reactor import InventoryReactor
+from items import ItemRegistry
 from nbt import nbt
 from observer import Listener
 from packet_event import PacketEvent
 from packet_reactor import PacketReactor
+from pathfinding import Navigator, Pathfinder
+from physics import SNAPSHOT_DISTANCE, STEP_HEIGHT, PlayerPhysics
+from raycast import REACH, Raycaster, eye
 from protocol import PacketFactory, State
+from rate_limiter import RateLimiter
+from tasks import Dig, GoTo, Scheduler
 
-from map_chunk import ChunkManager
+from map_chunk import ChunkManager, World
+from world_cache import WorldCache
 
 
 class Config:
 
     MC_DATA_FOLDER = './minecraft-data/'
+    CACHE_FOLDER = './world_cache/'
+
+    # how much memory the columns we're holding on to can use, and how many
+    # chunks away from us they're kept for
+    WORLD_MEMORY_BUDGET = 64 * 1024 * 1024
+    UNLOAD_DISTANCE = 16
+
+    # how far away (in blocks) the find command looks
+    SEARCH_RADIUS = 64
+
+    # run (rather than walk) along paths
+    SPRINT = True
     PROTOCOL_VERSION = '1.11.2'
 
     SERVER = 'localhost'
@@ -31,15 +55,38 @@ class Config:
 
 
 class Robot:
-    def __init__(self, packet_factory, model, inventory):
+    def __init__(self, packet_factory, model, inventory, entities, world=None, dig_timer=None):
 
         self.factory = packet_factory
         self.model = model
         self.inventory = inventory
+        self.entities = entities
 
         self.destination = None
+        self.navigator = None
+
+        self.chunk_manager = ChunkManager(entity_manager=entities, world=world,
+                                          memory_budget=Config.WORLD_MEMORY_BUDGET,
+                                          unload_distance=Config.UNLOAD_DISTANCE)
+        self.pathfinder = Pathfinder(self.chunk_manager)
+
+        # routes are planned on a thread of their own (over a snapshot of the
+        # world) so a long search doesn't hold up the packets
+        self.planner = ThreadPoolExecutor(max_workers=1)
+
+        # move the way the client would, so the server doesn't correct us
+        # (the physics runs on the model's thread, so it gets a snapshot of
+        # the world around us each tick - see on_tick)
+        model.physics = PlayerPhysics(self.chunk_manager.snapshot())
 
-        self.chunk_manager = ChunkManager()
+        # what we can see (and reach) from where we are
+        self.raycaster = Raycaster(self.chunk_manager)
+
+        self.digger = Digger(model, inventory, self.chunk_manager,
+                             dig_timer or DigTimer(self.chunk_manager.registry), self.raycaster)
+
+        # commands that take time are queued up as tasks
+        self.tasks = Scheduler()
 
     # DEBUG
     @Listener(PacketEvent, area=State.PLAY, key='open_window')
@@ -58,20 +105,52 @@ class Robot:
         })
         print('======================')
 
+    def plan_route(self, destination):
+        '''Start planning a route to destination, returning a Future of the
+        Path (None if there isn't one).'''
+
+        position = self.model.position
+
+        start = (math.floor(position.x), math.floor(position.y), math.floor(position.z))
+        goal = (math.floor(destination.x), math.floor(destination.y), math.floor(destination.z))
+
+        return self.planner.submit(self.pathfinder.find_path, start, goal, self.chunk_manager.snapshot())
+
+    def follow(self, destination, path):
+        '''Walk along a planned path to destination.'''
+
+        self.destination = destination
+        self.navigator = Navigator(self.pathfinder, path.waypoints[0], path.waypoints[-1], path=path)
+
     @Listener(TickEvent)
     def on_tick(self, event):
 
-        if self.destination is not None:
+        # the model's position is replaced (not changed) as we move, so this
+        # stays the same for the whole tick
+        position = self.model.position
+
+        self.chunk_manager.set_center(position.x, position.z)
+
+        self.model.physics.world = self.chunk_manager.snapshot(self.chunk_manager.center, SNAPSHOT_DISTANCE)
+
+        # this ticks the digger too (see tasks.Dig)
+        self.tasks.tick()
+
+        if self.navigator is not None:
 
-            distance_to_target = self.model.position.distance(self.destination)
+            waypoint = self.navigator.next_waypoint(position)
 
-            if distance_to_target <= 0.1:
+            if waypoint is None:
                 self.model.facing.pitch = 0.0
                 self.model.do_stop()
             else:
 
-                self.model.velocity = self.model.position.impulse(
-                    self.destination)
+                self.model.facing.at(position, waypoint)
+
+                # too high to step up onto, so jump
+                jump = waypoint.y - position.y > STEP_HEIGHT
+
+                self.model.physics.walk(jump=jump, sprint=Config.SPRINT, target=(waypoint.x, waypoint.z))
 
     @Listener(PacketEvent, area=State.PLAY, key='chat')
     def on_chat(self, event):
@@ -139,25 +218,24 @@ class Robot:
         if action == 'goto':
             # format: goto [~]x [~]y [~]z
 
-            self.destination = Position.from_args(self.model.position, args)
-
-            self.model.facing.at(self.model.position, self.destination)
+            destination = Position.from_args(self.model.position, args)
 
-            self.model.say(
-                'Heading to destination: {}'.format(self.destination), sender)
+            self.tasks.add(GoTo(self, destination, sender,
+                                success='Heading to destination: {}'.format(destination)))
 
         elif action == 'move':
             # format: move Direction
 
             direction = Direction[args[0].upper()]
 
-            self.destination = Position.from_args(self.model.position, direction.value)
-
-            self.model.facing.at(self.model.position, self.destination)
+            self.tasks.add(GoTo(self, Position.from_args(self.model.position, direction.value), sender,
+                                failure="I can't go that way."))
 
         elif action == 'stop':
             # format: stop
 
+            self.tasks.cancel()
+            self.digger.cancel()
             self.model.do_stop()
 
         elif action == 'look':
@@ -182,18 +260,62 @@ class Robot:
 
             target = Position.from_args(self.model.position, args)
 
-            self.model.dig(target)
+            self.tasks.add(Dig(self, target))
+
+        elif action == 'find':
+            # format: find block_name
+
+            block_id = self.chunk_manager.registry.block_id(args[0])
+
+            if block_id is None:
+                self.model.say("I don't know what {} is.".format(args[0]), sender)
+            else:
+
+                location = self.chunk_manager.find_nearest({block_id}, self.model.position, Config.SEARCH_RADIUS)
+
+                if location is None:
+                    self.model.say("I can't see any {} near here.".format(args[0]), sender)
+                else:
+                    self.model.say('There is {} at {} {} {}'.format(args[0], *location), sender)
+
+        elif action == 'mine':
+            # format: mine block_name
+
+            block_id = self.chunk_manager.registry.block_id(args[0])
+
+            origin = eye(self.model.position)
+
+            hit = None
+
+            if block_id is not None:
+                hit = self.raycaster.nearest_reachable(origin, self.chunk_manager.find(
+                    {block_id}, Position(*origin), REACH + 1))
+
+            if hit is None:
+                self.model.say("I can't reach any {}.".format(args[0]), sender)
+            else:
+                self.tasks.add(Dig(self, hit.location))
 
         elif action == 'place':
-            # format: place [~]x [~]y [~]z face
+            # format: place [~]x [~]y [~]z [face]
+
+            target = Position.from_args(self.model.position, args[0:3])
 
-            position, face = args[0:3], args[-1]
+            if len(args) > 3:
+                self.model.place_block(target, Face[args[3].title()])
+            else:
 
-            face = Face[face.title()]
+                # against whichever face of the block we can see
+                location = (math.floor(target.x), math.floor(target.y), math.floor(target.z))
 
-            target = Position.from_args(self.model.position, position)
+                hit = self.raycaster.reach(eye(self.model.position), location)
 
-            self.model.place_block(target, face)
+                if hit is None:
+                    self.model.say("I can't reach that.", sender)
+                else:
+                    self.model.facing.at(Position(*eye(self.model.position)),
+                                         Position(*(b + c for b, c in zip(hit.location, hit.cursor))))
+                    self.model.place_block(Position(*hit.location), hit.face, hit.cursor)
 
         elif action == 'location':
             # format: location
@@ -229,7 +351,7 @@ class Robot:
 
         elif action == 'stock':
             # format: stock
-            # format: stock item
+            # format: stock item name
 
             slots = [x for x in self.inventory.slots.keys()]
 
@@ -237,11 +359,27 @@ class Robot:
 
             if args:
 
-                assert len(args) == 1, 'Expected "item name" but got "{}".'.format(args)
+                # an item ID, or a (possibly partial) name like "dark prism"
+                query = ' '.join(args)
+
+                items = self.inventory.items
+
+                if query.isdigit():
+                    found = (int(query), None)
+                elif items is not None:
+                    found = items.lookup(query)
+                else:
+                    found = None
 
-                # TODO filter results if we're provided with an item to look for
+                if found is None:
+                    self.model.say("I don't know what {} is.".format(query), sender)
+                else:
 
-                self.model.say("I can't do that right now.", sender)
+                    item_id, damage = found
+
+                    name = query if items is None else items.display_name(item_id, damage or 0)
+
+                    self.model.say('I have {} {}.'.format(self.inventory.count(item_id, damage), name), sender)
 
             else:
 
@@ -249,20 +387,20 @@ class Robot:
                 print('- Inventory -'.center(55))
                 print('-' * 55)
 
-                item_count = 1
-
                 for slot in slots:
 
-                    print('Slot: {} - {}'.format(slot, self.inventory.slots[slot]))
+                    item = self.inventory.slots[slot]
 
-                    with open('slot_data_{}.dat'.format(item_count), 'wb') as fout:
+                    print('Slot: {} - {}'.format(slot, item))
 
-                        data = self.inventory.slots[slot].data
+                    if self.inventory.items is not None:
+                        print('    item: {}'.format(self.inventory.items.display_name(item.block_id, item.damage)))
 
-                        if data:
-                            fout.write(data)
+                    if item.display_name is not None:
+                        print('    name: {}'.format(item.display_name))
 
-                    item_count += 1
+                    for enchantment, level in item.enchantments:
+                        print('    enchantment: {} (level {})'.format(enchantment, level))
 
                 print('=' * 55)
 
@@ -300,6 +438,7 @@ class Robot:
     def on_stop(self, event):
 
         self.destination = None
+        self.navigator = None
         self.model.facing.pitch = 0.0
 
 
@@ -311,12 +450,28 @@ def main():
 
     connection = Connection(Config.SERVER, Config.PORT)
     factory = PacketFactory(protocol_path, Config.PROTOCOL_VERSION)
+    blocks = BlockRegistry.from_minecraft_data(protocol_path, Config.PROTOCOL_VERSION)
+    items = ItemRegistry.from_minecraft_data(protocol_path, Config.PROTOCOL_VERSION)
 
-    agent_reactor = ModelReactor(factory, connection)
-    inventory = InventoryReactor(factory, connection)
+    # what we've seen of each server is kept separately
+    cache = WorldCache(os.path.join(os.path.expanduser(Config.CACHE_FOLDER),
+                                    '{}_{}'.format(Config.SERVER, Config.PORT)))
+
+    # shared by every robot connected to the server
+    world = World(registry=blocks, cache=cache)
+
+    dig_timer = DigTimer.from_minecraft_data(blocks, protocol_path, Config.PROTOCOL_VERSION)
+
+    # everything the robot decides to send goes through the rate limiter
+    limiter = RateLimiter(connection)
+
+    agent_reactor = ModelReactor(factory, limiter)
+    inventory = InventoryReactor(factory, limiter, items=items)
     packet_reactor = PacketReactor(factory, connection)
+    entities = EntityManager()
     # TODO should the inventory reactor be on the model?
-    robot = Robot(factory, model=agent_reactor, inventory=inventory)
+    robot = Robot(factory, model=agent_reactor, inventory=inventory,
+                  entities=entities, world=world, dig_timer=dig_timer)
 
     #
     # establish our threaded dispatcher
@@ -343,11 +498,14 @@ def main():
     # packet_reactor
     packet_reactor.play_state_emitter.bind(agent_reactor)
     packet_reactor.play_state_emitter.bind(inventory)
+    packet_reactor.play_state_emitter.bind(entities)
     packet_reactor.play_state_emitter.bind(robot)
+    packet_reactor.play_state_emitter.bind(robot.chunk_manager)
 
     # agent_reactor
     agent_reactor.stop_emitter.bind(robot)
     agent_reactor.tick_emitter.bind(robot)
+    agent_reactor.tick_emitter.bind(limiter)
 
     try:
         connection.connect()
@@ -360,6 +518,11 @@ def main():
 
         agent_reactor.stop()
         threaded_dispatcher.stop()
+        robot.planner.shutdown(wait=False)
+
+        world.save()
+        cache.close()
+
         raise
 
 
@@ -1,7 +1,18 @@
 '''
 '''
 
+from array import array
+from collections import Counter
+import itertools
+import math
+import struct
+import sys
+
+from blocks import BlockRegistry
 from datatypes import UnsignedInt8, VarInt
+from observer import Listener
+from packet_event import PacketEvent
+from protocol import State
 
 BYTES_PER_LONG = 8
 
@@ -11,6 +22,85 @@ BLOCK_LIGHT_BYTES = 4096 // 2
 # 4096/2 --> 2048 *IF* in overworld, otherwise not present!!!
 SKY_LIGHT_BYTES = 4096 // 2
 
+BLOCKS_PER_SLICE = 16 * 16 * 16
+SLICES_PER_COLUMN = 16
+BIOME_BYTES = 16 * 16
+
+BLOCKS_PER_LAYER = 16 * 16
+BLOCKS_PER_COLUMN = BLOCKS_PER_SLICE * SLICES_PER_COLUMN
+
+# bitmasks for an entirely empty slice and for a single y layer
+ALL_BLOCKS = (1 << BLOCKS_PER_SLICE) - 1
+LAYER = (1 << BLOCKS_PER_LAYER) - 1
+
+# byte --> 0 or 1 for each bit, to pick one bit out of a run of bitmap bytes
+_BIT_TABLES = [bytes((value >> bit) & 1 for value in range(256)) for bit in range(8)]
+
+# bytes between a block's bit and the bit of the block above it
+_LAYER_BYTES = BLOCKS_PER_LAYER // 8
+
+OVERWORLD = 0
+
+# how many chunks around the robot are picked up from the cache (a
+# server's default view distance)
+WARM_DISTANCE = 10
+
+# every change to a slice takes a new number from here, so versions are
+# unique across slices (a replaced slice never reuses an old version)
+_versions = itertools.count(1)
+
+# columns are stamped from here when they're used (see ChunkManager.evict)
+_clock = itertools.count(1)
+
+
+def slices_in_bitmask(bitmask):
+    '''Return the slice indexes (0-15) that are present in a primary bitmask.'''
+
+    return [index for index in range(SLICES_PER_COLUMN) if bitmask & (1 << index)]
+
+
+def unpack_blocks(data, offset, long_count, bits_per_block, palette):
+    '''Unpack BLOCKS_PER_SLICE entries of bits_per_block bits from an array
+    of big-endian longs, mapping them through the palette (if any).'''
+
+    longs = struct.unpack_from('>{}Q'.format(long_count), data, offset)
+
+    mask = (1 << bits_per_block) - 1
+
+    if 64 % bits_per_block == 0:
+
+        # entries never straddle two longs
+        shifts = range(0, 64, bits_per_block)
+
+        values = [(word >> shift) & mask for word in longs for shift in shifts]
+
+    else:
+
+        values = []
+        append = values.append
+
+        acc = 0
+        acc_bits = 0
+
+        for word in longs:
+
+            acc |= word << acc_bits
+            acc_bits += 64
+
+            while acc_bits >= bits_per_block:
+
+                append(acc & mask)
+
+                acc >>= bits_per_block
+                acc_bits -= bits_per_block
+
+    del values[BLOCKS_PER_SLICE:]
+
+    if palette:
+        return array('H', map(palette.__getitem__, values))
+
+    return array('H', values)
+
 
 def parse_chunk_data(chunk_x,
                      chunk_z,
@@ -25,14 +115,15 @@ def parse_chunk_data(chunk_x,
 
     # specified_chunks = primary_bitmask --> [0,...,15]
 
+    if entity_manager is not None:
+        entity_manager.set_block_entities(chunk_x, chunk_z, block_entities)
+
     column = chunk_manager.get(chunk_x, chunk_z)
 
     offset = 0
 
     for current_chunk in specified_chunks:
 
-        slice = column.get_slice(current_chunk * 16)
-
         bits_per_block, increment = UnsignedInt8.from_wire(
             chunk_data, offset, len(chunk_data))
         offset += increment
@@ -59,7 +150,9 @@ def parse_chunk_data(chunk_x,
                                                   len(chunk_data))
         offset += increment
 
-        data_array = chunk_data[offset:offset + (data_length * BYTES_PER_LONG)]
+        assert data_length > 0
+
+        blocks = unpack_blocks(chunk_data, offset, data_length, bits_per_block, palette)
         offset += (data_length * BYTES_PER_LONG)
 
         # TODO deal with block lights
@@ -70,107 +163,1101 @@ def parse_chunk_data(chunk_x,
             # TODO deal with sky lights
             offset += SKY_LIGHT_BYTES
 
-        # TODO create columns and slices and insert into chunk_manager
+        column.set_slice(current_chunk, blocks)
 
-        assert data_length > 0
+    if ground_up:
 
-        mask = (1 << bits_per_block) - 1
+        # a ground up column replaces everything, so any slices that weren't
+        # sent are empty
+        for index in range(SLICES_PER_COLUMN):
 
-        bit_index = 0
+            if index not in specified_chunks:
+                column.set_slice(index, None)
 
-        for x_coord in range(0, 16):
-            for z_coord in range(0, 16):
-                for y_coord in range(0, 16):
+        column.biomes = bytes(chunk_data[offset:offset + BIOME_BYTES])
 
-                    lower_word = bit_index // 64
-                    upper_word = (bit_index + bits_per_block - 1) // 64
+        # everything that might have come from the cache has been replaced
+        column.cached_at = None
 
-                    lower_shift = bit_index % 64
-                    upper_shift = 64 - lower_shift
+    return column
 
-                    bit_index += bits_per_block
 
-                    if lower_word == upper_word:
-                        block = (data_array[lower_word] >> lower_shift) & mask
-                    else:
-                        block = (data_array[lower_word] >> lower_shift |
-                                 data_array[upper_word] << upper_shift) & mask
+class World:
+    '''The columns shared by every ChunkManager (robot) in the process,
+    keyed by (dimension, chunk x, chunk z).
 
-                    if palette:
-                        block = palette[block]
+    Each ChunkManager holds a reference to the columns it can see; a
+    column is saved to the cache and dropped once the last reference is
+    released.  Robots sharing a World must have their packets dispatched
+    on the same thread (e.g. by a single ThreadedDispatcher).
+    '''
 
-                    slice.set_block(x_coord, y_coord, z_coord, block)
+    def __init__(self, registry=None, cache=None):
 
+        self.registry = registry or BlockRegistry.default()
+        self.cache = cache
 
-class ChunkManager:
+        # (dimension, x, z) --> Column
+        self.columns = {}
 
-    columns = {}
+        # (dimension, x, z) --> number of ChunkManagers holding the column
+        self.references = {}
 
-    def __init__(self):
+        # (dimension, x, z) of the columns that were dropped while the server
+        # still had them loaded, so the changes since then were never seen
+        # and the cached copy can't be trusted until the server resends it
+        self.stale = set()
 
-        self.flush()
+    def acquire(self, dimension, chunk_x, chunk_z):
+        '''Return a reference to the column, creating an empty one if
+        nobody has it.'''
 
-    def flush(self):
+        key = (dimension, chunk_x, chunk_z)
+
+        column = self.columns.get(key)
+
+        if column is None:
+            column = self.columns[key] = Column(x=chunk_x, z=chunk_z, registry=self.registry)
+            self.references[key] = 0
+
+        self.references[key] += 1
+
+        return column
+
+    def acquire_existing(self, dimension, chunk_x, chunk_z):
+        '''Return a reference to the column if somebody has it or it can be
+        loaded from the cache, or None.'''
+
+        key = (dimension, chunk_x, chunk_z)
+
+        column = self.columns.get(key)
+
+        if column is None:
+
+            if self.cache is None or key in self.stale:
+                return None
+
+            stored = self.cache.load_column(dimension, chunk_x, chunk_z)
+
+            if stored is None:
+                return None
+
+            sections, written = stored
+
+            column = self.columns[key] = Column(x=chunk_x, z=chunk_z, registry=self.registry)
+
+            column.load(sections)
+            column.cached_at = written
+
+            self.references[key] = 0
+
+        self.references[key] += 1
+
+        return column
+
+    def release(self, dimension, chunk_x, chunk_z, stale=False):
+        '''Drop a reference to the column.  stale means the server still has
+        it loaded (it's being evicted), so the copy saved to the cache will
+        miss any changes sent from now on.'''
+
+        key = (dimension, chunk_x, chunk_z)
+
+        count = self.references.get(key)
+
+        if not count:
+            return
+
+        if count > 1:
+            self.references[key] = count - 1
+            return
+
+        del self.references[key]
+
+        column = self.columns.pop(key)
+
+        if self.cache is not None:
+            self._store(dimension, column)
+
+            if stale:
+                self.stale.add(key)
+
+    def resent(self, dimension, chunk_x, chunk_z):
+        '''The server has sent the whole column again, so whatever is stored
+        from now on is up to date.'''
+
+        self.stale.discard((dimension, chunk_x, chunk_z))
+
+    def is_live(self, dimension, chunk_x, chunk_z):
+        '''Return True if the column is held as the server sent it (rather
+        than from the cache), so it's already being kept up to date.'''
+
+        column = self.columns.get((dimension, chunk_x, chunk_z))
+
+        # only a ground up chunk sets the biomes
+        return column is not None and column.cached_at is None and column.biomes is not None
+
+    def save(self):
+        '''Write the columns that have changed to the cache (if there is one).'''
+
+        if self.cache is None:
+            return
+
+        for (dimension, _, _), column in self.columns.items():
+            self._store(dimension, column)
+
+        self.cache.flush()
+
+    def _store(self, dimension, column):
+
+        if column.dirty:
+
+            self.cache.store_column(dimension, column.x, column.z,
+                                    [strata.blocks if strata is not None else None for strata in column.slices])
+
+            column.dirty = False
+
+    def memory_usage(self):
+        '''Return roughly how many bytes all of the columns are using.'''
+
+        return sum(column.memory_usage() for column in self.columns.values())
+
+
+class WorldView:
+    '''The block queries shared by ChunkManager and Snapshot.
+
+    Subclasses have a columns dict of (chunk x, chunk z) --> column.  The
+    queries only ever read it.
+    '''
+
+    def get_slice(self, x, y, z):
+        '''Return the slice holding the block at x, y, z (or None).'''
+
+        if not 0 <= y < 256:
+            return None
+
+        column = self.columns.get((x >> 4, z >> 4))
+
+        if column is None:
+            return None
+
+        return column.slices[y >> 4]
+
+    def get_block(self, x, y, z):
+        '''Return the block state at x, y, z - or None if that part of the
+        world isn't loaded.'''
+
+        if not 0 <= y < 256:
+            return None
+
+        column = self.columns.get((x >> 4, z >> 4))
+
+        if column is None:
+            return None
+
+        strata = column.slices[y >> 4]
+
+        if strata is None:
+            return 0
+
+        return strata.blocks[((y & 15) << 8) | ((z & 15) << 4) | (x & 15)]
+
+    def is_solid(self, x, y, z):
+        '''Return True if the block at x, y, z can be stood on (None if that
+        part of the world isn't loaded).'''
+
+        column = self.columns.get((x >> 4, z >> 4))
+
+        if column is None or not 0 <= y < 256:
+            return None
+
+        index = (y << 8) | ((z & 15) << 4) | (x & 15)
+
+        return (column.layers()[0][index >> 3] >> (index & 7)) & 1 == 1
+
+    def solid_blocks(self, min_x, min_y, min_z, max_x, max_y, max_z):
+        '''Return the (x, y, z) of every solid block in the box (inclusive,
+        in block coordinates), as is_solid would pick them out.
+
+        The bits for a whole x, z run of blocks are sliced out of the
+        column's bitmap in one go, rather than looking each block up.'''
+
+        min_y = max(min_y, 0)
+        max_y = min(max_y, 255)
+
+        found = []
+
+        if min_y > max_y:
+            return found
+
+        for x in range(min_x, max_x + 1):
+
+            table = _BIT_TABLES[x & 7]
+
+            for z in range(min_z, max_z + 1):
+
+                column = self.columns.get((x >> 4, z >> 4))
+
+                if column is None:
+                    continue
+
+                start = ((min_y << 8) | ((z & 15) << 4) | (x & 15)) >> 3
+                stop = start + (max_y - min_y) * _LAYER_BYTES + 1
+
+                bits = column.layers()[0][start:stop:_LAYER_BYTES].translate(table)
+
+                y = bits.find(1)
+
+                while y != -1:
+                    found.append((x, min_y + y, z))
+                    y = bits.find(1, y + 1)
+
+        return found
+
+    def is_passable(self, x, y, z):
+        '''Return True if the block at x, y, z can safely be walked through.'''
+
+        column = self.columns.get((x >> 4, z >> 4))
+
+        if column is None or not 0 <= y < 256:
+            return False
+
+        index = (y << 8) | ((z & 15) << 4) | (x & 15)
+
+        return (column.layers()[1][index >> 3] >> (index & 7)) & 1 == 1
+
+    def is_standable(self, x, y, z):
+        '''Return True if a player's feet can be at x, y, z: there's something
+        solid underneath and room for their body and head.'''
+
+        column = self.columns.get((x >> 4, z >> 4))
+
+        if column is None or not 0 <= y < 256:
+            return False
+
+        index = (y << 8) | ((z & 15) << 4) | (x & 15)
+
+        return (column.layers()[2][index >> 3] >> (index & 7)) & 1 == 1
+
+    def height(self, x, z):
+        '''Return the y coordinate just above the highest solid block at x, z
+        (None if the column isn't loaded).'''
+
+        column = self.columns.get((x >> 4, z >> 4))
+
+        if column is None:
+            return None
+
+        return column.heightmap[((z & 15) << 4) | (x & 15)]
+
+    def slice_version(self, chunk_x, chunk_z, slice_index):
+        '''Return the version of a slice (None if the column isn't loaded,
+        0 if the slice is empty).'''
+
+        column = self.columns.get((chunk_x, chunk_z))
+
+        if column is None:
+            return None
+
+        strata = column.slices[slice_index]
+
+        return 0 if strata is None else strata.version
+
+    def _sections(self, block_types, origin, radius):
+        '''Return (distance, x, y, z, slice) for the slices within radius of
+        origin holding any of block_types, nearest first - where distance is
+        to the nearest point of the slice and x, y, z is its lowest corner.'''
+
+        ox, oy, oz = origin.x, origin.y, origin.z
+
+        sections = []
+
+        for chunk_x in range(math.floor(ox - radius) >> 4, (math.floor(ox + radius) >> 4) + 1):
+            for chunk_z in range(math.floor(oz - radius) >> 4, (math.floor(oz + radius) >> 4) + 1):
+
+                column = self.columns.get((chunk_x, chunk_z))
+
+                if column is None:
+                    continue
+
+                for index in range(max(math.floor(oy - radius) >> 4, 0),
+                                   min(math.floor(oy + radius) >> 4, SLICES_PER_COLUMN - 1) + 1):
+
+                    strata = column.slices[index]
+
+                    if strata is None or not strata.contains(block_types):
+                        continue
+
+                    x, y, z = chunk_x << 4, index << 4, chunk_z << 4
+
+                    dx = max(x - ox, 0, ox - x - 16)
+                    dy = max(y - oy, 0, oy - y - 16)
+                    dz = max(z - oz, 0, oz - z - 16)
+
+                    distance = math.sqrt(dx * dx + dy * dy + dz * dz)
+
+                    if distance <= radius:
+                        sections.append((distance, x, y, z, strata))
+
+        sections.sort(key=lambda section: section[0])
+
+        return sections
+
+    def find(self, block_types, origin, radius):
+        '''Return the (x, y, z) of every block with an ID (any metadata) in
+        block_types within radius of origin (measured to the block's
+        centre), nearest first.
+
+        Only the loaded slices that hold one of block_types are looked
+        through.
+        '''
+
+        ox, oy, oz = origin.x - 0.5, origin.y - 0.5, origin.z - 0.5
+
+        found = []
+
+        for _, base_x, base_y, base_z, strata in self._sections(block_types, origin, radius):
+
+            for index in strata.find(block_types):
+
+                x = base_x + (index & 15)
+                y = base_y + (index >> 8)
+                z = base_z + ((index >> 4) & 15)
+
+                squared = (x - ox) * (x - ox) + (y - oy) * (y - oy) + (z - oz) * (z - oz)
+
+                if squared <= radius * radius:
+                    found.append((squared, (x, y, z)))
+
+        found.sort(key=lambda match: match[0])
+
+        return [location for _, location in found]
+
+    def find_nearest(self, block_types, origin, radius):
+        '''Return the (x, y, z) of the nearest block with an ID in
+        block_types within radius of origin, or None.
+
+        Slices are looked through nearest first, stopping at the first one
+        that's further away than the nearest block found so far.
+        '''
+
+        ox, oy, oz = origin.x - 0.5, origin.y - 0.5, origin.z - 0.5
+
+        nearest = None
+        limit = radius * radius
+
+        for distance, base_x, base_y, base_z, strata in self._sections(block_types, origin, radius):
+
+            if distance * distance > limit:
+                break
+
+            for index in strata.find(block_types):
+
+                x = base_x + (index & 15)
+                y = base_y + (index >> 8)
+                z = base_z + ((index >> 4) & 15)
+
+                squared = (x - ox) * (x - ox) + (y - oy) * (y - oy) + (z - oz) * (z - oz)
+
+                if squared < limit or (nearest is None and squared == limit):
+                    nearest = (x, y, z)
+                    limit = squared
+
+        return nearest
+
+
+class Snapshot(WorldView):
+    '''A consistent, read-only view of a ChunkManager's columns as they were
+    when it was taken, that can be read from other threads (e.g. by a
+    Pathfinder) without locking while the ChunkManager carries on being
+    updated.'''
+
+    def __init__(self, columns):
+
+        self.columns = columns
+
+
+class ChunkManager(WorldView):
+    '''A robot's view of the world: a set of columns, each made up of
+    sixteen 16x16x16 slices of block state IDs.
+
+    The columns themselves belong to a World, which can be shared with
+    other robots on the same server so that each column is only stored
+    (and kept up to date) once.
+
+    Whenever the robot moves into another chunk, the columns within
+    warm_distance chunks that the server hasn't sent (yet) are picked up
+    from other robots or the cache - so pathfinding can use what was seen
+    before as soon as we know where we are.  The block queries never load
+    or unload anything.
+
+    Memory can be bounded in two ways: columns further than
+    unload_distance chunks from the centre (the robot) are unloaded, and
+    when the columns use more than memory_budget bytes the furthest (and
+    then least recently used) are unloaded until they fit.  Unloaded
+    columns are saved to the cache, if there is one - but evicted ones the
+    server hasn't unloaded aren't warmed from it again until the server
+    resends them, as the changes to them are no longer being applied.
+    '''
+
+    def __init__(self, entity_manager=None, registry=None, cache=None,
+                 memory_budget=None, unload_distance=None, world=None,
+                 warm_distance=WARM_DISTANCE):
+
+        self.entity_manager = entity_manager
+
+        self.world = world or World(registry=registry, cache=cache)
+        self.registry = self.world.registry
+        self.cache = self.world.cache
+
+        self.memory_budget = memory_budget
+        self.unload_distance = unload_distance
+        self.warm_distance = warm_distance
+
+        self.dimension = OVERWORLD
 
         self.columns = {}
 
+        # the chunk the robot is in (None until we know where that is)
+        self.center = None
+
+    def flush(self):
+        '''Let go of every column (they're saved to the cache once nobody
+        else is using them).'''
+
+        for chunk_x, chunk_z in list(self.columns):
+            self.unload(chunk_x, chunk_z)
+
+    def save(self):
+        '''Write the columns that have changed to the cache (if there is one).'''
+
+        self.world.save()
+
+    def warm(self, chunk_x, chunk_z, distance):
+        '''Pick up the columns within distance chunks of chunk_x, chunk_z
+        that the server hasn't sent (yet) from other robots or the cache.'''
+
+        for x in range(chunk_x - distance, chunk_x + distance + 1):
+            for z in range(chunk_z - distance, chunk_z + distance + 1):
+
+                if (x, z) in self.columns:
+                    continue
+
+                column = self.world.acquire_existing(self.dimension, x, z)
+
+                if column is not None:
+                    self.columns[(x, z)] = column
+                    column.last_used = next(_clock)
+
+    #
+    # memory management
+    #
+
+    def memory_usage(self):
+        '''Return roughly how many bytes the columns are using.'''
+
+        return sum(column.memory_usage() for column in self.columns.values())
+
+    def set_center(self, x, z):
+        '''Tell the manager where the robot is (in block coordinates).'''
+
+        center = (math.floor(x) >> 4, math.floor(z) >> 4)
+
+        if center != self.center:
+
+            self.center = center
+
+            distance = self.warm_distance
+
+            if self.unload_distance is not None:
+                distance = min(distance, self.unload_distance)
+
+            self.warm(center[0], center[1], distance)
+
+            self.evict()
+
+    def _distance(self, column):
+
+        if self.center is None:
+            return 0
+
+        return max(abs(column.x - self.center[0]), abs(column.z - self.center[1]))
+
+    def evict(self):
+        '''Unload the columns that are too far away, and then the furthest
+        and least recently used columns until we're within the budget.'''
+
+        if self.unload_distance is not None and self.center is not None:
+
+            for column in list(self.columns.values()):
+                if self._distance(column) > self.unload_distance:
+                    self.unload(column.x, column.z, stale=True)
+
+        if self.memory_budget is None:
+            return
+
+        usage = self.memory_usage()
+
+        if usage <= self.memory_budget:
+            return
+
+        candidates = sorted(self.columns.values(), key=lambda column: (-self._distance(column), column.last_used))
+
+        for column in candidates:
+
+            if usage <= self.memory_budget:
+                break
+
+            usage -= column.memory_usage()
+
+            self.unload(column.x, column.z, stale=True)
+
     def get(self, chunk_x, chunk_z):
 
-        key = self._make_column_key(chunk_x, chunk_z)
+        key = (chunk_x, chunk_z)
+
+        column = self.columns.get(key)
+
+        if column is None:
+            column = self.columns[key] = self.world.acquire(self.dimension, chunk_x, chunk_z)
+
+        column.last_used = next(_clock)
+
+        return column
+
+    def get_column(self, chunk_x, chunk_z):
+        '''Return the column, or None if it isn't loaded.'''
+
+        column = self.columns.get((chunk_x, chunk_z))
 
-        return self.columns.setdefault(key, Column(x=chunk_x, z=chunk_z))
+        if column is not None:
+            column.last_used = next(_clock)
 
-    def unload(self, chunk_x, chunk_z):
+        return column
 
-        key = self._make_column_key(chunk_x, chunk_z)
+    def snapshot(self, center=None, distance=None):
+        '''Return a Snapshot of the columns (only the ones within distance
+        chunks of center, a chunk x, z, if it's given).
+
+        This needs to be called on the thread applying the changes (i.e. from
+        a listener) - after that the snapshot can be handed to any thread.'''
+
+        if center is None:
+            return Snapshot({key: ColumnSnapshot(column) for key, column in self.columns.items()})
+
+        columns = {}
+
+        for chunk_x in range(center[0] - distance, center[0] + distance + 1):
+            for chunk_z in range(center[1] - distance, center[1] + distance + 1):
+
+                column = self.columns.get((chunk_x, chunk_z))
+
+                if column is not None:
+                    columns[(chunk_x, chunk_z)] = ColumnSnapshot(column)
+
+        return Snapshot(columns)
+
+    def unload(self, chunk_x, chunk_z, stale=False):
+
+        if self.columns.pop((chunk_x, chunk_z), None) is not None:
+            self.world.release(self.dimension, chunk_x, chunk_z, stale)
+
+    def set_block(self, x, y, z, block_state):
+
+        column = self.columns.get((x >> 4, z >> 4))
+
+        if column is None or not 0 <= y < 256:
+            return
+
+        column.set_block(x & 15, y, z & 15, block_state)
+
+    def set_blocks(self, chunk_x, chunk_z, changes):
+        '''Apply a batch of (x, y, z, block state) changes (column relative
+        coordinates) to a single column, bumping each affected slice's
+        version once.'''
+
+        column = self.columns.get((chunk_x, chunk_z))
+
+        if column is None:
+            return
+
+        by_slice = {}
+
+        for x, y, z, block_state in changes:
+
+            if not 0 <= y < 256:
+                continue
+
+            by_slice.setdefault(y >> 4, []).append((((y & 15) << 8) | (z << 4) | x, block_state))
+
+        for slice_index, updates in by_slice.items():
+            column.set_blocks(slice_index, updates)
+
+    #
+    # packet handlers
+    #
+
+    @Listener(PacketEvent, area=State.PLAY, key='login')
+    def on_login(self, event):
+
+        self.flush()
+        self.dimension = event.packet.fields.dimension
 
-        del (self.columns[key])
+        # so the next set_center warms the columns around us again
+        self.center = None
 
-    def _make_column_key(self, chunk_x, chunk_z):
+    @Listener(PacketEvent, area=State.PLAY, key='respawn')
+    def on_respawn(self, event):
 
-        return '{}:{}'.format(chunk_x, chunk_z)
+        dimension = event.packet.fields.dimension
+
+        if dimension != self.dimension:
+            self.flush()
+            self.dimension = dimension
+            self.center = None
+
+    @Listener(PacketEvent, area=State.PLAY, key='map_chunk')
+    def on_map_chunk(self, event):
+
+        fields = event.packet.fields
+
+        if fields.groundUp:
+            self.world.resent(self.dimension, fields.x, fields.z)
+
+        if fields.groundUp and (fields.x, fields.z) not in self.columns and self.world.is_live(self.dimension, fields.x, fields.z):
+
+            # another robot already has this column, and is applying the
+            # changes to it, so there's no need to decode it again
+            self.get(fields.x, fields.z)
+
+            if self.entity_manager is not None:
+                self.entity_manager.set_block_entities(fields.x, fields.z, fields.blockEntities)
+
+            self.evict()
+
+            return
+
+        parse_chunk_data(fields.x, fields.z, fields.groundUp,
+                         slices_in_bitmask(fields.bitMap), fields.chunkData,
+                         fields.blockEntities, self, self.entity_manager,
+                         overworld=self.dimension == OVERWORLD)
+
+        self.evict()
+
+    @Listener(PacketEvent, area=State.PLAY, key='unload_chunk')
+    def on_unload_chunk(self, event):
+
+        fields = event.packet.fields
+
+        self.unload(fields.chunkX, fields.chunkZ)
+
+    @Listener(PacketEvent, area=State.PLAY, key='block_change')
+    def on_block_change(self, event):
+
+        fields = event.packet.fields
+        location = fields.location
+
+        self.set_block(location.x, location.y, location.z, fields.type)
+
+    @Listener(PacketEvent, area=State.PLAY, key='multi_block_change')
+    def on_multi_block_change(self, event):
+
+        fields = event.packet.fields
+
+        self.set_blocks(fields.chunkX, fields.chunkZ, [
+            (record['horizontalPos'] >> 4, record['y'], record['horizontalPos'] & 15, record['blockId'])
+            for record in fields.records
+        ])
+
+
+def build_layers(slices):
+    '''Return the (solid, passable, standable) bitmaps for a column's slices.'''
+
+    solid = 0
+    passable = 0
+
+    for index, strata in enumerate(slices):
+
+        shift = index * BLOCKS_PER_SLICE
+
+        if strata is None:
+            passable |= ALL_BLOCKS << shift
+        else:
+            solid |= strata.solid << shift
+            passable |= strata.passable << shift
+
+    # the sky above the column is open
+    head_room = (passable | (LAYER << BLOCKS_PER_COLUMN)) >> BLOCKS_PER_LAYER
+
+    standable = (solid << BLOCKS_PER_LAYER) & passable & head_room
+
+    size = BLOCKS_PER_COLUMN // 8
+
+    return (solid.to_bytes(size, 'little'),
+            passable.to_bytes(size, 'little'),
+            standable.to_bytes(size, 'little'))
 
 
 class Column:
+    '''A 16x256x16 column of slices, along with layers derived from their
+    blocks:
+
+    - a heightmap (the y just above the highest solid block for each x, z)
+    - solid, passable and standable bitmaps with a bit per block, indexed
+      the same way as the blocks ((y << 8) | (z << 4) | x)
 
-    x = None
-    z = None
+    The heightmap is kept up to date as blocks change, the bitmaps are
+    rebuilt (from each slice's masks) the next time they're asked for.
 
-    slices = {}
+    Columns loaded from a WorldCache have cached_at set to when they were
+    stored, until the server sends them again.
+    '''
 
-    def __init__(self, x=None, z=None):
+    def __init__(self, x=None, z=None, registry=None):
 
         self.x = x
         self.z = z
 
-    def get_slice(self, y):
+        self.registry = registry or BlockRegistry.default()
+
+        self.slices = [None] * SLICES_PER_COLUMN
+
+        self.biomes = None
+
+        # 0 to 256, so it doesn't fit in a byte
+        self.heightmap = array('H', bytes(2 * BLOCKS_PER_LAYER))
+
+        self._layers = None
+
+        # whether there are changes that haven't been saved to the cache
+        self.dirty = False
+
+        self.cached_at = None
+
+        # when the column was last fetched with ChunkManager.get or
+        # get_column (the block queries don't count, to keep them cheap)
+        self.last_used = 0
+
+        self._size = None
+
+    def _changed(self):
+
+        self._layers = None
+        self._size = None
+        self.dirty = True
+
+    def memory_usage(self):
+        '''Return roughly how many bytes the column is using.'''
+
+        if self._size is None:
+
+            size = sys.getsizeof(self.heightmap)
+
+            if self.biomes is not None:
+                size += sys.getsizeof(self.biomes)
+
+            if self._layers is not None:
+                size += sum(sys.getsizeof(layer) for layer in self._layers)
+
+            for strata in self.slices:
+                if strata is not None:
+                    size += (sys.getsizeof(strata.blocks) + sys.getsizeof(strata.solid) +
+                             sys.getsizeof(strata.passable) + sys.getsizeof(strata.counts))
+
+            self._size = size
+
+        return self._size
 
-        return self.slices.setdefault(y, StrataSlice(y=y))
+    def load(self, sections):
+        '''Replace all of the slices with the given arrays of block states
+        (None for empty slices).'''
+
+        self.slices = [
+            None if blocks is None else StrataSlice(y=index * 16, blocks=blocks, registry=self.registry)
+            for index, blocks in enumerate(sections)
+        ]
+
+        self._layers = None
+        self._size = None
+
+        self.update_heightmap()
+
+    def get_slice(self, index):
+        '''Return slice number index (0-15), creating an empty one if needed.'''
+
+        strata = self.slices[index]
+
+        if strata is None:
+            strata = self.slices[index] = StrataSlice(y=index * 16, registry=self.registry)
+
+        return strata
+
+    def set_slice(self, index, blocks):
+        '''Replace slice number index with the given array of block states
+        (or None for an empty slice).'''
+
+        if blocks is None:
+            self.slices[index] = None
+        else:
+            self.slices[index] = StrataSlice(y=index * 16, blocks=blocks, registry=self.registry)
+
+        self._changed()
+
+        self.update_heightmap()
+
+    def set_block(self, x, y, z, block_state):
+
+        index = y >> 4
+        block_index = ((y & 15) << 8) | (z << 4) | x
+
+        strata = self.slices[index]
+
+        # robots sharing a World each get sent the same changes
+        if (strata.blocks[block_index] if strata is not None else 0) == block_state:
+            return
+
+        self.slices[index] = self.get_slice(index).with_blocks(((block_index, block_state),))
+
+        self._changed()
+
+        self._update_height(x, y, z, block_state)
+
+    def set_blocks(self, index, updates):
+        '''Apply a batch of (index, block state) updates to slice number
+        index.'''
+
+        strata = self.slices[index]
+
+        if strata is None:
+            updates = [(block_index, block_state) for block_index, block_state in updates if block_state != 0]
+        else:
+            blocks = strata.blocks
+            updates = [(block_index, block_state) for block_index, block_state in updates if blocks[block_index] != block_state]
+
+        if not updates:
+            return
+
+        self.slices[index] = self.get_slice(index).with_blocks(updates)
+
+        self._changed()
+
+        base = index * 16
+
+        for block_index, block_state in updates:
+            self._update_height(block_index & 15, base + (block_index >> 8), (block_index >> 4) & 15, block_state)
+
+    def _update_height(self, x, y, z, block_state):
+
+        column = (z << 4) | x
+        height = self.heightmap[column]
+
+        if self.registry.is_solid(block_state):
+
+            if y >= height:
+                self.heightmap[column] = y + 1
+
+        elif y + 1 == height:
+
+            # we removed the top block, look for the next one down
+            self.heightmap[column] = self._scan_height(column, y - 1)
+
+    def _scan_height(self, column, y):
+
+        while y >= 0:
+
+            strata = self.slices[y >> 4]
+
+            if strata is None:
+                y = (y & ~15) - 1
+                continue
+
+            if (strata.solid >> (((y & 15) << 8) | column)) & 1:
+                return y + 1
+
+            y -= 1
+
+        return 0
+
+    def update_heightmap(self):
+        '''Recompute the whole heightmap.'''
+
+        heightmap = array('H', bytes(2 * BLOCKS_PER_LAYER))
+
+        remaining = LAYER
+
+        for index in range(SLICES_PER_COLUMN - 1, -1, -1):
+
+            strata = self.slices[index]
+
+            if strata is None or not strata.solid:
+                continue
+
+            solid = strata.solid
+
+            for layer in range(15, -1, -1):
+
+                found = (solid >> (layer << 8)) & remaining
+
+                if not found:
+                    continue
+
+                remaining &= ~found
+
+                height = index * 16 + layer + 1
+
+                while found:
+
+                    lowest = found & -found
+
+                    heightmap[lowest.bit_length() - 1] = height
+
+                    found ^= lowest
+
+                if not remaining:
+                    break
+
+            if not remaining:
+                break
+
+        # only swapped in once it's complete
+        self.heightmap = heightmap
+
+    def layers(self):
+        '''Return the (solid, passable, standable) bitmaps for the column.'''
+
+        if self._layers is None:
+
+            self._layers = build_layers(self.slices)
+
+            self._size = None
+
+        return self._layers
+
+
+class ColumnSnapshot:
+    '''A read-only copy of a Column: since slices are replaced rather than
+    changed, only the list of slices and the heightmap need copying.'''
+
+    def __init__(self, column):
+
+        self.x = column.x
+        self.z = column.z
+
+        self.slices = tuple(column.slices)
+        self.heightmap = array('H', column.heightmap)
+
+        self._layers = column._layers
+
+    def layers(self):
+
+        if self._layers is None:
+            self._layers = build_layers(self.slices)
+
+        return self._layers
 
 
 class StrataSlice:
     '''
     This is a 16x16x16 block within a column (chunk).
+
+    Blocks are stored as a flat array of block state IDs indexed by
+    (y << 8) | (z << 4) | x, along with solid and passable bitmasks (ints
+    with the same indexing) and an index of how many of each block state
+    the slice holds (so searches can skip slices without what they're
+    looking for).
+
+    A slice isn't changed once it's been made: with_blocks() returns a new
+    slice (with a new version) to replace it in its column, so anything
+    still holding the old one (e.g. a Snapshot) sees the blocks as they
+    were.
     '''
 
-    y = None
+    def __init__(self, y=None, blocks=None, registry=None, masks=None, counts=None):
 
-    # if all blocks in this slice are the same, then this will be
-    # the block type
-    fill_block = None
+        self.y = y
 
-    blocks = {}
+        self.registry = registry or BlockRegistry.default()
 
-    def __init__(self, y=None):
+        if blocks is None:
+            blocks = array('H', bytes(2 * BLOCKS_PER_SLICE))
 
-        self.y = y
+        self.blocks = blocks
+
+        self.solid, self.passable = masks or self.registry.masks(blocks)
+
+        # block state --> how many there are
+        self.counts = Counter(blocks) if counts is None else counts
+
+        self.version = next(_versions)
+
+    def get_block(self, x, y, z):
+
+        return self.blocks[(y << 8) | (z << 4) | x]
+
+    def with_blocks(self, updates):
+        '''Return a copy of the slice with a batch of (index, block state)
+        updates applied.'''
+
+        blocks = self.blocks[:]
+        solid = self.solid
+        passable = self.passable
+
+        counts = self.counts.copy()
+
+        is_solid = self.registry.is_solid
+        is_passable = self.registry.is_passable
+
+        for index, block_id in updates:
+
+            old = blocks[index]
+
+            counts[old] -= 1
+
+            if not counts[old]:
+                del counts[old]
+
+            counts[block_id] += 1
+
+            blocks[index] = block_id
+
+            bit = 1 << index
+
+            if is_solid(block_id):
+                solid |= bit
+            else:
+                solid &= ~bit
+
+            if is_passable(block_id):
+                passable |= bit
+            else:
+                passable &= ~bit
+
+        return StrataSlice(y=self.y, blocks=blocks, registry=self.registry, masks=(solid, passable), counts=counts)
+
+    def contains(self, block_types):
+        '''Return True if the slice holds any blocks with IDs (any metadata)
+        in block_types.'''
+
+        return any(block_state >> 4 in block_types for block_state in self.counts)
+
+    def find(self, block_types):
+        '''Yield the indices of the blocks with IDs in block_types.'''
+
+        data = self.blocks.tobytes()
+
+        for block_state, count in self.counts.items():
+
+            if block_state >> 4 not in block_types:
+                continue
 
-    def set_block(self, x, y, z, block_id):
+            pattern = array('H', (block_state,)).tobytes()
 
-        key = self._make_key(x, y, z)
+            position = data.find(pattern)
 
-        self.blocks[key] = block_id
+            while count:
 
-    def _make_key(self, x, y, z):
+                # matches have to start on a block, not halfway through one
+                if not position & 1:
+                    yield position >> 1
+                    count -= 1
 
-        return '{}:{}:{}'.format(x, y, z)
+                position = data.find(pattern, position + 1)
@@ -0,0 +1,83 @@
+'''
+'''
+
+import hashlib
+import json
+import os
+import pickle
+
+# where the processed minecraft-data files are kept between runs
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'mc-roboto')
+
+# bump this to ignore everything cached by an older version
+FORMAT_VERSION = 1
+
+
+def cache_path(source, kind, directory):
+    '''Return the file that build()'s result for source would be cached in.
+
+    The name depends on the source's path, size and modification time, so
+    an updated minecraft-data checkout is picked up automatically.'''
+
+    stat = os.stat(source)
+
+    key = '{}|{}|{}|{}|{}'.format(os.path.abspath(source), stat.st_size,
+                                  stat.st_mtime_ns, kind, FORMAT_VERSION)
+
+    return os.path.join(directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.pickle')
+
+
+def cached(source, build, kind, directory=DEFAULT_DIRECTORY):
+    '''Return build(source), using the pickled result from an earlier run
+    (of any process) if there is one.
+
+    kind identifies what build() makes (and its version), so different
+    things can be built from the same source.  Pass a directory of None
+    to not cache at all.'''
+
+    if directory is None:
+        return build(source)
+
+    path = cache_path(source, kind, directory)
+
+    try:
+        with open(path, 'rb') as fin:
+            return pickle.load(fin)
+    except FileNotFoundError:
+        pass
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        # a corrupt (or out of date) entry is rebuilt
+        pass
+
+    value = build(source)
+
+    try:
+
+        os.makedirs(directory, exist_ok=True)
+
+        # write and rename so that other processes never see half a file
+        temp_path = '{}.{}.tmp'.format(path, os.getpid())
+
+        with open(temp_path, 'wb') as fout:
+            pickle.dump(value, fout, pickle.HIGHEST_PROTOCOL)
+
+        os.replace(temp_path, path)
+
+    except OSError:
+        # not being able to cache isn't fatal
+        pass
+
+    return value
+
+
+def _read_json(path):
+
+    with open(path, 'r') as fin:
+        return json.load(fin)
+
+
+def load_json(path, directory=DEFAULT_DIRECTORY):
+    '''Return the contents of a JSON file (cached as a pickle, which is a lot
+    quicker to load than the large minecraft-data files).'''
+
+    return cached(path, _read_json, 'json', directory)
@@ -0,0 +1,90 @@
+'''
+'''
+
+
+class MovementEncoder:
+    '''Works out which movement packet (if any) to send each tick.
+
+    The server is told about whatever has changed since the last packet
+    using the smallest packet that covers it - flying (just on the ground
+    or not), position, look or position_look - and nothing is sent when
+    nothing has changed, other than the position every POSITION_INTERVAL
+    ticks (the same as the vanilla client does) so the server knows we're
+    still there.
+    '''
+
+    POSITION_INTERVAL = 20
+
+    # smaller movements than this aren't worth telling the server about
+    MIN_MOVEMENT = 0.03
+
+    def __init__(self, flying_packet, position_packet, look_packet, position_look_packet):
+
+        self.flying_packet = flying_packet
+        self.position_packet = position_packet
+        self.look_packet = look_packet
+        self.position_look_packet = position_look_packet
+
+        self.reset()
+
+    def reset(self):
+        '''Forget what's been sent, so that the next packet is a position_look
+        (i.e. after the server has moved us).'''
+
+        self.last_position = None
+        self.last_look = None
+        self.last_on_ground = None
+
+        self.ticks_since_position = 0
+
+    def encode(self, position, facing, on_ground=True):
+        '''Return the packet to send for this tick, or None.'''
+
+        self.ticks_since_position += 1
+
+        current = (position.x, position.y, position.z)
+        look = (facing.yaw, facing.pitch)
+
+        if self.last_position is None or self.ticks_since_position >= self.POSITION_INTERVAL:
+            moved = True
+        else:
+
+            dx = current[0] - self.last_position[0]
+            dy = current[1] - self.last_position[1]
+            dz = current[2] - self.last_position[2]
+
+            moved = dx * dx + dy * dy + dz * dz > self.MIN_MOVEMENT * self.MIN_MOVEMENT
+
+        turned = look != self.last_look
+
+        if moved and turned:
+            packet = self.position_look_packet()
+        elif moved:
+            packet = self.position_packet()
+        elif turned:
+            packet = self.look_packet()
+        elif on_ground != self.last_on_ground:
+            packet = self.flying_packet()
+        else:
+            return None
+
+        fields = packet.fields
+
+        if moved:
+
+            fields.x, fields.y, fields.z = current
+
+            self.last_position = current
+            self.ticks_since_position = 0
+
+        if turned:
+
+            fields.yaw, fields.pitch = look
+
+            self.last_look = look
+
+        fields.onGround = on_ground
+
+        self.last_on_ground = on_ground
+
+        return packet
@@ -1,17 +1,214 @@
+from array import array
 import gzip
 import inspect
 import sys
 import struct
 
-# DEBUG
-import pprint
+
+TAG_END = 0
+TAG_STRING = 8
+TAG_LIST = 9
+TAG_COMPOUND = 10
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+_INT32 = struct.Struct('>l')
+_UINT16 = struct.Struct('>H')
+
+# payload size of the fixed width tags, indexed by tag type
+_FIXED_PAYLOAD_SIZE = (None, 1, 2, 4, 8, 4, 8)
+
+# struct format character of the fixed width tags, indexed by tag type
+_FIXED_PAYLOAD_FORMAT = (None, 'b', 'h', 'i', 'q', 'f', 'd')
+
+_FIXED_PAYLOAD_STRUCT = (None,) + tuple(struct.Struct('>' + fmt) for fmt in _FIXED_PAYLOAD_FORMAT[1:])
+
+# array typecode of the array tags, whose elements are big-endian
+_ARRAY_TYPECODE = {7: 'b', 11: 'i', 12: 'q'}
+
+_SWAP_BYTES = sys.byteorder == 'little'
+
+# element size of the array tags (byte, int and long arrays)
+_ARRAY_ELEMENT_SIZE = {7: 1, 11: 4, 12: 8}
+
+
+def payload_end(data, offset, tag_type):
+    '''Return the offset just past the payload of a tag of type tag_type
+    that starts at offset.
+
+    Nothing is decoded or copied - this just walks the structure (without
+    recursion) so that callers can find the extent of some NBT data.'''
+
+    # each entry is [element type, remaining count] for lists and
+    # [TAG_COMPOUND, None] for compounds
+    stack = []
+
+    while True:
+
+        if tag_type <= 6:
+
+            if tag_type == TAG_END:
+                raise ValueError('Unexpected end tag at offset {}.'.format(offset))
+
+            offset += _FIXED_PAYLOAD_SIZE[tag_type]
+
+        elif tag_type == 8:
+
+            offset += 2 + _UINT16.unpack_from(data, offset)[0]
+
+        elif tag_type in _ARRAY_ELEMENT_SIZE:
+
+            count = _INT32.unpack_from(data, offset)[0]
+            offset += 4 + count * _ARRAY_ELEMENT_SIZE[tag_type]
+
+        elif tag_type == TAG_LIST:
+
+            element_type = data[offset]
+            count = _INT32.unpack_from(data, offset + 1)[0]
+            offset += 5
+
+            if count > 0:
+
+                if 0 < element_type <= 6:
+                    offset += count * _FIXED_PAYLOAD_SIZE[element_type]
+                else:
+                    stack.append([element_type, count])
+
+        elif tag_type == TAG_COMPOUND:
+
+            stack.append([TAG_COMPOUND, None])
+
+        else:
+
+            raise ValueError('Unknown tag type {} at offset {}.'.format(tag_type, offset))
+
+        # figure out what the next payload to skip is
+        while stack:
+
+            top = stack[-1]
+
+            if top[1] is None:
+
+                tag_type = data[offset]
+                offset += 1
+
+                if tag_type == TAG_END:
+                    stack.pop()
+                    continue
+
+                offset += 2 + _UINT16.unpack_from(data, offset)[0]
+                break
+
+            if top[1] == 0:
+                stack.pop()
+                continue
+
+            top[1] -= 1
+            tag_type = top[0]
+            break
+
+        else:
+
+            return offset
+
+
+def tag_end(data, offset):
+    '''Return the offset just past the named tag (type, name, payload)
+    starting at offset.'''
+
+    tag_type = data[offset]
+
+    if tag_type == TAG_END:
+        return offset + 1
+
+    offset += 3 + _UINT16.unpack_from(data, offset + 1)[0]
+
+    return payload_end(data, offset, tag_type)
+
+
+def decode_string(data):
+    '''Decode a string payload - NBT uses Java's "modified" UTF-8, which
+    only differs from UTF-8 for NUL and characters outside the BMP.'''
+
+    data = bytes(data)
+
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+
+        # NUL is encoded as two bytes and supplementary characters as a
+        # surrogate pair (each surrogate encoded separately)
+        data = data.replace(b'\xc0\x80', b'\x00')
+
+        return data.decode('utf-8', 'surrogatepass').encode('utf-16', 'surrogatepass').decode('utf-16')
+
+
+def decode_array(data, offset, tag_type, count):
+    '''Decode count big-endian elements of an array tag in one go.'''
+
+    values = array(_ARRAY_TYPECODE[tag_type])
+
+    values.frombytes(data[offset:offset + count * values.itemsize])
+
+    if _SWAP_BYTES and values.itemsize > 1:
+        values.byteswap()
+
+    return values
+
+
+def encode_string(value):
+    '''Encode a string payload (without its length) in modified UTF-8.'''
+
+    if max(value, default='\x00') >= '\U00010000':
+
+        # supplementary characters are written as a surrogate pair
+        value = ''.join(
+            char if char < '\U00010000' else
+            chr(0xd800 + ((ord(char) - 0x10000) >> 10)) + chr(0xdc00 + ((ord(char) - 0x10000) & 0x3ff))
+            for char in value)
+
+        data = value.encode('utf-8', 'surrogatepass')
+
+    else:
+        data = value.encode('utf-8')
+
+    return data.replace(b'\x00', b'\xc0\x80')
+
+
+def encode_array(values, tag_type):
+    '''Return the big-endian bytes of the elements of an array tag, given an
+    array.array, a buffer of native-endian elements or a sequence of ints.'''
+
+    typecode = _ARRAY_TYPECODE[tag_type]
+
+    if isinstance(values, array) and values.typecode == typecode:
+
+        if not _SWAP_BYTES or values.itemsize == 1:
+            return values.tobytes()
+
+        values = array(typecode, values)
+
+    elif isinstance(values, (bytes, bytearray, memoryview)):
+
+        buffer = values
+        values = array(typecode)
+        values.frombytes(buffer)
+
+    else:
+        values = array(typecode, values)
+
+    if _SWAP_BYTES and values.itemsize > 1:
+        values.byteswap()
+
+    return values.tobytes()
 
 
 class Buffer:
+    '''A read position within some NBT data, which is never copied.'''
 
     def __init__(self, data):
 
-        self._buffer = data
+        self._buffer = memoryview(data)
         self._buffer_length = len(data)
         self._ptr = 0
 
@@ -22,9 +219,6 @@ class Buffer:
         retval = self._buffer[self._ptr: self._ptr + amount]
         self._ptr += amount
 
-        print('read: ', amount)
-        print([x for x in retval])
-
         return retval
 
     @property
@@ -33,11 +227,17 @@ class Buffer:
 
     def decode_short(self):
 
-        return struct.unpack('>H', self.consume(2))[0]
+        value = _UINT16.unpack_from(self._buffer, self._ptr)[0]
+        self._ptr += 2
+
+        return value
 
     def decode_byte(self):
 
-        return struct.unpack('!b', self.consume(1))[0]
+        value = _FIXED_PAYLOAD_STRUCT[1].unpack_from(self._buffer, self._ptr)[0]
+        self._ptr += 1
+
+        return value
 
 
 class Parser:
@@ -56,34 +256,150 @@ class Parser:
         self.registry = {tag.key: tag for tag in tags if tag.key is not None}
 
     def decode(self, buffer):
+        '''Decode the named tag at the buffer's read position.'''
+
+        if not isinstance(buffer, Buffer):
+            buffer = Buffer(buffer)
+
+        if buffer.empty:
+            return None
+
+        root, buffer._ptr = self.decode_tag(buffer._buffer, buffer._ptr)
+
+        return root
+
+    def decode_tag(self, data, offset=0):
+        '''Decode the named tag at offset, returning (tag, end offset).
+
+        Nested compounds and lists are handled with an explicit stack
+        rather than recursion, so there's no limit on how deep they go.'''
+
+        tag_type = data[offset]
+
+        if tag_type == TAG_END:
+            return CompoundTag(name=None), offset + 1
+
+        size = _UINT16.unpack_from(data, offset + 1)[0]
+        offset += 3
+
+        name = decode_string(data[offset:offset + size])
+        offset += size
+
+        return self.decode_payload(data, offset, tag_type, name)
+
+    def decode_payload(self, data, offset, tag_type, name=None):
+        '''Decode the payload of a tag of type tag_type at offset, returning
+        (tag, end offset).'''
+
+        registry = self.registry
 
         root = None
 
-        while not buffer.empty:
+        # the compound and list tags that are still being filled
+        stack = []
+
+        while True:
+
+            if tag_type <= 6:
+
+                tag = registry[tag_type](name, _FIXED_PAYLOAD_STRUCT[tag_type].unpack_from(data, offset)[0])
+                offset += _FIXED_PAYLOAD_SIZE[tag_type]
+
+            elif tag_type == TAG_STRING:
+
+                size = _UINT16.unpack_from(data, offset)[0]
+                offset += 2
+
+                tag = StringTag(name, decode_string(data[offset:offset + size]))
+                offset += size
 
-            tag_type = buffer.decode_byte()
+            elif tag_type in _ARRAY_TYPECODE:
 
-            tag = parser.registry[tag_type].decode(buffer, nameless=False)
+                count = _INT32.unpack_from(data, offset)[0]
+                offset += 4
 
-            if not tag:
-                return CompoundTag(name=None)
+                values = decode_array(data, offset, tag_type, count)
+                offset += count * values.itemsize
 
-            tag.hydrate(self, buffer)
+                tag = registry[tag_type](name, values)
 
-            if not root:
+            elif tag_type == TAG_LIST:
+
+                subtype = data[offset]
+                count = _INT32.unpack_from(data, offset + 1)[0]
+                offset += 5
+
+                tag = ListTag(name, subtype, max(count, 0))
+
+                if count > 0:
+
+                    if 0 < subtype <= 6:
+
+                        # lists of numbers are unpacked with a single call
+                        values = struct.unpack_from('>{}{}'.format(count, _FIXED_PAYLOAD_FORMAT[subtype]), data, offset)
+                        offset += count * _FIXED_PAYLOAD_SIZE[subtype]
+
+                        tag_clz = registry[subtype]
+                        tag.items = [tag_clz(None, value) for value in values]
+
+                    else:
+                        stack.append(tag)
+
+            elif tag_type == TAG_COMPOUND:
+
+                tag = CompoundTag(name)
+
+                stack.append(tag)
+
+            else:
+
+                raise ValueError('Unknown tag type {} at offset {}.'.format(tag_type, offset))
+
+            if root is None:
                 root = tag
+            else:
+                parent.add(tag)
 
-        return root
+            # find the next tag to decode (and the container it goes in)
+            while stack:
+
+                parent = stack[-1]
+
+                if parent.key == TAG_COMPOUND:
+
+                    tag_type = data[offset]
+                    offset += 1
+
+                    if tag_type == TAG_END:
+                        stack.pop()
+                        continue
+
+                    size = _UINT16.unpack_from(data, offset)[0]
+                    offset += 2
+
+                    name = decode_string(data[offset:offset + size])
+                    offset += size
+
+                    break
+
+                if parent.filled:
+                    stack.pop()
+                    continue
+
+                tag_type = parent.subtype
+                name = None
+
+                break
+
+            else:
+
+                return root, offset
 
 
 class Tag:
 
     key = None
 
-    @classmethod
-    def decode(clz, buffer, nameless=False):
-        pass
-
     @property
     def as_dict(self):
 
@@ -101,34 +417,15 @@ class Tag:
     def to_python(self):
         pass
 
-    def hydrate(self, parser, buffer):
-        pass
+    def to_bytes(self):
+        '''Encode the tag, along with its name.'''
+
+        return bytes(encode(self))
 
 
 class NumberTag(Tag):
 
     key = None
-    struct_format = None
-    byte_size = None
-
-    @classmethod
-    def decode(clz, buffer, nameless=False):
-
-        name = None
-
-        if not nameless:
-
-            size = buffer.decode_short()
-            name = buffer.consume(size).decode()
-
-        value = clz.extract_value(buffer)
-
-        return clz(name=name, value=value)
-
-    @classmethod
-    def extract_value(clz, buffer):
-
-        return struct.unpack(clz.struct_format, buffer.consume(clz.byte_size))[0]
 
     def __init__(self, name, value):
 
@@ -148,33 +445,9 @@ class NumberTag(Tag):
 
 
 class ArrayTag(Tag):
+    '''The values are an array.array of the elements.'''
 
     key = None
-    sub_struct_format = None
-    sub_byte_size = None
-
-    @classmethod
-    def decode(clz, buffer, nameless=False):
-
-        # TODO the docs say this is a SIGNED 4-byte integer...but why would
-        # it be signed???
-
-        name = None
-
-        if not nameless:
-
-            size = buffer.decode_short()
-            name = buffer.consume(size).decode()
-
-        size = struct.unpack('!l', buffer.consume(4))[0]
-
-        values = []
-
-        for n in range(0, size):
-
-            values.append(struct.unpack(clz.sub_struct_format, buffer.consume(clz.sub_byte_size))[0])
-
-        return clz(name=name, values=values)
 
     def __init__(self, name, values):
 
@@ -183,7 +456,7 @@ class ArrayTag(Tag):
 
     def to_python(self):
 
-        return self.values
+        return self.values.tolist()
 
     @property
     def as_dict_sub(self):
@@ -201,74 +474,42 @@ class EndTag(Tag):
 class ByteTag(NumberTag):
 
     key = 1
-    struct_format = '!b'
-    byte_size = 1
 
 
 class ShortTag(NumberTag):
 
     key = 2
 
-    @classmethod
-    def extract_value(clz, buffer):
-
-        return int.from_bytes(buffer.consume(2), 'big', signed=True)
-
 
 class IntTag(NumberTag):
 
     key = 3
-    struct_format = '!l'
-    byte_size = 4
 
 
 class LongTag(NumberTag):
 
     key = 4
-    struct_format = '!q'
-    byte_size = 8
 
 
 class FloatTag(NumberTag):
 
     key = 5
-    struct_format = '!f'
-    byte_size = 4
 
 
 class DoubleTag(NumberTag):
 
     key = 6
-    struct_format = '!d'
-    byte_size = 8
 
 
 class ByteArrayTag(ArrayTag):
 
     key = 7
-    sub_struct_format = '!b'
-    sub_byte_size = 1
 
 
 class StringTag(Tag):
 
     key = 8
 
-    @classmethod
-    def decode(clz, buffer, nameless=False):
-
-        name = None
-
-        if not nameless:
-
-            size = buffer.decode_short()
-            name = buffer.consume(size).decode()
-
-        size = buffer.decode_short()
-        value = buffer.consume(size).decode()
-
-        return clz(name=name, value=value)
-
     def __init__(self, name, value):
 
         self.name = name
@@ -290,21 +531,6 @@ class ListTag(Tag):
 
     key = 9
 
-    @classmethod
-    def decode(clz, buffer, nameless=False):
-
-        name = None
-
-        if not nameless:
-
-            size = buffer.decode_short()
-            name = buffer.consume(size).decode()
-
-        subtype = buffer.decode_byte()
-        length = struct.unpack('!l', buffer.consume(4))[0]
-
-        return clz(name=name, subtype=subtype, expected_length=length)
-
     def __init__(self, name, subtype, expected_length):
 
         self.name = name
@@ -330,16 +556,6 @@ class ListTag(Tag):
 
         return len(self.items) == self.expected_length
 
-    def hydrate(self, parser, buffer):
-
-        while not self.filled:
-
-            tag = parser.registry[self.subtype].decode(buffer, nameless=True)
-
-            tag.hydrate(parser, buffer)
-
-            self.add(tag)
-
     def to_python(self):
 
         return [tag.to_python() for tag in self.items]
@@ -349,20 +565,6 @@ class CompoundTag(Tag):
 
     key = 10
 
-    @classmethod
-    def decode(clz, buffer, nameless=False):
-
-        name = None
-
-        if not nameless:
-
-            size = buffer.decode_short()
-
-            if size > 0:
-                name = buffer.consume(size).decode()
-
-        return clz(name=name)
-
     def __init__(self, name):
 
         self.name = name
@@ -372,25 +574,26 @@ class CompoundTag(Tag):
 
         self.items.append(tag)
 
-    def hydrate(self, parser, buffer):
-
-        while True:
+    def get(self, name, default=None):
 
-            tag_type = buffer.decode_byte()
+        for tag in self.items:
+            if tag.name == name:
+                return tag
 
-            tag = parser.registry[tag_type].decode(buffer, nameless=False)
+        return default
 
-            if not tag:
+    def __getitem__(self, name):
 
-                return None
+        tag = self.get(name)
 
-            tag.hydrate(parser, buffer)
+        if tag is None:
+            raise KeyError(name)
 
-            self.add(tag)
+        return tag
 
     def to_python(self):
 
-        return {self.name: {tag.name: tag.to_python() for tag in self.items}}
+        return {tag.name: tag.to_python() for tag in self.items}
 
     @property
     def as_dict_sub(self):
@@ -403,38 +606,572 @@ class CompoundTag(Tag):
 class IntArrayTag(ArrayTag):
 
     key = 11
-    sub_struct_format = '!l'
-    sub_byte_size = 4
 
 
 class LongArrayTag(ArrayTag):
 
     key = 12
-    sub_struct_format = '!q'
-    sub_byte_size = 8
 
 
-def nbt_to_python(nbt_root):
+#
+# lazy views
+#
 
-    return nbt_root.to_python()
+def _view_payload(data, offset, tag_type):
+    '''Return a view of a compound or list payload, or the value of any
+    other tag.'''
 
+    if tag_type == TAG_COMPOUND:
+        return CompoundView(data, offset)
 
-if __name__ == '__main__':
+    if tag_type == TAG_LIST:
+        return ListView(data, offset)
 
-    parser = Parser()
+    if tag_type <= 6:
+        return _FIXED_PAYLOAD_STRUCT[tag_type].unpack_from(data, offset)[0]
 
-    filename = sys.argv[1]
+    if tag_type == TAG_STRING:
 
-    data = None
-    try:
-        data = gzip.open(filename, 'rb').read()
-    except OSError as exc:
-        # TODO I don't like that we can't narrow this exception
-        data = open(filename, 'rb').read()
+        size = _UINT16.unpack_from(data, offset)[0]
+
+        return decode_string(data[offset + 2:offset + 2 + size])
+
+    if tag_type in _ARRAY_TYPECODE:
+        return decode_array(data, offset + 4, tag_type, _INT32.unpack_from(data, offset)[0])
+
+    raise ValueError('Unknown tag type {} at offset {}.'.format(tag_type, offset))
+
+
+class View:
+    '''Read-only access to encoded NBT that only decodes what is asked for.
+
+    The offsets of the children are indexed the first time they are
+    looked for (by skipping over the payloads before them), after which
+    lookups seek straight to the child.  Values and sub-views are cached.
+    '''
+
+    __slots__ = ('_data', '_offset', '_index', '_cache')
+
+    tag_type = None
+
+    def __init__(self, data, offset):
+
+        self._data = data
+        self._offset = offset
+        self._index = None
+        self._cache = {}
+
+    def _build_index(self):
+        raise NotImplementedError()
+
+    def _lookup(self, key):
+        raise NotImplementedError()
+
+    def __getitem__(self, key):
+
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+
+        tag_type, offset = self._lookup(key)
+
+        value = self._cache[key] = _view_payload(self._data, offset, tag_type)
+
+        return value
+
+    def get(self, key, default=None):
+
+        try:
+            return self[key]
+        except (KeyError, IndexError):
+            return default
+
+    def query(self, path, default=None):
+        '''Follow a path of compound names and list indexes, either as a
+        sequence or as a dotted string (i.e. 'display.Lore.0'), returning
+        default if any part of it is missing.'''
+
+        if isinstance(path, str):
+            path = [int(part) if part.lstrip('-').isdigit() else part for part in path.split('.')]
+
+        value = self
+
+        for key in path:
+
+            if not isinstance(value, View):
+                return default
+
+            try:
+                value = value[key]
+            except (KeyError, IndexError, TypeError):
+                return default
+
+        return value
+
+    def to_tag(self):
+        '''Fully decode the payload into Tag objects.'''
+
+        return _parser.decode_payload(self._data, self._offset, self.tag_type)[0]
+
+    def to_python(self):
+
+        return self.to_tag().to_python()
+
+
+class CompoundView(View):
+    '''The index is built incrementally - only as far as the entry being
+    looked up - so that entries near the start are found without skipping
+    over everything after them.'''
+
+    __slots__ = ('_scan',)
+
+    tag_type = TAG_COMPOUND
+
+    def __init__(self, data, offset):
+
+        super().__init__(data, offset)
+
+        # name --> (tag type, payload offset)
+        self._index = {}
+
+        # where the next unindexed entry starts (None once we've hit the end)
+        self._scan = offset
+
+    def _scan_to(self, name=None):
+        '''Index entries until name is found (or to the end).'''
+
+        data = self._data
+        offset = self._scan
+        index = self._index
+
+        while offset is not None:
+
+            tag_type = data[offset]
+
+            if tag_type == TAG_END:
+                offset = None
+                break
+
+            size = _UINT16.unpack_from(data, offset + 1)[0]
+            offset += 3
+
+            entry_name = decode_string(data[offset:offset + size])
+            offset += size
+
+            index[entry_name] = (tag_type, offset)
+
+            if tag_type <= 6:
+                offset += _FIXED_PAYLOAD_SIZE[tag_type]
+            elif tag_type == TAG_STRING:
+                offset += 2 + _UINT16.unpack_from(data, offset)[0]
+            else:
+                offset = payload_end(data, offset, tag_type)
+
+            if entry_name == name:
+                break
+
+        self._scan = offset
+
+    def _build_index(self):
+
+        self._scan_to()
+
+    def _lookup(self, key):
+
+        entry = self._index.get(key)
+
+        if entry is None:
+
+            self._scan_to(key)
+
+            entry = self._index[key]
+
+        return entry
+
+    def __contains__(self, name):
+
+        try:
+            self._lookup(name)
+        except KeyError:
+            return False
+
+        return True
+
+    def __iter__(self):
+
+        return iter(self.keys())
+
+    def __len__(self):
+
+        return len(self.keys())
+
+    def keys(self):
+
+        self._build_index()
+
+        return list(self._index)
+
+    def type_of(self, name):
+
+        return self._lookup(name)[0]
+
+    def to_tag(self):
+
+        if self._offset is None:
+            return CompoundTag(name=None)
+
+        return super().to_tag()
+
+
+class ListView(View):
+
+    __slots__ = ('subtype', '_count')
+
+    tag_type = TAG_LIST
+
+    def __init__(self, data, offset):
+
+        super().__init__(data, offset)
+
+        self.subtype = data[offset]
+        self._count = max(_INT32.unpack_from(data, offset + 1)[0], 0)
+
+    def _build_index(self):
+
+        data = self._data
+        subtype = self.subtype
+
+        offset = self._offset + 5
+
+        index = array('I')
+
+        for _ in range(self._count):
+            index.append(offset)
+            offset = payload_end(data, offset, subtype)
+
+        self._index = index
+
+    def _lookup(self, key):
+
+        count = self._count
+
+        if key < 0:
+            key += count
+
+        if not 0 <= key < count:
+            raise IndexError(key)
+
+        # fixed width elements can be found without an index
+        if 0 < self.subtype <= 6:
+            return self.subtype, self._offset + 5 + key * _FIXED_PAYLOAD_SIZE[self.subtype]
+
+        if self._index is None:
+            self._build_index()
+
+        return self.subtype, self._index[key]
+
+    def __len__(self):
+
+        return self._count
+
+    def __iter__(self):
+
+        for index in range(self._count):
+            yield self[index]
+
+
+def view(data, offset=0):
+    '''Return a lazy View of the named compound or list tag at offset in
+    data (an empty CompoundView for a lone end tag).'''
+
+    data = memoryview(data)
+
+    tag_type = data[offset]
+
+    if tag_type == TAG_END:
+        return CompoundView(data, None)
+
+    offset += 3 + _UINT16.unpack_from(data, offset + 1)[0]
+
+    return _view_payload(data, offset, tag_type)
+
+
+#
+# encoding
+#
+
+def _write_header(out, tag_type, name):
+
+    name = encode_string(name or '')
+
+    out.append(tag_type)
+    out += _UINT16.pack(len(name))
+    out += name
+
+
+def encode_payload(tag, out):
+    '''Append the payload of tag to the bytearray out (without recursing
+    into compounds and lists).'''
+
+    # (iterator over the children, whether they're named) for each of the
+    # compounds and lists being written
+    stack = []
+
+    while True:
+
+        tag_type = tag.key
+
+        if tag_type <= 6:
+
+            out += _FIXED_PAYLOAD_STRUCT[tag_type].pack(tag.value)
+
+        elif tag_type == TAG_STRING:
+
+            data = encode_string(tag.value)
+
+            out += _UINT16.pack(len(data))
+            out += data
+
+        elif tag_type in _ARRAY_TYPECODE:
+
+            out += _INT32.pack(len(tag.values))
+            out += encode_array(tag.values, tag_type)
+
+        elif tag_type == TAG_LIST:
+
+            items = tag.items
+            subtype = tag.subtype
+
+            out.append(subtype)
+            out += _INT32.pack(len(items))
+
+            if items:
+
+                if 0 < subtype <= 6:
+                    out += struct.pack('>{}{}'.format(len(items), _FIXED_PAYLOAD_FORMAT[subtype]),
+                                       *[item.value for item in items])
+                else:
+                    stack.append((iter(items), False))
+
+        elif tag_type == TAG_COMPOUND:
+
+            stack.append((iter(tag.items), True))
+
+        else:
+
+            raise ValueError('Unknown tag type {}.'.format(tag_type))
+
+        while stack:
+
+            children, named = stack[-1]
+
+            tag = next(children, None)
+
+            if tag is None:
+
+                stack.pop()
+
+                if named:
+                    out.append(TAG_END)
+
+                continue
+
+            if named:
+                _write_header(out, tag.key, tag.name)
+
+            break
+
+        else:
+
+            return out
+
+
+def encode(tag, out=None):
+    '''Encode a named tag, returning a bytearray (or appending to out).'''
+
+    if out is None:
+        out = bytearray()
+
+    _write_header(out, tag.key, tag.name)
+
+    return encode_payload(tag, out)
+
+
+class Writer:
+    '''Writes NBT to a file-like object a tag at a time, so that large
+    documents never have to be built in memory.
+
+    Compounds and lists are opened and closed explicitly, complete tags
+    can be written into them with write(), and arrays can be written
+    straight from a buffer with write_array().
+    '''
+
+    BUFFER_SIZE = 64 * 1024
+
+    def __init__(self, fileobj, compress=False):
+
+        self._target = fileobj
+        self._gzip = None
+
+        if compress:
+            self._gzip = self._target = gzip.GzipFile(fileobj=fileobj, mode='wb')
+
+        self._out = bytearray()
+
+        # [tag type, element type, remaining count] for the open lists and
+        # compounds
+        self._stack = []
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.close()
+
+    def _header(self, tag_type, name):
+
+        stack = self._stack
+
+        if stack and stack[-1][0] == TAG_LIST:
+
+            entry = stack[-1]
+
+            if tag_type != entry[1]:
+                raise ValueError('Expected a tag of type {} in the list, not {}.'.format(entry[1], tag_type))
+
+            if entry[2] == 0:
+                raise ValueError('Too many tags for the list.')
+
+            entry[2] -= 1
+
+        else:
+            _write_header(self._out, tag_type, name)
+
+    def _written(self):
+
+        if len(self._out) >= self.BUFFER_SIZE:
+            self.flush()
+
+    def write(self, tag):
+        '''Write a complete tag.'''
+
+        self._header(tag.key, tag.name)
+
+        encode_payload(tag, self._out)
+
+        self._written()
+
+    def write_array(self, name, tag_type, values):
+        '''Write a byte, int or long array tag without building a Tag (see
+        encode_array for what values can be).'''
+
+        data = encode_array(values, tag_type)
+
+        self._header(tag_type, name)
+
+        self._out += _INT32.pack(len(data) // _ARRAY_ELEMENT_SIZE[tag_type])
+
+        # big arrays skip the buffer
+        self.flush()
+        self._target.write(data)
+
+    def begin_compound(self, name=None):
+
+        self._header(TAG_COMPOUND, name)
+        self._stack.append([TAG_COMPOUND, None, None])
+
+    def end_compound(self):
+
+        if not self._stack or self._stack[-1][0] != TAG_COMPOUND:
+            raise ValueError('There is no compound to end.')
+
+        self._stack.pop()
+        self._out.append(TAG_END)
+
+        self._written()
+
+    def begin_list(self, name, subtype, count):
+
+        self._header(TAG_LIST, name)
+        self._stack.append([TAG_LIST, subtype, count])
+
+        self._out.append(subtype)
+        self._out += _INT32.pack(count)
+
+    def end_list(self):
+
+        if not self._stack or self._stack[-1][0] != TAG_LIST:
+            raise ValueError('There is no list to end.')
+
+        if self._stack[-1][2]:
+            raise ValueError('{} tags are missing from the list.'.format(self._stack[-1][2]))
+
+        self._stack.pop()
+
+        self._written()
+
+    def flush(self):
+
+        if self._out:
+            self._target.write(self._out)
+            self._out = bytearray()
+
+    def close(self):
+        '''Flush everything that has been written (the underlying file is
+        left open).'''
+
+        self.flush()
+
+        if self._gzip is not None:
+            self._gzip.close()
+            self._gzip = None
+
+
+def save(tag, filename, compress=True):
+
+    with open(filename, 'wb') as fout:
+        with Writer(fout, compress=compress) as writer:
+            writer.write(tag)
+
+
+_parser = Parser()
+
+
+def decode(data, offset=0):
+    '''Decode the named tag at offset in data (bytes, bytearray or a
+    memoryview), returning (tag, end offset).'''
+
+    return _parser.decode_tag(memoryview(data), offset)
+
+
+def read(data):
+    '''Decode a complete NBT document, which may be gzipped.'''
+
+    if data[:2] == GZIP_MAGIC:
+        data = gzip.decompress(data)
+
+    return decode(data)[0]
+
+
+def load(filename):
+
+    with open(filename, 'rb') as fin:
+        return read(fin.read())
+
+
+def nbt_to_python(nbt_root):
+
+    return {nbt_root.name: nbt_root.to_python()}
+
+
+if __name__ == '__main__':
 
-    buff = Buffer(data)
+    import pprint
 
-    root = parser.decode(buff)
+    root = load(sys.argv[1])
 
     print('--- root ---')
     pprint.pprint(root.as_dict)
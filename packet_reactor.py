@@ -71,13 +71,10 @@ class PacketReactor:
         packet_clz = self.packet_factory.get_by_id(
             self.state, Direction.TO_CLIENT, event.packet_id)
 
-        # TODO need to handle packets with 'switch' field types
-        for name, xtype in packet_clz.FIELDS:
-
-            if xtype == 'switch':
-                print('Skipping packet "{}" w/ switch field.'.format(
-                    packet_clz.NAME))
-                return
+        if packet_clz.DECODER is None:
+            print('Skipping packet "{}" w/ unsupported field types.'.format(
+                packet_clz.NAME))
+            return
 
         packet = packet_clz()
         packet.from_wire(event.data, event.length)
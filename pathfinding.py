@@ -0,0 +1,350 @@
+'''
+'''
+
+import heapq
+import math
+
+from atoms import Position
+
+# moves are on the x/z plane, optionally stepping up or falling down
+CARDINALS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+DIAGONALS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+
+WALK_COST = 1.0
+DIAGONAL_COST = math.sqrt(2)
+JUMP_COST = 2.0
+FALL_COST = 1.0
+FALL_COST_PER_BLOCK = 0.5
+
+# the furthest we're willing to drop without taking damage
+MAX_FALL = 3
+
+# nodes are block positions packed into a single int the same way as
+# the protocol packs a Position (26 bits of x, 12 of y, 26 of z)
+_X_SHIFT = 38
+_Y_SHIFT = 26
+_XZ_MASK = 0x3ffffff
+_Y_MASK = 0xfff
+_XZ_SIGN = 1 << 25
+_XZ_RANGE = 1 << 26
+
+
+def encode_node(x, y, z):
+
+    return ((x & _XZ_MASK) << _X_SHIFT) | ((y & _Y_MASK) << _Y_SHIFT) | (z & _XZ_MASK)
+
+
+def decode_node(node):
+
+    x = node >> _X_SHIFT
+    y = (node >> _Y_SHIFT) & _Y_MASK
+    z = node & _XZ_MASK
+
+    if x >= _XZ_SIGN:
+        x -= _XZ_RANGE
+
+    if z >= _XZ_SIGN:
+        z -= _XZ_RANGE
+
+    return (x, y, z)
+
+
+def octile_distance(dx, dz):
+    '''The cheapest possible cost of walking dx, dz blocks - it never
+    over-estimates, so A* remains optimal.'''
+
+    dx = abs(dx)
+    dz = abs(dz)
+
+    if dx < dz:
+        dx, dz = dz, dx
+
+    return (dx - dz) * WALK_COST + dz * DIAGONAL_COST
+
+
+class Path:
+    '''A list of (x, y, z) block positions to stand at, along with the
+    versions of the slices that were consulted when it was planned.'''
+
+    def __init__(self, waypoints, world):
+
+        self.waypoints = waypoints
+
+        self.record_versions(world)
+
+    def __len__(self):
+
+        return len(self.waypoints)
+
+    def record_versions(self, world):
+        '''Remember the current version of every slice holding the ground,
+        the feet or the head of a waypoint.'''
+
+        keys = set()
+
+        for x, y, z in self.waypoints:
+            for block_y in (y - 1, y, y + 1):
+                if 0 <= block_y < 256:
+                    keys.add((x >> 4, z >> 4, block_y >> 4))
+
+        self.slice_versions = {
+            key: world.slice_version(*key) for key in keys
+        }
+
+    def is_stale(self, world):
+        '''Return True if any of the slices the path runs through have
+        changed since it was planned.'''
+
+        for key, version in self.slice_versions.items():
+            if world.slice_version(*key) != version:
+                return True
+
+        return False
+
+
+class Pathfinder:
+    '''A* search over the blocks in a ChunkManager.
+
+    Nodes are the block positions a player's feet can occupy, packed into
+    ints; the open set is a binary heap of (f, h, node) tuples.
+    '''
+
+    MAX_NODES = 50000
+
+    # repairs happen while we're walking, so they give up sooner
+    REPAIR_MAX_NODES = 5000
+
+    def __init__(self, world, max_nodes=MAX_NODES):
+
+        self.world = world
+        self.max_nodes = max_nodes
+
+    def neighbours(self, x, y, z, standable=None, passable=None):
+        '''Yield ((x, y, z), cost) for every position reachable in a single
+        move from x, y, z.'''
+
+        standable = standable or self.world.is_standable
+        passable = passable or self.world.is_passable
+
+        for dx, dz in CARDINALS:
+
+            nx = x + dx
+            nz = z + dz
+
+            if standable(nx, y, nz):
+                yield (nx, y, nz), WALK_COST
+                continue
+
+            # jump up a block (which needs head room above us)
+            if standable(nx, y + 1, nz):
+
+                if passable(x, y + 2, z):
+                    yield (nx, y + 1, nz), JUMP_COST
+
+                continue
+
+            # walk off the edge
+            if not (passable(nx, y, nz) and passable(nx, y + 1, nz)):
+                continue
+
+            for drop in range(1, MAX_FALL + 1):
+
+                if standable(nx, y - drop, nz):
+                    yield (nx, y - drop, nz), FALL_COST + drop * FALL_COST_PER_BLOCK
+                    break
+
+                if not passable(nx, y - drop, nz):
+                    break
+
+        # diagonals are only allowed on the level, without cutting corners
+        for dx, dz in DIAGONALS:
+
+            nx = x + dx
+            nz = z + dz
+
+            if (standable(nx, y, nz) and
+                    passable(nx, y, z) and passable(nx, y + 1, z) and
+                    passable(x, y, nz) and passable(x, y + 1, nz)):
+                yield (nx, y, nz), DIAGONAL_COST
+
+    def is_valid_move(self, start, end):
+
+        return any(position == end for position, _ in self.neighbours(*start))
+
+    def find_path(self, start, goal, world=None, max_nodes=None):
+        '''Return the cheapest Path from start to goal (both (x, y, z) block
+        positions), or None if there isn't one within max_nodes expansions.
+
+        The search only reads world (the pathfinder's own by default) and
+        keeps everything else to itself, so it can run on another thread
+        given a map_chunk.Snapshot.'''
+
+        if world is None:
+            world = self.world
+
+        if max_nodes is None:
+            max_nodes = self.max_nodes
+
+        if not world.is_standable(*goal):
+            return None
+
+        standable = world.is_standable
+        passable = world.is_passable
+
+        goal_x, goal_y, goal_z = goal
+
+        start_node = encode_node(*start)
+        goal_node = encode_node(*goal)
+
+        h = octile_distance(goal_x - start[0], goal_z - start[2])
+
+        open_set = [(h, h, start_node)]
+        costs = {start_node: 0.0}
+        parents = {start_node: None}
+        closed = set()
+
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+        neighbours = self.neighbours
+
+        while open_set:
+
+            _, _, node = heappop(open_set)
+
+            if node == goal_node:
+                return Path(self._reconstruct(parents, node), world)
+
+            if node in closed:
+                continue
+
+            closed.add(node)
+
+            if len(closed) > max_nodes:
+                return None
+
+            cost = costs[node]
+            x, y, z = decode_node(node)
+
+            for (nx, ny, nz), step_cost in neighbours(x, y, z, standable, passable):
+
+                neighbour = encode_node(nx, ny, nz)
+
+                if neighbour in closed:
+                    continue
+
+                new_cost = cost + step_cost
+
+                if new_cost < costs.get(neighbour, math.inf):
+
+                    costs[neighbour] = new_cost
+                    parents[neighbour] = node
+
+                    h = octile_distance(goal_x - nx, goal_z - nz)
+
+                    heappush(open_set, (new_cost + h, h, neighbour))
+
+        return None
+
+    def _reconstruct(self, parents, node):
+
+        waypoints = []
+
+        while node is not None:
+            waypoints.append(decode_node(node))
+            node = parents[node]
+
+        waypoints.reverse()
+
+        return waypoints
+
+    def repair(self, path, index):
+        '''Check the waypoints of path from index onwards against the current
+        state of the world, replanning only the part after the first move
+        that is no longer possible.
+
+        Returns the (possibly new) path, or None if the goal can't be reached
+        any more.'''
+
+        world = self.world
+        waypoints = path.waypoints
+
+        for n in range(max(index, 1), len(waypoints)):
+
+            if not self.is_valid_move(waypoints[n - 1], waypoints[n]):
+                break
+
+        else:
+            # the changes didn't get in our way
+            path.record_versions(world)
+            return path
+
+        tail = self.find_path(waypoints[n - 1], waypoints[-1], max_nodes=self.REPAIR_MAX_NODES)
+
+        if tail is None:
+            return None
+
+        return Path(waypoints[:n - 1] + tail.waypoints, world)
+
+
+class Navigator:
+    '''Follows a path, one waypoint at a time, replanning as the world
+    changes.
+
+    A waypoint has been reached once we're within ARRIVAL_DISTANCE of its
+    centre across the ground - our height doesn't count, as it's changing
+    while we step up or fall.
+    '''
+
+    ARRIVAL_DISTANCE = 0.2
+
+    def __init__(self, pathfinder, start, goal, path=None):
+        '''Follow path (planned from start to goal), or plan one now if it
+        isn't given.'''
+
+        self.pathfinder = pathfinder
+        self.goal = goal
+
+        self.path = pathfinder.find_path(start, goal) if path is None else path
+        self.index = 0
+
+    @property
+    def failed(self):
+
+        return self.path is None
+
+    @property
+    def finished(self):
+
+        return self.path is not None and self.index >= len(self.path)
+
+    def next_waypoint(self, position):
+        '''Return the Position to head for from position (the centre of
+        the next block on the path), or None when there's nowhere to go.'''
+
+        if self.path is None:
+            return None
+
+        if self.path.is_stale(self.pathfinder.world):
+
+            self.path = self.pathfinder.repair(self.path, self.index)
+
+            if self.path is None:
+                return None
+
+        waypoints = self.path.waypoints
+
+        arrival_squared = self.ARRIVAL_DISTANCE * self.ARRIVAL_DISTANCE
+
+        while self.index < len(waypoints):
+
+            x, y, z = waypoints[self.index]
+
+            dx = x + 0.5 - position.x
+            dz = z + 0.5 - position.z
+
+            if dx * dx + dz * dz > arrival_squared:
+                return Position(x + 0.5, y, z + 0.5)
+
+            self.index += 1
+
+        return None
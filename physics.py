@@ -0,0 +1,259 @@
+'''
+'''
+
+import math
+
+# the player's bounding box
+WIDTH = 0.6
+HEIGHT = 1.8
+
+EYE_HEIGHT = 1.62
+
+STEP_HEIGHT = 0.6
+
+# how many chunks around the player the world given to PlayerPhysics needs
+# (we never move more than a few blocks in a tick)
+SNAPSHOT_DISTANCE = 1
+
+# per tick constants, as used by the vanilla client
+GRAVITY = 0.08
+DRAG = 0.98
+
+AIR_FRICTION = 0.91
+SLIPPERINESS = 0.6
+
+WALK_ACCELERATION = 0.1
+SPRINT_ACCELERATION = 0.13
+AIR_ACCELERATION = 0.02
+SPRINT_AIR_ACCELERATION = 0.026
+
+JUMP_VELOCITY = 0.42
+SPRINT_JUMP_BOOST = 0.2
+
+# the client scales movement input by this
+INPUT_SCALE = 0.98
+
+# motion smaller than this is rounded down to nothing
+MIN_MOTION = 0.005
+
+X, Y, Z = 0, 1, 2
+
+
+def player_box(x, y, z):
+    '''Return the (min x, min y, min z, max x, max y, max z) box of a player
+    standing at x, y, z.'''
+
+    half = WIDTH / 2
+
+    return (x - half, y, z - half, x + half, y + HEIGHT, z + half)
+
+
+def offset(box, other, axis, distance):
+    '''Return how far box can move along axis (up to distance) before it
+    hits other.'''
+
+    # the boxes have to overlap on the other two axes to collide
+    for a in (X, Y, Z):
+        if a != axis and (box[a + 3] <= other[a] or box[a] >= other[a + 3]):
+            return distance
+
+    if distance > 0 and box[axis + 3] <= other[axis]:
+        distance = min(distance, other[axis] - box[axis + 3])
+    elif distance < 0 and box[axis] >= other[axis + 3]:
+        distance = max(distance, other[axis + 3] - box[axis])
+
+    return distance
+
+
+def move_box(box, axis, distance):
+
+    moved = list(box)
+
+    moved[axis] += distance
+    moved[axis + 3] += distance
+
+    return tuple(moved)
+
+
+class PlayerPhysics:
+    '''Simulates the player's movement a tick at a time, the same way the
+    vanilla client does - with gravity, friction, collisions against the
+    solid blocks in the world and stepping up (but not jumping onto) half
+    block high ledges - so the server has nothing to correct.
+
+    Solid blocks are treated as full cubes.  Movement input is given with
+    walk() and stop(), the direction comes from the yaw passed to step().
+    walk() can be given a target x, z to head for, which we won't move
+    past in a single tick (so a waypoint isn't overshot at sprint speed).
+
+    step() runs on the model's responder thread, so world should be a
+    map_chunk.Snapshot (replaced, not changed, as the world changes) rather
+    than the ChunkManager the packet handlers are updating.
+    '''
+
+    def __init__(self, world):
+
+        self.world = world
+
+        # blocks per tick
+        self.motion = [0.0, 0.0, 0.0]
+
+        self.on_ground = False
+
+        self.forward = 0.0
+        self.jumping = False
+        self.sprinting = False
+
+        # x, z we're heading for (if any)
+        self.target = None
+
+    def walk(self, jump=False, sprint=False, target=None):
+
+        self.forward = 1.0
+        self.jumping = jump
+        self.sprinting = sprint
+        self.target = target
+
+    def stop(self):
+
+        self.forward = 0.0
+        self.jumping = False
+        self.sprinting = False
+        self.target = None
+
+    def reset(self):
+        '''Forget our momentum (i.e. after the server has moved us).'''
+
+        self.motion = [0.0, 0.0, 0.0]
+
+    def colliding_boxes(self, box):
+        '''Return the boxes of the solid blocks that overlap box.'''
+
+        blocks = self.world.solid_blocks(math.floor(box[0]), math.floor(box[1]), math.floor(box[2]),
+                                         math.floor(box[3]), math.floor(box[4]), math.floor(box[5]))
+
+        return [(x, y, z, x + 1, y + 1, z + 1) for x, y, z in blocks]
+
+    def _sweep(self, box, boxes, dx, dy, dz):
+
+        for axis, distance in ((Y, dy), (X, dx), (Z, dz)):
+
+            for other in boxes:
+                distance = offset(box, other, axis, distance)
+
+            box = move_box(box, axis, distance)
+
+            if axis == Y:
+                dy = distance
+            elif axis == X:
+                dx = distance
+            else:
+                dz = distance
+
+        return box, dx, dy, dz
+
+    def move(self, box, dx, dy, dz):
+        '''Move box by up to dx, dy, dz, stopping at solid blocks (and
+        stepping up small ledges).  Returns the new box and the distance
+        actually moved along each axis.'''
+
+        # everything we could hit on the way
+        reach = (min(box[0], box[0] + dx), min(box[1], box[1] + dy, box[1]), min(box[2], box[2] + dz),
+                 max(box[3], box[3] + dx), max(box[4], box[4] + dy + STEP_HEIGHT), max(box[5], box[5] + dz))
+
+        boxes = self.colliding_boxes(reach)
+
+        moved, mx, my, mz = self._sweep(box, boxes, dx, dy, dz)
+
+        landed = my != dy and dy < 0
+
+        if (self.on_ground or landed) and (mx != dx or mz != dz):
+
+            # try stepping up, across and back down again
+            stepped, sx, sy, sz = self._sweep(box, boxes, dx, STEP_HEIGHT, dz)
+
+            down = -sy
+
+            for other in boxes:
+                down = offset(stepped, other, Y, down)
+
+            stepped = move_box(stepped, Y, down)
+
+            if sx * sx + sz * sz > mx * mx + mz * mz:
+                return stepped, sx, sy + down, sz
+
+        return moved, mx, my, mz
+
+    def step(self, x, y, z, yaw):
+        '''Advance a tick from x, y, z (the player's feet) facing yaw
+        (degrees), returning the new x, y, z.'''
+
+        # the world isn't loaded here yet, so stay put (as the client does)
+        if self.world.height(math.floor(x), math.floor(z)) is None:
+            return x, y, z
+
+        motion = self.motion
+
+        for axis in (X, Y, Z):
+            if abs(motion[axis]) < MIN_MOTION:
+                motion[axis] = 0.0
+
+        radians = math.radians(yaw)
+        sin = math.sin(radians)
+        cos = math.cos(radians)
+
+        if self.jumping and self.on_ground:
+
+            motion[Y] = JUMP_VELOCITY
+
+            if self.sprinting:
+                motion[X] -= sin * SPRINT_JUMP_BOOST
+                motion[Z] += cos * SPRINT_JUMP_BOOST
+
+        if self.on_ground:
+
+            friction = SLIPPERINESS * AIR_FRICTION
+
+            acceleration = SPRINT_ACCELERATION if self.sprinting else WALK_ACCELERATION
+            acceleration *= 0.16277136 / (friction * friction * friction)
+
+        else:
+
+            friction = AIR_FRICTION
+
+            acceleration = SPRINT_AIR_ACCELERATION if self.sprinting else AIR_ACCELERATION
+
+        forward = self.forward * INPUT_SCALE * acceleration
+
+        motion[X] -= sin * forward
+        motion[Z] += cos * forward
+
+        if self.target is not None:
+
+            remaining = math.hypot(self.target[0] - x, self.target[1] - z)
+            speed = math.hypot(motion[X], motion[Z])
+
+            # stop at the target rather than going past it
+            if speed > remaining:
+                motion[X] *= remaining / speed
+                motion[Z] *= remaining / speed
+
+        box, dx, dy, dz = self.move(player_box(x, y, z), motion[X], motion[Y], motion[Z])
+
+        self.on_ground = dy != motion[Y] and motion[Y] < 0
+
+        if dx != motion[X]:
+            motion[X] = 0.0
+
+        if dy != motion[Y]:
+            motion[Y] = 0.0
+
+        if dz != motion[Z]:
+            motion[Z] = 0.0
+
+        motion[Y] = (motion[Y] - GRAVITY) * DRAG
+
+        motion[X] *= friction
+        motion[Z] *= friction
+
+        return (box[0] + WIDTH / 2, box[1], box[2] + WIDTH / 2)
@@ -6,6 +6,8 @@ import json
 import os
 
 from datatypes import VarInt, DATA_TYPE_REGISTRY
+import mcdata_cache
+from type_compiler import TypeCompiler, UnsupportedTypeException
 
 
 class NoSuchFieldException(RuntimeError):
@@ -77,6 +79,10 @@ class Packet:
     PACKET_ID = None
     FIELDS = []  # name, type
 
+    # compiled by the PacketFactory; this is None if the packet uses a type
+    # we don't know how to decode
+    DECODER = None
+
     _values = []
     fields = None
 
@@ -87,6 +93,7 @@ class Packet:
         # initialize values based on field type
         self._values = [
             DATA_TYPE_REGISTRY[field_type].default()
+            if field_type in DATA_TYPE_REGISTRY else None
             for _, field_type in self.FIELDS
         ]
 
@@ -116,6 +123,14 @@ class Packet:
     def from_wire(self, data, data_size):
         '''Parse data into object property values.'''
 
+        if self.DECODER is not None:
+
+            values, _ = self.DECODER(data, 0, data_size, [])
+
+            self._values = [values[field_name] for field_name, _ in self.FIELDS]
+
+            return
+
         offset = 0
 
         # serialize all the field values
@@ -146,7 +161,7 @@ class PacketFactory:
 
         return name.title().replace('_', '') + 'Packet'
 
-    def __init__(self, mcdata_base_dir, game_version):
+    def __init__(self, mcdata_base_dir, game_version, cache_directory=mcdata_cache.DEFAULT_DIRECTORY):
 
         # [state][direction]([name] or [packet_id])
         self.lookup_map = {}
@@ -172,11 +187,10 @@ class PacketFactory:
                                      version_data['majorVersion'],
                                      'protocol.json')
 
-        data = None
+        # protocol.json is big, so the parsed version is cached between runs
+        data = mcdata_cache.load_json(protocol_path, cache_directory)
 
-        with open(protocol_path, 'r') as fin:
-
-            data = json.load(fin)
+        compiler = TypeCompiler(data['types'])
 
         for state_name, directions in data.items():
 
@@ -231,6 +245,11 @@ class PacketFactory:
 
                             fields.append((item['name'], type_name))
 
+                        try:
+                            decoder = staticmethod(compiler.compile(packet_data))
+                        except UnsupportedTypeException:
+                            decoder = None
+
                         # now build the packet from the data we have
 
                         class_members = {
@@ -239,6 +258,7 @@ class PacketFactory:
                             'NAME': packet_name,
                             'PACKET_ID': packet_id,
                             'FIELDS': fields,
+                            'DECODER': decoder,
                             '__doc__': ''  # TODO put something useful here
                         }
 
@@ -0,0 +1,257 @@
+'''
+'''
+
+from collections import Counter, deque
+import threading
+import time
+
+from agent_reactor import TickEvent
+from observer import Listener
+
+# packet priorities (lower is more important)
+IMMEDIATE = 0
+HIGH = 1
+NORMAL = 2
+LOW = 3
+
+PRIORITIES = {
+    # the server disconnects us if these are late
+    'keep_alive': IMMEDIATE,
+    'teleport_confirm': IMMEDIATE,
+
+    'client_command': HIGH,
+    'block_dig': HIGH,
+    'held_item_slot': HIGH,
+    'entity_action': HIGH,
+
+    'chat': LOW,
+    'settings': LOW,
+}
+
+# what each movement packet tells the server - a movement packet that
+# hasn't been sent yet is redundant once later ones have told it as much
+MOVEMENT = {
+    'flying': frozenset(),
+    'position': frozenset(('position',)),
+    'look': frozenset(('look',)),
+    'position_look': frozenset(('position', 'look')),
+}
+
+# packets per second, and how many can be sent at once
+RATE = 60.0
+BURST = 40
+
+# packet classes with limits of their own (vanilla kicks players who chat
+# more than about once a second for long)
+CLASS_LIMITS = {
+    'chat': (1.0, 8),
+}
+
+MAX_QUEUED = 256
+
+
+class TokenBucket:
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+
+        self.tokens = float(capacity)
+        self.updated = clock()
+
+    def _refill(self):
+
+        now = self.clock()
+
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self):
+
+        self._refill()
+
+        return self.tokens >= 1.0
+
+    def take(self):
+        '''Use up a token, returning False if there isn't one.'''
+
+        if not self.available():
+            return False
+
+        self.tokens -= 1.0
+
+        return True
+
+    def spend(self):
+        '''Use up a token whether there is one or not.'''
+
+        self._refill()
+
+        self.tokens -= 1.0
+
+
+class RateLimiter:
+    '''Stands in for a Connection (to the things that send packets) and
+    keeps the rate we send at below what servers will put up with.
+
+    Packets are sent straight away while there are tokens to spare,
+    otherwise they're queued (by priority) and sent as tokens become
+    available, which is checked every tick.  keep_alive and
+    teleport_confirm are never held up.  Movement packets are held until
+    the end of the tick, so that only the last of them (or the last of
+    each kind, if they say different things) gets sent.
+
+    counters keeps track of what happened to the packets: sent, deferred
+    (queued), coalesced (replaced by a later movement packet) and dropped
+    (the queue was full).
+    '''
+
+    def __init__(self, connection, rate=RATE, burst=BURST, class_limits=CLASS_LIMITS,
+                 max_queued=MAX_QUEUED, clock=time.monotonic):
+
+        self.connection = connection
+
+        self.bucket = TokenBucket(rate, burst, clock)
+
+        self.class_buckets = {
+            name: TokenBucket(class_rate, class_burst, clock)
+            for name, (class_rate, class_burst) in class_limits.items()
+        }
+
+        self.max_queued = max_queued
+
+        # a queue per priority
+        self.queues = [deque() for _ in range(LOW + 1)]
+        self.queued = 0
+
+        # the movement packets sent this tick
+        self.movement = []
+
+        self.counters = Counter()
+
+        self._lock = threading.Lock()
+
+    def send(self, packet):
+
+        name = packet.NAME
+
+        with self._lock:
+
+            priority = PRIORITIES.get(name, NORMAL)
+
+            if priority == IMMEDIATE:
+
+                self.bucket.spend()
+                self._send(packet)
+
+            elif name in MOVEMENT:
+                self._coalesce(packet)
+
+            elif self.queued == 0 and self._take(name):
+                self._send(packet)
+
+            else:
+                self._defer(packet, priority)
+
+    def _send(self, packet):
+
+        self.connection.send(packet)
+
+        self.counters['sent'] += 1
+
+    def _take(self, name):
+
+        class_bucket = self.class_buckets.get(name)
+
+        if class_bucket is not None and not class_bucket.available():
+            return False
+
+        if not self.bucket.take():
+            return False
+
+        if class_bucket is not None:
+            class_bucket.take()
+
+        return True
+
+    def _coalesce(self, packet):
+
+        says = MOVEMENT[packet.NAME]
+
+        if not says and self.movement:
+
+            # there's already something telling the server we're here, it
+            # just needs to say whether we're on the ground now
+            self.movement[-1].fields.onGround = packet.fields.onGround
+
+            self.counters['coalesced'] += 1
+            return
+
+        # keep the earlier packets that say something the later ones don't
+        movement = [packet]
+        covered = says
+
+        for pending in reversed(self.movement):
+
+            if not MOVEMENT[pending.NAME] <= covered:
+                movement.append(pending)
+                covered |= MOVEMENT[pending.NAME]
+
+        self.counters['coalesced'] += len(self.movement) + 1 - len(movement)
+
+        movement.reverse()
+
+        self.movement = movement
+
+    def _defer(self, packet, priority):
+
+        if self.queued >= self.max_queued:
+
+            # make room by dropping the newest of the least important packets,
+            # unless they're more important than this one
+            for lowest in range(LOW, priority, -1):
+                if self.queues[lowest]:
+                    break
+            else:
+                self.counters['dropped'] += 1
+                return
+
+            self.queues[lowest].pop()
+            self.queued -= 1
+
+            self.counters['dropped'] += 1
+
+        self.queues[priority].append(packet)
+        self.queued += 1
+
+        self.counters['deferred'] += 1
+
+    def flush(self):
+        '''Send what we can of the movement and queued packets.'''
+
+        with self._lock:
+
+            while self.movement and self.bucket.take():
+                self._send(self.movement.pop(0))
+
+            for queue in self.queues:
+
+                while queue:
+
+                    if not self.bucket.available():
+                        return
+
+                    if not self._take(queue[0].NAME):
+                        # this class is over its own limit, let the next
+                        # priority have a go
+                        break
+
+                    self.queued -= 1
+                    self._send(queue.popleft())
+
+    @Listener(TickEvent)
+    def on_tick(self, event):
+
+        self.flush()
@@ -0,0 +1,200 @@
+'''
+'''
+
+import math
+
+from atoms import Face, Position, Positions
+from physics import EYE_HEIGHT
+
+# how far away (from our eyes) a survival player can reach blocks
+REACH = 4.5
+
+# blocks that rays go straight through (other than air)
+FLUID_BLOCKS = frozenset((8, 9, 10, 11))
+
+# the face a ray enters a block through, by axis and the way it's going
+ENTRY_FACES = (
+    (Face.West, Face.East),
+    (Face.Bottom, Face.Top),
+    (Face.North, Face.South),
+)
+
+# a point just inside each face of a block, relative to its corner
+FACE_POINTS = {
+    Face.Bottom: (0.5, 0.001, 0.5),
+    Face.Top: (0.5, 0.999, 0.5),
+    Face.North: (0.5, 0.5, 0.001),
+    Face.South: (0.5, 0.5, 0.999),
+    Face.West: (0.001, 0.5, 0.5),
+    Face.East: (0.999, 0.5, 0.5),
+}
+
+
+def eye(position):
+    '''Return the x, y, z of the eyes of a player standing at position.'''
+
+    return (position.x, position.y + EYE_HEIGHT, position.z)
+
+
+class Hit:
+    '''Where a ray hit a block: the block's location, the face it went in
+    through, where on that face (the cursor, from 0 to 1 along each axis,
+    as sent in block_place) and how far from the start of the ray.'''
+
+    __slots__ = ('location', 'face', 'cursor', 'distance')
+
+    def __init__(self, location, face, cursor, distance):
+
+        self.location = location
+        self.face = face
+        self.cursor = cursor
+        self.distance = distance
+
+    def __repr__(self):
+
+        return 'Hit({!r}, {!r}, {!r}, {!r})'.format(self.location, self.face, self.cursor, self.distance)
+
+
+class Raycaster:
+    '''Casts rays through the blocks of a world (a ChunkManager or a
+    Snapshot of one), stepping from one block to the next along the ray
+    (a voxel DDA) until it hits something.
+
+    Every block other than air and fluids stops a ray, and is treated as a
+    full cube.  Rays stop (without a hit) at blocks that aren't loaded.
+    '''
+
+    def __init__(self, world):
+
+        self.world = world
+
+    def cast(self, origin, direction, reach=REACH):
+        '''Return the first block hit by a ray from origin (x, y, z) along
+        direction (x, y, z) within reach, as a Hit, or None.  The block
+        origin is in is never hit.'''
+
+        length = math.sqrt(sum(d * d for d in direction))
+
+        if length == 0.0:
+            return None
+
+        direction = [d / length for d in direction]
+
+        block = [math.floor(o) for o in origin]
+
+        steps = [0, 0, 0]
+
+        # how far along the ray the next block boundary on each axis is, and
+        # how far apart the boundaries are
+        boundaries = [math.inf, math.inf, math.inf]
+        spacing = [math.inf, math.inf, math.inf]
+
+        for axis in range(3):
+
+            d = direction[axis]
+
+            if d > 0:
+                steps[axis] = 1
+                boundaries[axis] = (block[axis] + 1 - origin[axis]) / d
+                spacing[axis] = 1 / d
+            elif d < 0:
+                steps[axis] = -1
+                boundaries[axis] = (origin[axis] - block[axis]) / -d
+                spacing[axis] = -1 / d
+
+        get_block = self.world.get_block
+
+        while True:
+
+            axis = boundaries.index(min(boundaries))
+
+            distance = boundaries[axis]
+
+            if distance > reach:
+                return None
+
+            block[axis] += steps[axis]
+            boundaries[axis] += spacing[axis]
+
+            block_state = get_block(*block)
+
+            if block_state is None:
+                return None
+
+            if block_state and block_state >> 4 not in FLUID_BLOCKS:
+
+                cursor = tuple(
+                    min(max(origin[a] + direction[a] * distance - block[a], 0.0), 1.0) for a in range(3)
+                )
+
+                face = ENTRY_FACES[axis][0 if steps[axis] > 0 else 1]
+
+                return Hit(tuple(block), face, cursor, distance)
+
+    def cast_at(self, origin, target, reach=REACH):
+        '''Return the first block hit by a ray from origin towards target
+        (both x, y, z), or None.'''
+
+        return self.cast(origin, [t - o for o, t in zip(origin, target)], reach)
+
+    def reach(self, origin, location, reach=REACH):
+        '''Return a Hit on the block at location (x, y, z) if one of its
+        faces can be seen (and reached) from origin, otherwise None.'''
+
+        location = tuple(location)
+
+        for face in self._facing_faces(origin, location):
+
+            point = [b + p for b, p in zip(location, FACE_POINTS[face])]
+
+            hit = self.cast_at(origin, point, reach)
+
+            if hit is not None and hit.location == location:
+                return hit
+
+        return None
+
+    def _facing_faces(self, origin, location):
+        '''Yield the faces of the block at location that face origin (the
+        only ones a ray from origin can go in through).'''
+
+        for axis, (low, high) in enumerate(ENTRY_FACES):
+
+            if origin[axis] < location[axis]:
+                yield low
+            elif origin[axis] > location[axis] + 1:
+                yield high
+
+    def nearest_reachable(self, origin, locations, reach=REACH):
+        '''Return a Hit on the nearest of locations (x, y, z block
+        coordinates) that can be reached from origin, or None.
+
+        Candidates are ordered by distance in one pass first, and ones that
+        are too far away to reach are never cast at.
+        '''
+
+        locations = [tuple(location) for location in locations]
+
+        centres = Positions()
+
+        for x, y, z in locations:
+            centres.append(Position(x + 0.5, y + 0.5, z + 0.5))
+
+        distances = centres.distances(Position(*origin))
+
+        # a block's centre is never more than this further away than its
+        # nearest face
+        limit = reach + math.sqrt(0.75)
+
+        for index in sorted(range(len(locations)), key=distances.__getitem__):
+
+            if distances[index] > limit:
+                break
+
+            hit = self.reach(origin, locations[index], reach)
+
+            if hit is not None:
+                return hit
+
+        return None
+
@@ -0,0 +1,291 @@
+'''
+'''
+
+from collections import deque
+
+
+class Budget:
+    '''The number of packets the tasks can still send this tick.'''
+
+    def __init__(self, packets):
+
+        self.remaining = packets
+
+    def spend(self, packets=1):
+        '''Use up packets, returning False (and using nothing) if there
+        aren't that many left.'''
+
+        if packets > self.remaining:
+            return False
+
+        self.remaining -= packets
+
+        return True
+
+
+class Task:
+    '''Something the robot does over one or more ticks.
+
+    Subclasses override step() (called once per tick until it returns
+    True) and, as needed:
+
+    - ready() - a precondition, the task (and everything queued after it)
+      waits until it returns True
+    - start() - called instead of step() on the first tick
+    - stop() - undo whatever's in progress when the task is cancelled
+
+    Any packets sent should be paid for from the budget first.
+    '''
+
+    def __init__(self):
+
+        self.started = False
+        self.finished = False
+        self.cancelled = False
+
+    def __repr__(self):
+
+        return '<{}>'.format(type(self).__name__)
+
+    def ready(self):
+
+        return True
+
+    def start(self, budget):
+
+        return self.step(budget)
+
+    def step(self, budget):
+
+        return True
+
+    def stop(self):
+
+        pass
+
+    def cancel(self):
+
+        if self.started and not self.finished:
+            self.stop()
+
+        self.cancelled = True
+
+
+class Scheduler:
+    '''Runs queued Tasks in order, one at a time, stepping the current task
+    once a tick.
+
+    Each tick the tasks share a budget of packets_per_tick, and a task that
+    finishes early hands what's left of the tick on to the next one.
+    '''
+
+    PACKETS_PER_TICK = 4
+
+    def __init__(self, packets_per_tick=PACKETS_PER_TICK):
+
+        self.packets_per_tick = packets_per_tick
+
+        self.queue = deque()
+        self.current = None
+
+    @property
+    def idle(self):
+
+        return self.current is None and not self.queue
+
+    def add(self, task):
+
+        self.queue.append(task)
+
+        return task
+
+    def cancel(self, task=None):
+        '''Cancel a task, or every task if none is given.'''
+
+        if task is None:
+
+            tasks = list(self.queue)
+
+            if self.current is not None:
+                tasks.append(self.current)
+
+        else:
+            tasks = [task]
+
+        for task in tasks:
+
+            task.cancel()
+
+            if task is self.current:
+                self.current = None
+
+        self.queue = deque(task for task in self.queue if not task.cancelled)
+
+    def tick(self):
+
+        budget = Budget(self.packets_per_tick)
+
+        while True:
+
+            task = self.current
+
+            if task is None:
+
+                if not self.queue or not self.queue[0].ready():
+                    return
+
+                task = self.current = self.queue.popleft()
+                task.started = True
+
+                finished = task.start(budget)
+
+            else:
+                finished = task.step(budget)
+
+            if not finished:
+                return
+
+            task.finished = True
+
+            self.current = None
+
+            if budget.remaining <= 0:
+                return
+
+
+#
+# the robot's tasks
+#
+
+class Wait(Task):
+
+    def __init__(self, ticks):
+
+        super().__init__()
+
+        self.ticks = ticks
+
+    def step(self, budget):
+
+        self.ticks -= 1
+
+        return self.ticks < 0
+
+
+class Say(Task):
+
+    def __init__(self, model, message, recipient=None):
+
+        super().__init__()
+
+        self.model = model
+        self.message = message
+        self.recipient = recipient
+
+    def step(self, budget):
+
+        if not budget.spend():
+            return False
+
+        self.model.say(self.message, self.recipient)
+
+        return True
+
+
+class GoTo(Task):
+    '''Walk to a Position, telling sender whether we're on our way (if
+    there's a message for it).
+
+    The route is planned off the dispatcher thread (see Robot.plan_route),
+    so the task waits for it a tick at a time.  The message waits for a
+    tick with room in the budget for it.
+    '''
+
+    def __init__(self, robot, destination, sender=None, success=None, failure="I can't find a way there."):
+
+        super().__init__()
+
+        self.robot = robot
+        self.destination = destination
+        self.sender = sender
+
+        self.success = success
+        self.failure = failure
+
+        # the Future of the route being planned, and the message waiting to
+        # be sent
+        self.route = None
+        self.reply = None
+
+    def start(self, budget):
+
+        self.route = self.robot.plan_route(self.destination)
+
+        return self.step(budget)
+
+    def step(self, budget):
+
+        if self.route is not None:
+
+            if not self.route.done():
+                return False
+
+            path = self.route.result()
+
+            self.route = None
+
+            if path is not None:
+                self.robot.follow(self.destination, path)
+
+            if self.sender is not None:
+                self.reply = self.success if path is not None else self.failure
+
+        if self.reply is not None:
+
+            if not budget.spend():
+                return False
+
+            self.robot.model.say(self.reply, self.sender)
+
+            self.reply = None
+
+        return self.robot.navigator is None
+
+    def stop(self):
+
+        if self.route is not None:
+            self.route.cancel()
+
+        self.robot.model.do_stop()
+
+
+class Dig(Task):
+    '''Break a block, once we've stopped moving.  The digger is ticked from
+    here, so its packets come out of the budget.'''
+
+    def __init__(self, robot, target):
+
+        super().__init__()
+
+        self.robot = robot
+        self.target = target
+
+    def ready(self):
+
+        return self.robot.navigator is None
+
+    def start(self, budget):
+
+        self.robot.digger.dig(self.target)
+
+        return self.step(budget)
+
+    def step(self, budget):
+
+        self.robot.digger.tick(budget)
+
+        return not self.robot.digger.busy
+
+    def stop(self):
+
+        self.robot.digger.cancel()
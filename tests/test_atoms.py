@@ -0,0 +1,73 @@
+import math
+import pickle
+import unittest
+
+from atoms import Position, Positions, Vector3, Velocity
+
+
+class TestVectors(unittest.TestCase):
+    def test_immutable(self):
+
+        position = Position(1.0, 2.0, 3.0)
+
+        with self.assertRaises(AttributeError):
+            position.x = 4.0
+
+        with self.assertRaises(AttributeError):
+            position.w = 4.0
+
+        moved = position + Vector3(1.0, 0.0, 0.0)
+
+        self.assertIsInstance(moved, Position)
+        self.assertEqual(moved, Position(2.0, 2.0, 3.0))
+        self.assertEqual(position, Position(1.0, 2.0, 3.0))
+
+    def test_values(self):
+
+        position = Position(1.0, 2.0, 3.0)
+
+        self.assertEqual(tuple(position), (1.0, 2.0, 3.0))
+        self.assertEqual(hash(position), hash(Position(1.0, 2.0, 3.0)))
+        self.assertNotEqual(position, (1.0, 2.0, 3.0))
+
+        self.assertEqual(pickle.loads(pickle.dumps(position)), position)
+
+    def test_impulse(self):
+
+        impulse = Position(0.0, 64.0, 0.0).impulse(Position(5.0, 64.0, -0.5))
+
+        self.assertEqual(impulse, Velocity(1.0, 0.0, -0.5))
+        self.assertFalse(impulse.stopped)
+        self.assertTrue(Velocity().stopped)
+
+    def test_from_args(self):
+
+        current = Position(10.5, 64.0, -3.5)
+
+        self.assertEqual(Position.from_args(current, ('~', '~1', '~-2')), Position(10.5, 65.0, -5.5))
+        self.assertEqual(Position.from_args(current, ('1', '~', '2')), Position(1, 64.0, 2))
+
+        # too few or too many coordinates
+        with self.assertRaises(ValueError):
+            Position.from_args(current, ('~', '~1'))
+
+        with self.assertRaises(ValueError):
+            Position.from_args(current, ('~', '~1', '~', '2'))
+
+
+class TestPositions(unittest.TestCase):
+    def setUp(self):
+
+        self.origin = Position(0.0, 64.0, 0.0)
+
+        self.targets = [Position(3.0, 64.0, 4.0), Position(-1.0, 64.0, 0.0), Position(0.0, 60.0, 0.5)]
+        self.positions = Positions(self.targets)
+
+    def test_batch_matches_single(self):
+
+        self.assertEqual(len(self.positions), 3)
+        self.assertEqual(list(self.positions), self.targets)
+        self.assertEqual(self.positions[2], self.targets[2])
+
+        self.assertEqual(list(self.positions.distances(self.origin)),
+                         [self.origin.distance(target) for target in self.targets])
@@ -0,0 +1,129 @@
+import json
+import math
+import os
+import tempfile
+import unittest
+
+from array import array
+
+from blocks import PASSABLE, SOLID, TRANSPARENT, BlockRegistry
+
+
+BLOCKS = [
+    {'id': 0, 'name': 'air', 'boundingBox': 'empty', 'hardness': 0, 'transparent': True, 'material': None},
+    {'id': 1, 'name': 'stone', 'boundingBox': 'block', 'hardness': 1.5, 'transparent': False,
+     'material': 'rock', 'harvestTools': {'257': True, '270': True}},
+    {'id': 7, 'name': 'bedrock', 'boundingBox': 'block', 'hardness': None, 'diggable': False},
+    {'id': 11, 'name': 'lava', 'boundingBox': 'empty'},
+    {'id': 31, 'name': 'tallgrass', 'boundingBox': 'empty', 'hardness': 0, 'transparent': True},
+]
+
+
+class TestBlockRegistry(unittest.TestCase):
+    def setUp(self):
+
+        self.registry = BlockRegistry(BLOCKS)
+
+    def test_properties(self):
+
+        self.assertTrue(self.registry.is_solid(1 << 4))
+        self.assertTrue(self.registry.is_solid((1 << 4) | 15))
+        self.assertFalse(self.registry.is_passable(1 << 4))
+
+        self.assertFalse(self.registry.is_solid(0))
+        self.assertTrue(self.registry.is_passable(0))
+
+        self.assertTrue(self.registry.is_passable((31 << 4) | 1))
+
+        # hazards can neither be stood on or walked through
+        self.assertFalse(self.registry.is_solid(11 << 4))
+        self.assertFalse(self.registry.is_passable(11 << 4))
+
+        # unknown blocks are assumed to be solid
+        self.assertTrue(self.registry.is_solid(200 << 4))
+
+    def test_masks(self):
+
+        blocks = array('H', [0, 1 << 4, 11 << 4, 31 << 4, 1 << 4])
+
+        solid, passable = self.registry.masks(blocks)
+
+        self.assertEqual(solid, 0b10010)
+        self.assertEqual(passable, 0b01001)
+
+    def test_default(self):
+
+        registry = BlockRegistry.default()
+
+        self.assertIs(registry, BlockRegistry.default())
+        self.assertTrue(registry.is_passable(0))
+        self.assertTrue(registry.is_solid(1 << 4))
+        self.assertFalse(registry.is_passable(10 << 4))
+
+    def test_block_data(self):
+
+        registry = self.registry
+
+        self.assertEqual(registry.name((1 << 4) | 3), 'stone')
+        self.assertEqual(registry.block_id('tallgrass'), 31)
+        self.assertIsNone(registry.name(200 << 4))
+        self.assertIsNone(registry.block_id('unobtainium'))
+
+        self.assertEqual(registry.material(1 << 4), 'rock')
+        self.assertEqual(registry.tools_for(1 << 4), frozenset((257, 270)))
+        self.assertIsNone(registry.tools_for(31 << 4))
+
+        self.assertEqual(registry.get_hardness(1 << 4), 1.5)
+        self.assertEqual(registry.get_hardness(31 << 4), 0.0)
+        self.assertTrue(math.isinf(registry.get_hardness(7 << 4)))
+
+        self.assertTrue(registry.is_transparent(0))
+        self.assertFalse(registry.is_transparent(1 << 4))
+
+    def test_slice_lookups(self):
+
+        blocks = array('H', [0, 1 << 4, 31 << 4, 7 << 4])
+
+        self.assertEqual(self.registry.flags_of(blocks),
+                         bytes([PASSABLE | TRANSPARENT, SOLID, PASSABLE | TRANSPARENT, SOLID]))
+
+        self.assertEqual(list(self.registry.hardness_of(blocks))[:3], [0.0, 1.5, 0.0])
+        self.assertEqual(self.registry.mask(blocks, TRANSPARENT), 0b0101)
+
+
+class TestMinecraftData(unittest.TestCase):
+    def setUp(self):
+
+        self.directory = tempfile.TemporaryDirectory()
+
+        base = os.path.join(self.directory.name, 'data', 'data', 'pc')
+
+        os.makedirs(os.path.join(base, '1.11.2'))
+        os.makedirs(os.path.join(base, '1.11'))
+
+        with open(os.path.join(base, '1.11.2', 'version.json'), 'w') as fout:
+            json.dump({'version': 316, 'minecraftVersion': '1.11.2', 'majorVersion': '1.11'}, fout)
+
+        with open(os.path.join(base, '1.11', 'blocks.json'), 'w') as fout:
+            json.dump(BLOCKS, fout)
+
+        self.mcdata = os.path.join(self.directory.name, 'data')
+        self.cache = os.path.join(self.directory.name, 'cache')
+
+    def tearDown(self):
+
+        self.directory.cleanup()
+
+    def test_cached(self):
+
+        registry = BlockRegistry.from_minecraft_data(self.mcdata, '1.11.2', self.cache)
+
+        self.assertEqual(len(os.listdir(self.cache)), 1)
+
+        # the second time around comes from the cache
+        cached = BlockRegistry.from_minecraft_data(self.mcdata, '1.11.2', self.cache)
+
+        self.assertIsNot(cached, registry)
+        self.assertEqual(cached.flags, registry.flags)
+        self.assertEqual(cached.hardness, registry.hardness)
+        self.assertEqual(cached.name(1 << 4), 'stone')
@@ -0,0 +1,263 @@
+import random
+import struct
+import unittest
+
+import datatypes
+
+
+# every round trip is checked at a non-zero offset, followed by trailing
+# data, to make sure the codecs respect both ends of the buffer
+PREFIX = b'\xaa\xbb\xcc'
+SUFFIX = b'\xdd\xee'
+
+SAMPLES_PER_TYPE = 200
+
+
+def random_string(rng):
+
+    alphabet = 'abcXYZ019 _-é中\U0001f600'
+
+    return ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+
+
+def random_nbt(rng):
+
+    name = random_string(rng).encode()
+    payload = struct.pack('>H', len(name)) + name
+
+    # a compound holding an int, a string, a list of shorts and an int array
+    data = bytearray(b'\x0a') + payload
+    data += b'\x03' + struct.pack('>H', 1) + b'a' + struct.pack('>i', rng.randint(-2 ** 31, 2 ** 31 - 1))
+    data += b'\x08' + struct.pack('>H', 1) + b'b' + struct.pack('>H', len(name)) + name
+
+    count = rng.randint(0, 5)
+    data += b'\x09' + struct.pack('>H', 1) + b'c' + b'\x02' + struct.pack('>i', count)
+    data += b''.join(struct.pack('>h', rng.randint(-100, 100)) for _ in range(count))
+
+    count = rng.randint(0, 5)
+    data += b'\x0b' + struct.pack('>H', 1) + b'd' + struct.pack('>i', count)
+    data += b''.join(struct.pack('>i', rng.randint(-100, 100)) for _ in range(count))
+
+    # nested compound
+    data += b'\x0a' + struct.pack('>H', 1) + b'e' + b'\x01' + struct.pack('>H', 1) + b'f' + b'\x7f' + b'\x00'
+
+    data += b'\x00'
+
+    return bytes(data)
+
+
+def random_slot(rng):
+
+    if rng.random() < 0.2:
+        return datatypes.Slot()
+
+    return datatypes.Slot(
+        block_id=rng.randint(0, 2 ** 15 - 1),
+        item_count=rng.randint(-128, 127),
+        item_damage=rng.randint(-2 ** 15, 2 ** 15 - 1),
+        nbt=random_nbt(rng) if rng.random() < 0.5 else None)
+
+
+def random_position(rng):
+
+    return datatypes.Position(
+        rng.randint(-2 ** 25, 2 ** 25 - 1),
+        rng.randint(-2 ** 11, 2 ** 11 - 1),
+        rng.randint(-2 ** 25, 2 ** 25 - 1))
+
+
+def slot_key(slot):
+
+    return (slot.block_id, slot.item_count, slot.item_damage, slot.nbt)
+
+
+GENERATORS = {
+    'varint': lambda rng: rng.randint(-2 ** 31, 2 ** 31 - 1),
+    'string': random_string,
+    'i8': lambda rng: rng.randint(-2 ** 7, 2 ** 7 - 1),
+    'u8': lambda rng: rng.randint(0, 2 ** 8 - 1),
+    'i16': lambda rng: rng.randint(-2 ** 15, 2 ** 15 - 1),
+    'u16': lambda rng: rng.randint(0, 2 ** 16 - 1),
+    'i32': lambda rng: rng.randint(-2 ** 31, 2 ** 31 - 1),
+    'u32': lambda rng: rng.randint(0, 2 ** 32 - 1),
+    'i64': lambda rng: rng.randint(-2 ** 63, 2 ** 63 - 1),
+    'u64': lambda rng: rng.randint(0, 2 ** 64 - 1),
+    'f32': lambda rng: struct.unpack('>f', struct.pack('>f', rng.uniform(-1e6, 1e6)))[0],
+    'f64': lambda rng: rng.uniform(-1e300, 1e300),
+    'bool': lambda rng: rng.random() < 0.5,
+    'UUID': lambda rng: (rng.getrandbits(64), rng.getrandbits(64)),
+    'buffer': lambda rng: bytes(rng.getrandbits(8) for _ in range(rng.randint(0, 64))),
+    'position': random_position,
+    'slot': random_slot,
+}
+
+KEYS = {
+    'slot': slot_key,
+}
+
+
+class TestRoundTrip(unittest.TestCase):
+    '''Generate a corpus of random values for every data type and make sure
+    that they survive a trip through to_wire/from_wire.'''
+
+    def test_round_trip(self):
+
+        rng = random.Random(20261019)
+
+        for name, generator in GENERATORS.items():
+
+            data_type = datatypes.DATA_TYPE_REGISTRY[name]
+            key = KEYS.get(name, lambda value: value)
+
+            for _ in range(SAMPLES_PER_TYPE):
+
+                value = generator(rng)
+
+                encoded = bytes(data_type.to_wire(value))
+                data = PREFIX + encoded + SUFFIX
+
+                decoded, consumed = data_type.from_wire(data, len(PREFIX), len(data))
+
+                self.assertEqual(consumed, len(encoded), msg='{}: {!r}'.format(name, value))
+                self.assertEqual(key(value), key(decoded), msg=name)
+
+                # the codecs must also work directly on a memoryview
+                decoded, consumed = data_type.from_wire(memoryview(data), len(PREFIX), len(data))
+
+                self.assertEqual(consumed, len(encoded), msg=name)
+                self.assertEqual(key(value), key(decoded), msg=name)
+
+
+class TestWireFormat(unittest.TestCase):
+    def test_varint(self):
+
+        EXPECTED = (
+            (0, b'\x00'),
+            (1, b'\x01'),
+            (127, b'\x7f'),
+            (128, b'\x80\x01'),
+            (255, b'\xff\x01'),
+            (2147483647, b'\xff\xff\xff\xff\x07'),
+            (-1, b'\xff\xff\xff\xff\x0f'),
+            (-2147483648, b'\x80\x80\x80\x80\x08'),
+        )
+
+        for value, wire in EXPECTED:
+
+            self.assertEqual(bytes(datatypes.VarInt.to_wire(value)), wire)
+            self.assertEqual(datatypes.VarInt.from_wire(wire, 0, len(wire)), (value, len(wire)))
+
+    def test_bool(self):
+
+        self.assertEqual(datatypes.Bool.to_wire(True), b'\x01')
+        self.assertEqual(datatypes.Bool.to_wire(False), b'\x00')
+
+    def test_uuid(self):
+
+        wire = bytes(range(16))
+
+        value, consumed = datatypes.UUID.from_wire(wire, 0, len(wire))
+
+        self.assertEqual(consumed, 16)
+        self.assertEqual(value, (0x0001020304050607, 0x08090a0b0c0d0e0f))
+
+    def test_position(self):
+
+        wire = struct.pack('>Q', (0x3ffffff << 38) | (0x800 << 26) | 5)
+
+        value, consumed = datatypes.Position.from_wire(wire, 0, len(wire))
+
+        self.assertEqual(consumed, 8)
+        self.assertEqual((value.x, value.y, value.z), (-1, -2048, 5))
+
+    def test_position_equality(self):
+
+        position = datatypes.Position(1, 2, 3)
+
+        self.assertEqual(position, datatypes.Position(1, 2, 3))
+        self.assertNotEqual(position, datatypes.Position(1, 2, 4))
+        self.assertNotEqual(position, (1, 2, 3))
+        self.assertNotEqual(position, None)
+
+        self.assertEqual(len({position, datatypes.Position(1, 2, 3)}), 1)
+
+    def test_slot_leaves_trailing_data(self):
+
+        wire = datatypes.Slot.to_wire(datatypes.Slot(1, 2, 3, nbt=None))
+
+        self.assertEqual(bytes(wire), b'\x00\x01\x02\x00\x03\x00')
+
+        data = bytes(wire) + b'\x12\x34'
+
+        slot, consumed = datatypes.Slot.from_wire(data, 0, len(data))
+
+        self.assertEqual(consumed, len(wire))
+        self.assertIsNone(slot.nbt)
+
+    def test_rest_buffer(self):
+
+        data = b'\x01\x02\x03\x04'
+
+        self.assertEqual(datatypes.RestBuffer.from_wire(data, 1, len(data)), (b'\x02\x03\x04', 3))
+
+
+class TestEntityMetadata(unittest.TestCase):
+    def setUp(self):
+
+        slot = bytes(datatypes.Slot.to_wire(datatypes.Slot(1, 2, 3, nbt=b'\x0a\x00\x00\x00')))
+
+        self.entries = b''.join((
+            b'\x00\x00\x21',                                # 0: byte
+            b'\x01\x01\xac\x02',                            # 1: varint 300
+            b'\x02\x02' + struct.pack('>f', 1.5),           # 2: float
+            b'\x03\x03\x03abc',                             # 3: string
+            b'\x05\x05' + slot,                             # 5: slot
+            b'\x06\x06\x01',                                # 6: boolean
+            b'\x07\x07' + struct.pack('>fff', 1, 2, 3),     # 7: rotation
+            b'\x09\x09\x00',                                # 9: absent position
+            b'\x0b\x0b\x01' + struct.pack('>QQ', 1, 2),     # 11: UUID
+            b'\x0c\x0c\x05',                                # 12: block ID
+        ))
+
+        self.data = PREFIX + self.entries + b'\xff' + SUFFIX
+
+    def test_table(self):
+
+        metadata, consumed = datatypes.EntityMetadata.from_wire(self.data, len(PREFIX), len(self.data))
+
+        self.assertEqual(consumed, len(self.entries) + 1)
+        self.assertEqual(metadata.keys(), [0, 1, 2, 3, 5, 6, 7, 9, 11, 12])
+        self.assertEqual(metadata.type_of(7), 7)
+        self.assertNotIn(4, metadata)
+
+    def test_values(self):
+
+        metadata, _ = datatypes.EntityMetadata.from_wire(self.data, len(PREFIX), len(self.data))
+
+        self.assertEqual(metadata[0], 0x21)
+        self.assertEqual(metadata[1], 300)
+        self.assertEqual(metadata[2], 1.5)
+        self.assertEqual(metadata[3], 'abc')
+        self.assertEqual(metadata[5].block_id, 1)
+        self.assertEqual(metadata[5].nbt, b'\x0a\x00\x00\x00')
+        self.assertEqual(metadata[6], True)
+        self.assertEqual(metadata[7], (1.0, 2.0, 3.0))
+        self.assertIsNone(metadata[9])
+        self.assertEqual(metadata[11], (1, 2))
+        self.assertEqual(metadata[12], 5)
+        self.assertEqual(metadata.get(4, 'missing'), 'missing')
+
+        with self.assertRaises(KeyError):
+            metadata[4]
+
+    def test_unknown_type(self):
+
+        data = PREFIX + b'\x00\x00\x21' + b'\x01\x8e\x00\x00' + b'\xff' + SUFFIX
+
+        with self.assertRaises(ValueError):
+            datatypes.EntityMetadata.from_wire(data, len(PREFIX), len(data))
+
+    def test_no_to_wire(self):
+
+        with self.assertRaises(NotImplementedError):
+            datatypes.EntityMetadata.to_wire(None)
@@ -0,0 +1,210 @@
+import unittest
+from types import SimpleNamespace
+
+from atoms import Face, Position
+from blocks import BlockRegistry
+from digging import EFFICIENCY, HASTE, HOTBAR_SLOT, MINING_FATIGUE, Digger, DigTimer
+from map_chunk import ChunkManager
+from raycast import Raycaster
+from tasks import Budget
+
+
+BLOCKS = [
+    {'id': 0, 'name': 'air', 'boundingBox': 'empty', 'hardness': 0},
+    {'id': 1, 'name': 'stone', 'boundingBox': 'block', 'hardness': 1.5, 'material': 'rock',
+     'harvestTools': {'270': True, '274': True, '257': True, '278': True, '285': True}},
+    {'id': 3, 'name': 'dirt', 'boundingBox': 'block', 'hardness': 0.5, 'material': 'dirt'},
+    {'id': 7, 'name': 'bedrock', 'boundingBox': 'block', 'hardness': None},
+    {'id': 9, 'name': 'water', 'boundingBox': 'empty', 'hardness': 100},
+    {'id': 31, 'name': 'tallgrass', 'boundingBox': 'empty', 'hardness': 0, 'material': 'plant'},
+]
+
+STONE = 1 << 4
+DIRT = 3 << 4
+BEDROCK = 7 << 4
+WATER = 9 << 4
+TALLGRASS = 31 << 4
+
+WOODEN_PICKAXE = 270
+DIAMOND_PICKAXE = 278
+
+
+def item(block_id, enchantments=()):
+
+    return SimpleNamespace(block_id=block_id, enchantments=list(enchantments))
+
+
+class TestDigTimer(unittest.TestCase):
+    def setUp(self):
+
+        self.timer = DigTimer(BlockRegistry(BLOCKS))
+
+    def test_by_hand(self):
+
+        # stone needs a pickaxe to harvest, dirt doesn't
+        self.assertEqual(self.timer.ticks(STONE), 150)
+        self.assertEqual(self.timer.ticks(DIRT), 15)
+
+        self.assertEqual(self.timer.ticks(TALLGRASS), 0)
+        self.assertIsNone(self.timer.ticks(BEDROCK))
+
+    def test_tools(self):
+
+        self.assertEqual(self.timer.ticks(STONE, item(WOODEN_PICKAXE)), 23)
+        self.assertEqual(self.timer.ticks(STONE, item(DIAMOND_PICKAXE)), 6)
+
+        # the wrong tool is no better than a hand
+        self.assertEqual(self.timer.ticks(DIRT, item(DIAMOND_PICKAXE)), 15)
+
+        self.assertEqual(self.timer.ticks(STONE, item(DIAMOND_PICKAXE, [(EFFICIENCY, 5)])), 2)
+
+        # but efficiency only helps the right tool
+        self.assertEqual(self.timer.ticks(DIRT, item(DIAMOND_PICKAXE, [(EFFICIENCY, 5)])), 15)
+
+    def test_effects(self):
+
+        # haste II
+        self.assertEqual(self.timer.ticks(STONE, item(DIAMOND_PICKAXE), effects={HASTE: 1}), 5)
+
+        # mining fatigue I
+        self.assertEqual(self.timer.ticks(STONE, item(DIAMOND_PICKAXE), effects={MINING_FATIGUE: 0}), 19)
+
+    def test_conditions(self):
+
+        self.assertEqual(self.timer.ticks(STONE, item(DIAMOND_PICKAXE), in_water=True), 29)
+        self.assertEqual(self.timer.ticks(STONE, item(DIAMOND_PICKAXE), on_ground=False), 29)
+
+
+class FakeModel:
+
+    def __init__(self):
+
+        self.position = Position(0.5, 64.0, 0.5)
+        self.effects = {}
+        self.on_ground = True
+
+        self.sent = []
+
+    def start_digging(self, location, face=Face.Top):
+
+        self.sent.append(('start', location))
+
+    def finish_digging(self, location, face=Face.Top):
+
+        self.sent.append(('finish', location))
+
+    def cancel_digging(self, location, face=Face.Top):
+
+        self.sent.append(('cancel', location))
+
+
+class TestDigger(unittest.TestCase):
+    def setUp(self):
+
+        self.world = ChunkManager(registry=BlockRegistry(BLOCKS))
+        self.world.get(0, 0)
+
+        self.world.set_blocks(0, 0, [(1, 64, 0, STONE), (2, 64, 0, DIRT), (3, 64, 0, TALLGRASS),
+                                     (4, 64, 0, BEDROCK), (5, 64, 0, STONE)])
+
+        self.model = FakeModel()
+        self.inventory = SimpleNamespace(slots={HOTBAR_SLOT: item(DIAMOND_PICKAXE)}, active_hotbar_slot=0)
+
+        self.digger = Digger(self.model, self.inventory, self.world, DigTimer(self.world.registry))
+
+    def run_ticks(self, count):
+
+        ticks = {}
+
+        for tick in range(count):
+
+            sent = len(self.model.sent)
+
+            self.digger.tick()
+
+            for packet in self.model.sent[sent:]:
+                ticks.setdefault(tick, []).append(packet)
+
+        return ticks
+
+    def test_pipelined(self):
+
+        for x in (1, 2, 3, 4, 5, 6):
+            self.digger.dig(Position(x + 0.5, 64.0, 0.5))
+
+        ticks = self.run_ticks(30)
+
+        self.assertEqual(ticks, {
+            0: [('start', (1, 64, 0))],
+            # the next dig starts on the tick the last one finishes
+            6: [('finish', (1, 64, 0)), ('start', (2, 64, 0))],
+            # dirt with a pickaxe
+            21: [('finish', (2, 64, 0)), ('start', (3, 64, 0))],
+            # the grass broke straight away, the bedrock was skipped
+            22: [('start', (5, 64, 0))],
+            28: [('finish', (5, 64, 0))],
+        })
+
+        self.assertFalse(self.digger.busy)
+
+    def test_budget(self):
+
+        self.digger.dig((3, 64, 0))
+        self.digger.dig((1, 64, 0))
+
+        # nothing to spend, so nothing is sent
+        self.digger.tick(Budget(0))
+
+        self.assertEqual(self.model.sent, [])
+
+        # the grass breaks straight away, the stone has to wait
+        self.digger.tick(Budget(1))
+
+        self.assertEqual(self.model.sent, [('start', (3, 64, 0))])
+
+        budget = Budget(2)
+        self.digger.tick(budget)
+
+        self.assertEqual(self.model.sent[1:], [('start', (1, 64, 0))])
+        self.assertEqual(budget.remaining, 1)
+
+        for tick in range(5):
+            self.digger.tick(Budget(1))
+
+        # it broke on the last tick, but there was nothing left to finish it with
+        self.digger.tick(Budget(0))
+
+        self.assertEqual(len(self.model.sent), 2)
+
+        self.digger.tick(Budget(1))
+
+        self.assertEqual(self.model.sent[2:], [('finish', (1, 64, 0))])
+        self.assertFalse(self.digger.busy)
+
+    def test_under_water(self):
+
+        self.world.set_block(0, 65, 0, WATER)
+
+        self.digger.dig((1, 64, 0))
+
+        self.assertEqual(self.digger.dig_ticks((1, 64, 0)), 29)
+
+    def test_cancel(self):
+
+        self.digger.dig((1, 64, 0))
+        self.digger.dig((5, 64, 0))
+
+        self.run_ticks(2)
+
+        self.digger.cancel()
+
+        self.assertEqual(self.model.sent, [('start', (1, 64, 0)), ('cancel', (1, 64, 0))])
+        self.assertFalse(self.digger.busy)
+
+    def test_face(self):
+
+        self.assertEqual(self.digger.face((1, 64, 0)), Face.Top)
+
+        self.digger.raycaster = Raycaster(self.world)
+
+        self.assertEqual(self.digger.face((1, 64, 0)), Face.West)
@@ -0,0 +1,95 @@
+import random
+import unittest
+
+from atoms import Position
+from entity_manager import EntityKind, EntityManager
+
+
+class TestEntityManager(unittest.TestCase):
+    def setUp(self):
+
+        self.entities = EntityManager()
+
+    def test_add_remove(self):
+
+        for entity_id in range(10):
+            self.entities.add(entity_id, EntityKind.MOB, 50, entity_id * 10.0, 64.0, 0.0)
+
+        self.entities.remove(3)
+        self.entities.remove(9)
+        self.entities.remove(42)
+
+        self.assertEqual(len(self.entities), 8)
+        self.assertNotIn(3, self.entities)
+
+        # the arrays stay consistent after swap removal
+        for entity_id in (0, 1, 2, 4, 5, 6, 7, 8):
+            self.assertEqual(self.entities.position(entity_id), (entity_id * 10.0, 64.0, 0.0))
+
+    def test_nearest(self):
+
+        self.entities.add(1, EntityKind.MOB, 50, 10.0, 64.0, 10.0)
+        self.entities.add(2, EntityKind.MOB, 51, 3.0, 64.0, 3.0)
+        self.entities.add(3, EntityKind.PLAYER, 0, 1.0, 64.0, 1.0)
+
+        origin = Position(0.0, 64.0, 0.0)
+
+        self.assertEqual(self.entities.nearest(origin, 5), 3)
+        self.assertEqual(self.entities.nearest(origin, 5, kind=EntityKind.MOB), 2)
+        self.assertEqual(self.entities.nearest(origin, 20, entity_type=50), 1)
+        self.assertIsNone(self.entities.nearest(origin, 5, entity_type=50))
+
+    def test_moves_update_the_grid(self):
+
+        self.entities.add(1, EntityKind.MOB, 50, 0.5, 64.0, 0.5)
+
+        self.entities.move(1, -40.0, 64.0, 100.0)
+
+        self.assertIsNone(self.entities.nearest(Position(0.0, 64.0, 0.0), 10))
+        self.assertEqual(self.entities.nearest(Position(-40.0, 64.0, 100.0), 1), 1)
+
+        self.entities.move_relative(1, 40.0, 0.0, -100.0)
+
+        self.assertEqual(self.entities.position(1), (0.0, 64.0, 0.0))
+        self.assertEqual(self.entities.nearest(Position(0.0, 64.0, 0.0), 1), 1)
+
+    def test_within_matches_brute_force(self):
+
+        rng = random.Random(29)
+
+        for entity_id in range(2000):
+            self.entities.add(entity_id, EntityKind.MOB, rng.randint(0, 3),
+                              rng.uniform(-200, 200), rng.uniform(0, 128), rng.uniform(-200, 200))
+
+        origin = Position(13.0, 64.0, -27.0)
+
+        found = [entity_id for _, entity_id in self.entities.within(origin, 40, entity_type=2)]
+
+        expected = []
+
+        for entity_id in range(2000):
+
+            x, y, z = self.entities.position(entity_id)
+
+            distance = ((x - origin.x) ** 2 + (y - origin.y) ** 2 + (z - origin.z) ** 2) ** 0.5
+
+            if distance <= 40 and self.entities.entity_type(entity_id)[1] == 2:
+                expected.append((distance, entity_id))
+
+        self.assertEqual(found, [entity_id for _, entity_id in sorted(expected)])
+
+    def test_nearest_matches_within(self):
+
+        rng = random.Random(29)
+
+        for entity_id in range(2000):
+            self.entities.add(entity_id, EntityKind.MOB, rng.randint(0, 3),
+                              rng.uniform(-200, 200), rng.uniform(0, 128), rng.uniform(-200, 200))
+
+        for n in range(20):
+
+            origin = Position(rng.uniform(-200, 200), 64.0, rng.uniform(-200, 200))
+
+            found = self.entities.within(origin, 40, entity_type=1)
+
+            self.assertEqual(self.entities.nearest(origin, 40, entity_type=1), found[0][1] if found else None)
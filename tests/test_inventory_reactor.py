@@ -0,0 +1,293 @@
+import unittest
+from types import SimpleNamespace
+
+from datatypes import Slot
+from inventory_reactor import (MAX_PENDING_CLICKS, OUTSIDE_SLOT, PICKUP, SWAP, THROW,
+                               InventoryReactor, Window)
+
+
+STONE = 1
+DIRT = 3
+SWORD = 276
+EGG = 344
+
+
+class FakePacketFactory:
+
+    def get_by_name(self, state, direction, name):
+
+        def make():
+            return SimpleNamespace(NAME=name, fields=SimpleNamespace())
+
+        return make
+
+
+class FakeConnection:
+
+    def __init__(self):
+
+        self.sent = []
+
+    def send(self, packet):
+
+        self.sent.append(packet)
+
+
+def event(**fields):
+
+    return SimpleNamespace(packet=SimpleNamespace(fields=SimpleNamespace(**fields)))
+
+
+def slot(block_id=-1, count=None, damage=0, nbt=None):
+
+    if block_id == -1:
+        return Slot()
+
+    return Slot(block_id=block_id, item_count=count, item_damage=damage, nbt=nbt)
+
+
+class TestWindow(unittest.TestCase):
+    def setUp(self):
+
+        self.window = Window(0, 46)
+
+        items = [slot()] * 46
+        items[36] = slot(STONE, 64)
+        items[37] = slot(STONE, 10)
+        items[38] = slot(SWORD, 1, 5, b'\x0a\x00\x00\x00')
+
+        self.window.load(items)
+
+    def test_load(self):
+
+        self.assertEqual(self.window.count(STONE), 74)
+        self.assertEqual(self.window.count(DIRT), 0)
+        self.assertEqual(self.window.find(STONE), [36, 37])
+        self.assertEqual(self.window.occupied(), [36, 37, 38])
+
+        sword = self.window.get(38)
+
+        self.assertEqual((sword.block_id, sword.count, sword.damage, sword.data), (SWORD, 1, 5, b'\x0a\x00\x00\x00'))
+        self.assertIsNone(self.window.get(0))
+
+    def test_set(self):
+
+        self.window.set(36, -1)
+        self.window.set(9, DIRT, 3)
+
+        self.assertEqual(self.window.count(STONE), 10)
+        self.assertEqual(self.window.count(DIRT), 3)
+        self.assertNotIn(38, self.window.find(STONE))
+
+        self.window.set(37, DIRT, 5)
+
+        self.assertEqual(self.window.count(STONE), 0)
+        self.assertNotIn(STONE, self.window.totals)
+        self.assertEqual(self.window.count(DIRT), 8)
+
+    def test_clicks(self):
+
+        window = self.window
+
+        # pick up half the small stack, put one down, then the rest
+        cursor = window.click(37, 1, PICKUP, None)
+
+        self.assertEqual((cursor.count, window.counts[37]), (5, 5))
+
+        cursor = window.click(9, 1, PICKUP, cursor)
+
+        self.assertEqual((cursor.count, window.counts[9]), (4, 1))
+
+        cursor = window.click(9, 0, PICKUP, cursor)
+
+        self.assertIsNone(cursor)
+        self.assertEqual(window.counts[9], 5)
+
+        # a full stack doesn't take any more
+        cursor = window.click(9, 0, PICKUP, None)
+        cursor = window.click(36, 0, PICKUP, cursor)
+
+        self.assertEqual((cursor.count, window.counts[36]), (5, 64))
+
+        # different items swap
+        cursor = window.click(38, 0, PICKUP, cursor)
+
+        self.assertEqual(cursor.block_id, SWORD)
+        self.assertEqual((window.ids[38], window.counts[38]), (STONE, 5))
+
+        self.assertIsNone(window.click(OUTSIDE_SLOT, 0, PICKUP, cursor))
+
+        self.assertEqual(window.count(STONE), 74)
+        self.assertEqual(window.count(SWORD), 0)
+
+    def test_swap_and_throw(self):
+
+        self.assertIsNone(self.window.click(10, 2, SWAP, None))
+
+        self.assertEqual(self.window.ids[10], SWORD)
+        self.assertEqual(self.window.ids[38], -1)
+
+        self.window.click(36, 0, THROW, None)
+        self.assertEqual(self.window.counts[36], 63)
+
+        self.window.click(36, 1, THROW, None)
+        self.assertEqual(self.window.ids[36], -1)
+
+        self.assertEqual(self.window.count(STONE), 10)
+
+    def test_damage(self):
+
+        self.window.set(9, SWORD, 1, 0)
+
+        self.assertEqual(self.window.count(SWORD), 2)
+        self.assertEqual(self.window.count(SWORD, 5), 1)
+        self.assertEqual(self.window.count(SWORD, 7), 0)
+
+    def test_stack_sizes(self):
+
+        window = Window(0, 46, stack_sizes={EGG: 16})
+
+        window.set(9, EGG, 12)
+        window.set(10, EGG, 12)
+
+        cursor = window.click(10, 0, PICKUP, None)
+        cursor = window.click(9, 0, PICKUP, cursor)
+
+        self.assertEqual((cursor.count, window.counts[9]), (8, 16))
+
+    def test_big_stacks(self):
+
+        # more than a byte's worth (i.e. in a creative inventory)
+        self.window.set(9, DIRT, 200)
+
+        self.assertEqual(self.window.get(9).count, 200)
+        self.assertEqual(self.window.count(DIRT), 200)
+
+
+class TestInventoryReactor(unittest.TestCase):
+    def setUp(self):
+
+        self.connection = FakeConnection()
+        self.inventory = InventoryReactor(FakePacketFactory(), self.connection)
+
+        items = [slot()] * 46
+        items[36] = slot(STONE, 64)
+        items[37] = slot(STONE, 10)
+
+        self.inventory.on_window_items(event(windowId=0, items=items))
+
+    def test_slots(self):
+
+        self.inventory.on_set_slot(event(windowId=0, slot=9, item=slot(DIRT, 2)))
+
+        self.assertEqual(sorted(self.inventory.slots), [9, 36, 37])
+        self.assertEqual(self.inventory.slots[9].block_id, DIRT)
+        self.assertIsNone(self.inventory.slots.get(10))
+        self.assertEqual(self.inventory.count(STONE), 74)
+
+        self.inventory.on_set_slot(event(windowId=0, slot=36, item=slot()))
+
+        self.assertEqual(len(self.inventory.slots), 2)
+        self.assertEqual(self.inventory.count(STONE), 10)
+
+        # the cursor
+        self.inventory.on_set_slot(event(windowId=-1, slot=-1, item=slot(DIRT, 1)))
+
+        self.assertEqual(self.inventory.cursor.block_id, DIRT)
+
+    def test_chest(self):
+
+        self.inventory.on_open_window(event(windowId=3, inventoryType='minecraft:chest', windowTitle='Chest',
+                                            slotCount=27))
+
+        items = [slot()] * 63
+        items[0] = slot(DIRT, 32)
+        items[27 + 27] = slot(STONE, 64)
+
+        self.inventory.on_window_items(event(windowId=3, items=items))
+
+        self.assertEqual(self.inventory.window.count(DIRT), 32)
+
+        # the player's part of the window is the player's inventory
+        self.assertEqual(self.inventory.count(STONE), 64)
+        self.assertIsNone(self.inventory.slots.get(37))
+
+        # move the dirt across
+        self.inventory.click(0)
+        self.inventory.click(27)
+
+        self.assertEqual(self.inventory.count(DIRT), 32)
+        self.assertEqual(self.inventory.window.count(DIRT), 32)
+        self.assertEqual(self.inventory.slots[9].count, 32)
+
+        self.inventory.on_close_window(event(windowId=3))
+
+        self.assertIsNone(self.inventory.window)
+        self.assertNotIn(3, self.inventory.windows)
+
+    def test_pipelined(self):
+
+        for n in range(MAX_PENDING_CLICKS + 2):
+            self.inventory.click(36 + n % 2, window_id=0)
+
+        # the first ones are sent without waiting
+        self.assertEqual(len(self.connection.sent), MAX_PENDING_CLICKS)
+
+        first = self.connection.sent[0].fields
+
+        self.assertEqual((first.windowId, first.slot, first.action, first.mode), (0, 36, 1, PICKUP))
+        self.assertEqual((first.item.block_id, first.item.item_count), (STONE, 64))
+
+        # the second click puts the stone down on the other stack
+        second = self.connection.sent[1].fields
+
+        self.assertEqual((second.slot, second.action, second.item.item_count), (37, 2, 10))
+
+        self.inventory.on_transaction(event(windowId=0, action=1, accepted=True))
+
+        self.assertEqual(len(self.connection.sent), MAX_PENDING_CLICKS + 1)
+
+    def test_rejected(self):
+
+        for n in range(MAX_PENDING_CLICKS + 2):
+            self.inventory.click(36 + n % 2, window_id=0)
+
+        self.inventory.on_transaction(event(windowId=0, action=1, accepted=False))
+
+        apology = self.connection.sent[-1]
+
+        self.assertEqual(apology.NAME, 'transaction')
+        self.assertEqual((apology.fields.windowId, apology.fields.action, apology.fields.accepted), (0, 1, False))
+
+        self.assertEqual(self.inventory.counters['dropped'], 2)
+        self.assertFalse(self.inventory.queued)
+
+    def test_rejected_in_flight(self):
+
+        for n in range(MAX_PENDING_CLICKS):
+            self.inventory.click(36 + n % 2, window_id=0)
+
+        # the server ignores the rest of the clicks in flight until it hears
+        # our apology, so they'll never be confirmed
+        self.inventory.on_transaction(event(windowId=0, action=1, accepted=False))
+
+        self.assertFalse(self.inventory.pending)
+
+        sent = len(self.connection.sent)
+
+        for n in range(MAX_PENDING_CLICKS):
+            self.inventory.click(36 + n % 2, window_id=0)
+
+        self.assertEqual(len(self.connection.sent), sent + MAX_PENDING_CLICKS)
+
+    def test_closed_in_flight(self):
+
+        self.inventory.on_open_window(event(windowId=3, inventoryType='minecraft:chest', windowTitle='Chest',
+                                            slotCount=27))
+
+        self.inventory.click(0)
+        self.inventory.click(1)
+
+        self.inventory.on_close_window(event(windowId=3))
+
+        self.assertFalse(self.inventory.pending)
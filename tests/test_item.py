@@ -0,0 +1,48 @@
+import struct
+import unittest
+
+from item import Item
+
+
+def named(tag_type, name):
+
+    name = name.encode()
+
+    return bytes([tag_type]) + struct.pack('>H', len(name)) + name
+
+
+def string(name, value):
+
+    value = value.encode()
+
+    return named(8, name) + struct.pack('>H', len(value)) + value
+
+
+def enchantment(enchantment_id, level):
+
+    return named(2, 'id') + struct.pack('>h', enchantment_id) + named(2, 'lvl') + struct.pack('>h', level) + b'\x00'
+
+
+# a sword called "Excalibur" with sharpness V and unbreaking III
+SWORD = (named(10, '') +
+         named(9, 'ench') + b'\x0a' + struct.pack('>i', 2) + enchantment(16, 5) + enchantment(34, 3) +
+         named(10, 'display') + string('Name', 'Excalibur') + b'\x00' +
+         b'\x00')
+
+
+class TestItem(unittest.TestCase):
+    def test_nbt(self):
+
+        item = Item(276, 1, 0, SWORD)
+
+        self.assertEqual(item.display_name, 'Excalibur')
+        self.assertEqual(item.enchantments, [(16, 5), (34, 3)])
+        self.assertIs(item.nbt, item.nbt)
+
+    def test_no_nbt(self):
+
+        item = Item(1, 64, 0, None)
+
+        self.assertIsNone(item.nbt)
+        self.assertIsNone(item.display_name)
+        self.assertEqual(item.enchantments, [])
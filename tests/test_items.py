@@ -0,0 +1,120 @@
+import json
+import os
+import tempfile
+import unittest
+
+from items import DEFAULT_STACK_SIZE, ItemRegistry, tokenize
+
+
+BLOCKS = [
+    {'id': 1, 'name': 'stone', 'displayName': 'Stone', 'stackSize': 64,
+     'variations': [{'metadata': 0, 'displayName': 'Stone'}, {'metadata': 1, 'displayName': 'Granite'}]},
+    {'id': 83, 'name': 'reeds', 'displayName': 'Sugar cane', 'stackSize': 64},
+    {'id': 168, 'name': 'prismarine', 'displayName': 'Prismarine', 'stackSize': 64,
+     'variations': [{'metadata': 0, 'displayName': 'Prismarine'},
+                    {'metadata': 1, 'displayName': 'Prismarine Bricks'},
+                    {'metadata': 2, 'displayName': 'Dark Prismarine'}]},
+]
+
+ITEMS = [
+    {'id': 276, 'name': 'diamond_sword', 'displayName': 'Diamond Sword', 'stackSize': 1},
+    {'id': 278, 'name': 'diamond_pickaxe', 'displayName': 'Diamond Pickaxe', 'stackSize': 1},
+    {'id': 264, 'name': 'diamond', 'displayName': 'Diamond', 'stackSize': 64},
+    {'id': 338, 'name': 'reeds', 'displayName': 'Sugar Canes', 'stackSize': 64},
+    {'id': 344, 'name': 'egg', 'displayName': 'Egg', 'stackSize': 16},
+]
+
+
+class TestTokenize(unittest.TestCase):
+
+    def test_tokenize(self):
+
+        self.assertEqual(tokenize('minecraft:dark_prismarine'), ['dark', 'prismarine'])
+        self.assertEqual(tokenize('Dark Prismarine'), ['dark', 'prismarine'])
+        self.assertEqual(tokenize('  '), [])
+
+
+class TestItemRegistry(unittest.TestCase):
+    def setUp(self):
+
+        self.registry = ItemRegistry(ITEMS, BLOCKS)
+
+    def test_exact(self):
+
+        self.assertEqual(self.registry.lookup('Dark Prismarine'), (168, 2))
+        self.assertEqual(self.registry.lookup('prismarine'), (168, None))
+        self.assertEqual(self.registry.lookup('minecraft:diamond_sword'), (276, None))
+        self.assertEqual(self.registry.lookup('granite'), (1, 1))
+
+        # the item wins over the block with the same name
+        self.assertEqual(self.registry.lookup('reeds'), (338, None))
+
+    def test_search(self):
+
+        self.assertEqual(self.registry.lookup('dark prism'), (168, 2))
+        self.assertEqual(self.registry.lookup('prism dark'), (168, 2))
+        self.assertEqual(self.registry.lookup('pick'), (278, None))
+
+        # the shortest names come first
+        self.assertEqual(self.registry.search('diam'), [(264, None), (276, None), (278, None)])
+        self.assertEqual(self.registry.search('diam', limit=1), [(264, None)])
+
+        self.assertIsNone(self.registry.lookup('emerald'))
+        self.assertIsNone(self.registry.lookup('dark sword'))
+        self.assertEqual(self.registry.search(''), [])
+
+    def test_names(self):
+
+        self.assertEqual(self.registry.display_name(168, 2), 'Dark Prismarine')
+        self.assertEqual(self.registry.display_name(168), 'Prismarine')
+        self.assertEqual(self.registry.display_name(276, 5), 'Diamond Sword')
+        self.assertIsNone(self.registry.display_name(999))
+
+        self.assertEqual(self.registry.names[338], 'reeds')
+
+    def test_stack_sizes(self):
+
+        self.assertEqual(self.registry.stack_size(276), 1)
+        self.assertEqual(self.registry.stack_size(344), 16)
+        self.assertEqual(self.registry.stack_size(999), DEFAULT_STACK_SIZE)
+
+
+class TestMinecraftData(unittest.TestCase):
+    def setUp(self):
+
+        self.directory = tempfile.TemporaryDirectory()
+
+        base = os.path.join(self.directory.name, 'data', 'data', 'pc')
+
+        os.makedirs(os.path.join(base, '1.11.2'))
+        os.makedirs(os.path.join(base, '1.11'))
+
+        with open(os.path.join(base, '1.11.2', 'version.json'), 'w') as fout:
+            json.dump({'version': 316, 'minecraftVersion': '1.11.2', 'majorVersion': '1.11'}, fout)
+
+        with open(os.path.join(base, '1.11', 'items.json'), 'w') as fout:
+            json.dump(ITEMS, fout)
+
+        with open(os.path.join(base, '1.11', 'blocks.json'), 'w') as fout:
+            json.dump(BLOCKS, fout)
+
+        self.mcdata = os.path.join(self.directory.name, 'data')
+        self.cache = os.path.join(self.directory.name, 'cache')
+
+    def tearDown(self):
+
+        self.directory.cleanup()
+
+    def test_cached(self):
+
+        registry = ItemRegistry.from_minecraft_data(self.mcdata, '1.11.2', self.cache)
+
+        self.assertEqual(len(os.listdir(self.cache)), 1)
+
+        # the second time around comes from the cache
+        cached = ItemRegistry.from_minecraft_data(self.mcdata, '1.11.2', self.cache)
+
+        self.assertIsNot(cached, registry)
+        self.assertEqual(cached.entries, registry.entries)
+        self.assertEqual(cached.sorted_words, registry.sorted_words)
+        self.assertEqual(cached.lookup('dark prism'), (168, 2))
@@ -0,0 +1,485 @@
+from array import array
+import struct
+import unittest
+from types import SimpleNamespace
+
+from atoms import Position
+from datatypes import VarInt
+from map_chunk import (BIOME_BYTES, BLOCK_LIGHT_BYTES, SKY_LIGHT_BYTES,
+                       ChunkManager, World, parse_chunk_data, slices_in_bitmask)
+
+
+def pack_blocks(values, bits_per_block):
+    '''The inverse of map_chunk.unpack_blocks.'''
+
+    total = 0
+
+    for index, value in enumerate(values):
+        total |= value << (index * bits_per_block)
+
+    long_count = (len(values) * bits_per_block + 63) // 64
+
+    longs = [(total >> (64 * n)) & 0xffffffffffffffff for n in range(long_count)]
+
+    return struct.pack('>{}Q'.format(long_count), *longs)
+
+
+def encode_slice(blocks, bits_per_block, palette=None):
+
+    data = bytearray([bits_per_block])
+
+    if palette:
+        data += VarInt.to_wire(len(palette))
+        for entry in palette:
+            data += VarInt.to_wire(entry)
+        values = [palette.index(block) for block in blocks]
+    else:
+        data += VarInt.to_wire(0)
+        values = blocks
+
+    packed = pack_blocks(values, bits_per_block)
+
+    data += VarInt.to_wire(len(packed) // 8)
+    data += packed
+    data += bytes(BLOCK_LIGHT_BYTES + SKY_LIGHT_BYTES)
+
+    return bytes(data)
+
+
+def block_index(x, y, z):
+
+    return (y << 8) | (z << 4) | x
+
+
+STONE = 1 << 4
+DIRT = 3 << 4
+GRASS = 2 << 4
+
+
+def make_column(chunk_manager, chunk_x=0, chunk_z=0):
+    '''Build a column with stone in slice 0 and a layer of dirt with one
+    grass block at y=16 in slice 1 (using a palette).'''
+
+    slice_0 = [STONE] * 4096
+
+    slice_1 = [0] * 4096
+
+    for x in range(16):
+        for z in range(16):
+            slice_1[block_index(x, 0, z)] = DIRT
+
+    slice_1[block_index(3, 0, 4)] = GRASS
+
+    chunk_data = (encode_slice(slice_0, 13) +
+                  encode_slice(slice_1, 5, palette=[0, DIRT, GRASS]) +
+                  bytes(BIOME_BYTES))
+
+    return parse_chunk_data(chunk_x, chunk_z, True, [0, 1], chunk_data, [],
+                            chunk_manager, None)
+
+
+class TestChunkDecoding(unittest.TestCase):
+    def test_bitmask(self):
+
+        self.assertEqual(slices_in_bitmask(0b1000000000000101), [0, 2, 15])
+
+    def test_decode(self):
+
+        chunk_manager = ChunkManager()
+
+        make_column(chunk_manager, 2, -1)
+
+        self.assertEqual(chunk_manager.get_block(32, 0, -16), STONE)
+        self.assertEqual(chunk_manager.get_block(47, 15, -1), STONE)
+        self.assertEqual(chunk_manager.get_block(32 + 3, 16, -16 + 4), GRASS)
+        self.assertEqual(chunk_manager.get_block(32 + 4, 16, -16 + 4), DIRT)
+        self.assertEqual(chunk_manager.get_block(32, 17, -16), 0)
+        self.assertEqual(chunk_manager.get_block(32, 200, -16), 0)
+
+        # not loaded
+        self.assertIsNone(chunk_manager.get_block(0, 0, 0))
+
+
+class TestBlockChanges(unittest.TestCase):
+    def setUp(self):
+
+        self.chunk_manager = ChunkManager()
+
+        make_column(self.chunk_manager)
+
+    def test_set_block(self):
+
+        version = self.chunk_manager.slice_version(0, 0, 1)
+
+        self.chunk_manager.set_block(5, 17, 5, STONE)
+
+        self.assertEqual(self.chunk_manager.get_block(5, 17, 5), STONE)
+        self.assertNotEqual(self.chunk_manager.slice_version(0, 0, 1), version)
+
+    def test_set_block_in_empty_slice(self):
+
+        self.assertEqual(self.chunk_manager.slice_version(0, 0, 5), 0)
+
+        self.chunk_manager.set_block(1, 80, 1, DIRT)
+
+        self.assertEqual(self.chunk_manager.get_block(1, 80, 1), DIRT)
+        self.assertGreater(self.chunk_manager.slice_version(0, 0, 5), 0)
+
+    def test_set_blocks(self):
+
+        versions = [self.chunk_manager.slice_version(0, 0, index) for index in range(3)]
+
+        self.chunk_manager.set_blocks(0, 0, [(1, 2, 3, 0), (4, 5, 6, DIRT), (7, 16, 8, STONE)])
+
+        self.assertEqual(self.chunk_manager.get_block(1, 2, 3), 0)
+        self.assertEqual(self.chunk_manager.get_block(4, 5, 6), DIRT)
+        self.assertEqual(self.chunk_manager.get_block(7, 16, 8), STONE)
+
+        self.assertNotEqual(self.chunk_manager.slice_version(0, 0, 0), versions[0])
+        self.assertNotEqual(self.chunk_manager.slice_version(0, 0, 1), versions[1])
+        self.assertEqual(self.chunk_manager.slice_version(0, 0, 2), versions[2])
+
+    def test_unload(self):
+
+        self.chunk_manager.unload(0, 0)
+        self.chunk_manager.unload(0, 0)
+
+        self.assertIsNone(self.chunk_manager.get_block(0, 0, 0))
+        self.assertIsNone(self.chunk_manager.slice_version(0, 0, 0))
+
+
+class TestLayers(unittest.TestCase):
+    def setUp(self):
+
+        self.chunk_manager = ChunkManager()
+
+        make_column(self.chunk_manager)
+
+    def test_heightmap(self):
+
+        self.assertEqual(self.chunk_manager.height(0, 0), 17)
+        self.assertEqual(self.chunk_manager.height(15, 15), 17)
+
+        # not loaded
+        self.assertIsNone(self.chunk_manager.height(16, 0))
+
+    def test_heightmap_updates(self):
+
+        self.chunk_manager.set_block(2, 40, 2, STONE)
+
+        self.assertEqual(self.chunk_manager.height(2, 2), 41)
+
+        self.chunk_manager.set_block(2, 40, 2, 0)
+
+        self.assertEqual(self.chunk_manager.height(2, 2), 17)
+
+        # dig down through the dirt and into the stone
+        self.chunk_manager.set_blocks(0, 0, [(2, 16, 2, 0), (2, 15, 2, 0)])
+
+        self.assertEqual(self.chunk_manager.height(2, 2), 15)
+
+    def test_heightmap_build_limit(self):
+
+        self.chunk_manager.set_block(1, 255, 1, STONE)
+
+        self.assertEqual(self.chunk_manager.height(1, 1), 256)
+
+        self.chunk_manager.set_block(1, 255, 1, 0)
+
+        self.assertEqual(self.chunk_manager.height(1, 1), 17)
+
+        # a whole slice with a block in the top layer
+        blocks = [0] * 4096
+        blocks[(15 << 8) | (3 << 4) | 3] = STONE
+
+        column = self.chunk_manager.get(0, 0)
+        column.set_slice(15, array('H', blocks))
+
+        self.assertEqual(self.chunk_manager.height(3, 3), 256)
+        self.assertEqual(self.chunk_manager.snapshot().height(3, 3), 256)
+
+    def test_standable(self):
+
+        self.assertTrue(self.chunk_manager.is_standable(3, 17, 4))
+        self.assertFalse(self.chunk_manager.is_standable(3, 16, 4))
+        self.assertFalse(self.chunk_manager.is_standable(3, 18, 4))
+
+        self.assertTrue(self.chunk_manager.is_solid(3, 16, 4))
+        self.assertFalse(self.chunk_manager.is_solid(3, 17, 4))
+        self.assertTrue(self.chunk_manager.is_passable(3, 17, 4))
+
+        # no head room
+        self.chunk_manager.set_block(3, 18, 4, STONE)
+
+        self.assertFalse(self.chunk_manager.is_standable(3, 17, 4))
+
+        # not loaded
+        self.assertFalse(self.chunk_manager.is_standable(20, 17, 4))
+        self.assertIsNone(self.chunk_manager.is_solid(20, 16, 4))
+
+    def test_solid_blocks(self):
+
+        self.chunk_manager.set_block(6, 18, 7, STONE)
+        self.chunk_manager.set_block(7, 255, 7, STONE)
+
+        # across the top of the ground, the build limit and into an unloaded column
+        for box in ((5, 14, 6, 8, 19, 8), (6, 250, 6, 8, 260, 8), (14, 16, 14, 17, 17, 17), (3, -2, 3, 3, 1, 3)):
+
+            expected = [(x, y, z)
+                        for x in range(box[0], box[3] + 1)
+                        for z in range(box[2], box[5] + 1)
+                        for y in range(box[1], box[4] + 1)
+                        if self.chunk_manager.is_solid(x, y, z)]
+
+            self.assertEqual(self.chunk_manager.solid_blocks(*box), expected)
+
+        self.assertIn((6, 18, 7), self.chunk_manager.solid_blocks(6, 18, 7, 6, 18, 7))
+        self.assertEqual(self.chunk_manager.solid_blocks(0, 300, 0, 1, 310, 1), [])
+
+
+class TestMemory(unittest.TestCase):
+    def test_memory_usage(self):
+
+        chunk_manager = ChunkManager()
+
+        self.assertEqual(chunk_manager.memory_usage(), 0)
+
+        column = make_column(chunk_manager)
+
+        usage = chunk_manager.memory_usage()
+
+        self.assertGreater(usage, 2 * 4096 * 2)
+        self.assertEqual(usage, column.memory_usage())
+
+        chunk_manager.set_block(1, 40, 1, STONE)
+
+        self.assertGreater(chunk_manager.memory_usage(), usage)
+
+    def test_budget(self):
+
+        chunk_manager = ChunkManager()
+
+        make_column(chunk_manager, 0, 0)
+        chunk_manager.memory_budget = int(chunk_manager.memory_usage() * 2.5)
+
+        make_column(chunk_manager, 1, 0)
+
+        # use the first column, so the second is the least recently used
+        chunk_manager.get_column(0, 0)
+
+        make_column(chunk_manager, 0, 1)
+        chunk_manager.evict()
+
+        self.assertEqual(set(chunk_manager.columns), {(0, 0), (0, 1)})
+        self.assertLessEqual(chunk_manager.memory_usage(), chunk_manager.memory_budget)
+
+    def test_budget_prefers_distant(self):
+
+        chunk_manager = ChunkManager()
+        chunk_manager.set_center(0, 0)
+
+        make_column(chunk_manager, 5, 5)
+        chunk_manager.memory_budget = int(chunk_manager.memory_usage() * 2.5)
+
+        make_column(chunk_manager, 0, 0)
+        make_column(chunk_manager, 1, 0)
+
+        # even though it was used most recently
+        chunk_manager.get_column(5, 5)
+
+        make_column(chunk_manager, 0, 1)
+        chunk_manager.evict()
+
+        self.assertNotIn((5, 5), chunk_manager.columns)
+        self.assertEqual(len(chunk_manager.columns), 2)
+
+    def test_unload_distance(self):
+
+        chunk_manager = ChunkManager(unload_distance=2)
+
+        for chunk_x in range(5):
+            make_column(chunk_manager, chunk_x, 0)
+
+        # we don't know where we are yet
+        self.assertEqual(len(chunk_manager.columns), 5)
+
+        chunk_manager.set_center(3.5, 7.5)
+
+        self.assertEqual(set(chunk_manager.columns), {(0, 0), (1, 0), (2, 0)})
+
+        chunk_manager.set_center(-20.0, 7.5)
+
+        self.assertEqual(set(chunk_manager.columns), {(0, 0)})
+
+
+def map_chunk_event(chunk_x, chunk_z, chunk_data=b''):
+
+    return SimpleNamespace(packet=SimpleNamespace(fields=SimpleNamespace(
+        x=chunk_x, z=chunk_z, groundUp=True, bitMap=0b11, chunkData=chunk_data, blockEntities=[])))
+
+
+class TestSharedWorld(unittest.TestCase):
+    def setUp(self):
+
+        self.world = World()
+
+        self.first = ChunkManager(world=self.world)
+        self.second = ChunkManager(world=self.world)
+
+    def test_shared_columns(self):
+
+        make_column(self.first)
+
+        self.assertIs(self.first.get(0, 0), self.second.get(0, 0))
+        self.assertEqual(len(self.world.columns), 1)
+
+        self.first.set_block(5, 40, 5, STONE)
+
+        self.assertEqual(self.second.get_block(5, 40, 5), STONE)
+
+        # the column stays until both have let go of it
+        self.first.unload(0, 0)
+
+        self.assertEqual(self.second.get_block(5, 40, 5), STONE)
+        self.assertIn((0, 0, 0), self.world.columns)
+
+        self.second.unload(0, 0)
+
+        self.assertEqual(self.world.columns, {})
+        self.assertEqual(self.world.references, {})
+
+    def test_chunk_decoded_once(self):
+
+        column = make_column(self.first)
+
+        # the second robot's copy of the packet isn't decoded (it would fail
+        # to be, given the data is missing)
+        self.second.on_map_chunk(map_chunk_event(0, 0))
+
+        self.assertIs(self.second.columns[(0, 0)], column)
+        self.assertEqual(self.second.get_block(3, 16, 4), GRASS)
+
+    def test_same_change_applied_once(self):
+
+        make_column(self.first)
+
+        self.first.set_block(5, 40, 5, STONE)
+
+        version = self.first.slice_version(0, 0, 2)
+
+        self.second.set_block(5, 40, 5, STONE)
+        self.second.set_blocks(0, 0, [(5, 40, 5, STONE)])
+
+        self.assertEqual(self.first.slice_version(0, 0, 2), version)
+
+        # clearing an empty slice doesn't create it
+        self.second.set_blocks(0, 0, [(5, 80, 5, 0)])
+
+        self.assertEqual(self.first.slice_version(0, 0, 5), 0)
+
+
+class TestSnapshots(unittest.TestCase):
+    def setUp(self):
+
+        self.chunk_manager = ChunkManager()
+
+        make_column(self.chunk_manager)
+
+    def test_unchanged_by_updates(self):
+
+        snapshot = self.chunk_manager.snapshot()
+
+        version = snapshot.slice_version(0, 0, 1)
+
+        self.chunk_manager.set_block(3, 16, 4, STONE)
+        self.chunk_manager.set_blocks(0, 0, [(1, 40, 1, STONE), (1, 41, 1, STONE)])
+
+        self.assertEqual(snapshot.get_block(3, 16, 4), GRASS)
+        self.assertEqual(snapshot.get_block(1, 40, 1), 0)
+        self.assertTrue(snapshot.is_standable(1, 17, 1))
+        self.assertEqual(snapshot.height(1, 1), 17)
+        self.assertEqual(snapshot.slice_version(0, 0, 1), version)
+
+        self.assertEqual(self.chunk_manager.get_block(3, 16, 4), STONE)
+        self.assertEqual(self.chunk_manager.height(1, 1), 42)
+        self.assertNotEqual(self.chunk_manager.slice_version(0, 0, 1), version)
+
+    def test_unloaded_columns(self):
+
+        snapshot = self.chunk_manager.snapshot()
+
+        self.chunk_manager.unload(0, 0)
+
+        self.assertEqual(snapshot.get_block(0, 0, 0), STONE)
+        self.assertIsNone(snapshot.get_block(16, 0, 0))
+
+    def test_slices_shared(self):
+
+        snapshot = self.chunk_manager.snapshot()
+
+        # nothing is copied until it changes
+        self.assertIs(snapshot.columns[(0, 0)].slices[0], self.chunk_manager.get(0, 0).slices[0])
+
+        self.chunk_manager.set_block(0, 0, 0, DIRT)
+
+        self.assertIsNot(snapshot.columns[(0, 0)].slices[0], self.chunk_manager.get(0, 0).slices[0])
+        self.assertIs(snapshot.columns[(0, 0)].slices[1], self.chunk_manager.get(0, 0).slices[1])
+
+    def test_around(self):
+
+        make_column(self.chunk_manager, 1, 0)
+        make_column(self.chunk_manager, 3, 0)
+
+        snapshot = self.chunk_manager.snapshot((0, 0), 1)
+
+        self.assertEqual(sorted(snapshot.columns), [(0, 0), (1, 0)])
+        self.assertEqual(snapshot.get_block(16, 0, 0), STONE)
+        self.assertIsNone(snapshot.get_block(48, 0, 0))
+
+
+class TestSearch(unittest.TestCase):
+    def setUp(self):
+
+        self.chunk_manager = ChunkManager()
+
+        make_column(self.chunk_manager)
+        make_column(self.chunk_manager, chunk_x=1)
+
+        self.origin = Position(8.5, 17.0, 8.5)
+
+    def test_counts(self):
+
+        column = self.chunk_manager.get(0, 0)
+
+        self.assertEqual(column.slices[0].counts, {STONE: 4096})
+        self.assertEqual(column.slices[1].counts, {0: 3840, DIRT: 255, GRASS: 1})
+
+        self.chunk_manager.set_blocks(0, 0, [(3, 16, 4, DIRT), (0, 17, 0, GRASS), (0, 18, 0, GRASS)])
+
+        self.assertEqual(column.slices[1].counts, {0: 3838, DIRT: 256, GRASS: 2})
+        self.assertTrue(column.slices[1].contains({GRASS >> 4}))
+        self.assertFalse(column.slices[1].contains({STONE >> 4}))
+
+    def test_find_nearest(self):
+
+        self.assertEqual(self.chunk_manager.find_nearest({GRASS >> 4}, self.origin, 32), (3, 16, 4))
+
+        # any metadata matches
+        self.chunk_manager.set_block(20, 16, 8, GRASS | 1)
+
+        self.assertEqual(self.chunk_manager.find_nearest({GRASS >> 4}, self.origin, 32), (3, 16, 4))
+        self.assertEqual(self.chunk_manager.find_nearest({GRASS >> 4}, Position(18.0, 17.0, 8.0), 32), (20, 16, 8))
+
+        self.assertIsNone(self.chunk_manager.find_nearest({GRASS >> 4}, self.origin, 4))
+        self.assertIsNone(self.chunk_manager.find_nearest({99}, self.origin, 32))
+
+        self.assertEqual(self.chunk_manager.find_nearest({STONE >> 4}, self.origin, 32), (8, 15, 8))
+
+    def test_find(self):
+
+        self.chunk_manager.set_block(20, 16, 8, GRASS)
+
+        self.assertEqual(self.chunk_manager.find({GRASS >> 4}, self.origin, 32), [(3, 16, 4), (19, 16, 4), (20, 16, 8)])
+        self.assertEqual(self.chunk_manager.find({GRASS >> 4}, self.origin, 8), [(3, 16, 4)])
+
+        self.assertEqual(len(self.chunk_manager.find({DIRT >> 4}, self.origin, 2)), 9)
@@ -0,0 +1,76 @@
+import json
+import os
+import tempfile
+import unittest
+
+import mcdata_cache
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+
+        self.directory = tempfile.TemporaryDirectory()
+
+        self.source = os.path.join(self.directory.name, 'data.json')
+        self.cache = os.path.join(self.directory.name, 'cache')
+
+        with open(self.source, 'w') as fout:
+            json.dump({'a': [1, 2, 3]}, fout)
+
+        self.builds = 0
+
+    def tearDown(self):
+
+        self.directory.cleanup()
+
+    def build(self, path):
+
+        self.builds += 1
+
+        with open(path, 'r') as fin:
+            return json.load(fin)
+
+    def test_cached(self):
+
+        for _ in range(3):
+            self.assertEqual(mcdata_cache.cached(self.source, self.build, 'test', self.cache), {'a': [1, 2, 3]})
+
+        self.assertEqual(self.builds, 1)
+
+        # something else built from the same file is cached separately
+        mcdata_cache.cached(self.source, self.build, 'other', self.cache)
+
+        self.assertEqual(self.builds, 2)
+
+    def test_source_changed(self):
+
+        mcdata_cache.cached(self.source, self.build, 'test', self.cache)
+
+        with open(self.source, 'w') as fout:
+            json.dump({'b': 4}, fout)
+
+        self.assertEqual(mcdata_cache.cached(self.source, self.build, 'test', self.cache), {'b': 4})
+        self.assertEqual(self.builds, 2)
+
+    def test_corrupt(self):
+
+        mcdata_cache.cached(self.source, self.build, 'test', self.cache)
+
+        with open(mcdata_cache.cache_path(self.source, 'test', self.cache), 'wb') as fout:
+            fout.write(b'junk')
+
+        self.assertEqual(mcdata_cache.load_json(self.source, self.cache), {'a': [1, 2, 3]})
+        self.assertEqual(mcdata_cache.cached(self.source, self.build, 'test', self.cache), {'a': [1, 2, 3]})
+        self.assertEqual(self.builds, 2)
+
+    def test_disabled(self):
+
+        mcdata_cache.cached(self.source, self.build, 'test', None)
+        mcdata_cache.cached(self.source, self.build, 'test', None)
+
+        self.assertEqual(self.builds, 2)
+        self.assertFalse(os.path.exists(self.cache))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+from types import SimpleNamespace
+
+from atoms import Position, Vector3
+from facing import Facing
+from movement import MovementEncoder
+
+
+def packet_class(name):
+
+    def make():
+        return SimpleNamespace(NAME=name, fields=SimpleNamespace())
+
+    return make
+
+
+class TestMovementEncoder(unittest.TestCase):
+    def setUp(self):
+
+        self.encoder = MovementEncoder(packet_class('flying'), packet_class('position'),
+                                       packet_class('look'), packet_class('position_look'))
+
+        self.position = Position(0.5, 64.0, 0.5)
+        self.facing = Facing()
+
+    def encode(self, on_ground=True):
+
+        packet = self.encoder.encode(self.position, self.facing, on_ground)
+
+        return None if packet is None else packet.NAME
+
+    def test_first_is_everything(self):
+
+        packet = self.encoder.encode(self.position, self.facing)
+
+        self.assertEqual(packet.NAME, 'position_look')
+        self.assertEqual((packet.fields.x, packet.fields.y, packet.fields.z), (0.5, 64.0, 0.5))
+        self.assertEqual((packet.fields.yaw, packet.fields.pitch), (0.0, 0.0))
+        self.assertTrue(packet.fields.onGround)
+
+    def test_smallest_packet(self):
+
+        self.encode()
+
+        self.assertIsNone(self.encode())
+
+        self.position += Vector3(0.5, 0.0, 0.0)
+        self.assertEqual(self.encode(), 'position')
+
+        self.facing.yaw = 90.0
+        self.assertEqual(self.encode(), 'look')
+
+        self.position += Vector3(0.0, 0.0, 0.5)
+        self.facing.pitch = 10.0
+        self.assertEqual(self.encode(), 'position_look')
+
+        self.assertEqual(self.encode(on_ground=False), 'flying')
+        self.assertIsNone(self.encode(on_ground=False))
+
+    def test_small_movements_accumulate(self):
+
+        self.encode()
+
+        self.position += Vector3(0.02, 0.0, 0.0)
+        self.assertIsNone(self.encode())
+
+        self.position += Vector3(0.02, 0.0, 0.0)
+        self.assertEqual(self.encode(), 'position')
+
+    def test_keep_position(self):
+
+        self.encode()
+
+        sent = [self.encode() for _ in range(MovementEncoder.POSITION_INTERVAL * 2)]
+
+        self.assertEqual(sent.count('position'), 2)
+        self.assertEqual(sent.count(None), MovementEncoder.POSITION_INTERVAL * 2 - 2)
+        self.assertEqual(sent[MovementEncoder.POSITION_INTERVAL - 1], 'position')
+
+    def test_reset(self):
+
+        self.encode()
+
+        self.encoder.reset()
+
+        self.assertEqual(self.encode(), 'position_look')
@@ -0,0 +1,296 @@
+from array import array
+import glob
+import gzip
+import io
+import os
+import struct
+import unittest
+
+from nbt import nbt
+
+
+TEST_DATA = os.path.join(os.path.dirname(__file__), '..', 'nbt', 'test_data')
+
+
+def read_test_data(name):
+
+    with open(os.path.join(TEST_DATA, name), 'rb') as fin:
+        data = fin.read()
+
+    if data[:2] == nbt.GZIP_MAGIC:
+        data = gzip.decompress(data)
+
+    return data
+
+
+class TestDecoder(unittest.TestCase):
+    def test_hello_world(self):
+
+        root = nbt.read(read_test_data('hello_world.nbt'))
+
+        self.assertEqual(nbt.nbt_to_python(root), {'hello world': {'name': 'Bananrama'}})
+
+    def test_bigtest(self):
+
+        root = nbt.load(os.path.join(TEST_DATA, 'bigtest.nbt'))
+
+        self.assertEqual(root.name, 'Level')
+
+        self.assertEqual(root['longTest'].value, 9223372036854775807)
+        self.assertEqual(root['shortTest'].value, 32767)
+        self.assertEqual(root['byteTest'].value, 127)
+        self.assertEqual(root['intTest'].value, 2147483647)
+        self.assertAlmostEqual(root['floatTest'].value, 0.49823147058486938)
+        self.assertEqual(root['doubleTest'].value, 0.49312871321823148)
+        self.assertEqual(root['stringTest'].value, 'HELLO WORLD THIS IS A TEST STRING ÅÄÖ!')
+
+        nested = root['nested compound test']
+
+        self.assertEqual(nested['egg']['name'].value, 'Eggbert')
+        self.assertEqual(nested['ham']['value'].value, 0.75)
+
+        self.assertEqual(root['listTest (long)'].to_python(), [11, 12, 13, 14, 15])
+
+        compounds = root['listTest (compound)'].to_python()
+
+        self.assertEqual(compounds[1], {'name': 'Compound tag #1', 'created-on': 1264099775885})
+
+        byte_array = root['byteArrayTest (the first 1000 values of (n*n*255+n*7)%100, '
+                          'starting with n=0 (0, 62, 34, 16, 8, ...))']
+
+        self.assertEqual(byte_array.to_python(), [(n * n * 255 + n * 7) % 100 for n in range(1000)])
+
+    def test_test_data(self):
+
+        for filename in glob.glob(os.path.join(TEST_DATA, '*')):
+
+            data = read_test_data(filename)
+
+            root, offset = nbt.decode(data)
+
+            self.assertEqual(offset, len(data), msg=filename)
+            self.assertEqual(offset, nbt.tag_end(data, 0), msg=filename)
+            self.assertIsInstance(root, nbt.CompoundTag)
+
+    def test_arrays(self):
+
+        data = (b'\x0a\x00\x00' +
+                b'\x0b\x00\x01a' + struct.pack('>i3i', 3, -1, 0, 2 ** 31 - 1) +
+                b'\x0c\x00\x01b' + struct.pack('>i2q', 2, -2 ** 63, 5) +
+                b'\x00')
+
+        root, offset = nbt.decode(data)
+
+        self.assertEqual(offset, len(data))
+        self.assertEqual(root['a'].values.tolist(), [-1, 0, 2 ** 31 - 1])
+        self.assertEqual(root['b'].values.tolist(), [-2 ** 63, 5])
+
+    def test_deep_nesting(self):
+
+        depth = 10000
+
+        # a list of lists of lists ... with the innermost holding an int
+        data = (b'\x09\x00\x00' +
+                b'\x09\x00\x00\x00\x01' * (depth - 1) +
+                b'\x03\x00\x00\x00\x01' + struct.pack('>i', 7))
+
+        root, offset = nbt.decode(data)
+
+        self.assertEqual(offset, len(data))
+
+        for _ in range(depth - 1):
+            root = root.items[0]
+
+        self.assertEqual(root.to_python(), [7])
+
+    def test_modified_utf8(self):
+
+        # NUL and U+1F600 as Java writes them
+        value = b'a\xc0\x80b\xed\xa0\xbd\xed\xb8\x80'
+
+        self.assertEqual(nbt.decode_string(value), 'a\x00b\U0001f600')
+
+    def test_parser_buffer(self):
+
+        data = read_test_data('hello_world.nbt')
+
+        buffer = nbt.Buffer(data + b'\xff')
+
+        root = nbt.Parser().decode(buffer)
+
+        self.assertEqual(root.name, 'hello world')
+        self.assertFalse(buffer.empty)
+
+
+class TestView(unittest.TestCase):
+    def setUp(self):
+
+        self.data = read_test_data('bigtest.nbt')
+        self.view = nbt.view(self.data)
+
+    def test_lookup(self):
+
+        self.assertIn('longTest', self.view)
+        self.assertEqual(len(self.view), 11)
+        self.assertEqual(self.view['longTest'], 9223372036854775807)
+        self.assertEqual(self.view['stringTest'], 'HELLO WORLD THIS IS A TEST STRING ÅÄÖ!')
+        self.assertEqual(self.view.type_of('shortTest'), 2)
+
+        with self.assertRaises(KeyError):
+            self.view['missing']
+
+    def test_cached(self):
+
+        nested = self.view['nested compound test']
+
+        self.assertIs(self.view['nested compound test'], nested)
+        self.assertIs(nested['ham'], nested['ham'])
+
+    def test_lists(self):
+
+        longs = self.view['listTest (long)']
+
+        self.assertEqual(len(longs), 5)
+        self.assertEqual(longs[0], 11)
+        self.assertEqual(longs[-1], 15)
+        self.assertEqual(list(longs), [11, 12, 13, 14, 15])
+
+        compounds = self.view['listTest (compound)']
+
+        self.assertEqual(compounds[1]['name'], 'Compound tag #1')
+
+        with self.assertRaises(IndexError):
+            compounds[2]
+
+    def test_query(self):
+
+        self.assertEqual(self.view.query('nested compound test.egg.value'), 0.5)
+        self.assertEqual(self.view.query(['listTest (compound)', 0, 'created-on']), 1264099775885)
+        self.assertEqual(self.view.query('listTest (compound).-1.name'), 'Compound tag #1')
+
+        self.assertIsNone(self.view.query('nested compound test.bacon'))
+        self.assertIsNone(self.view.query('longTest.deeper'))
+        self.assertEqual(self.view.query('listTest (long).9', 'none'), 'none')
+
+    def test_to_python(self):
+
+        self.assertEqual(self.view.to_python(), nbt.read(self.data).to_python())
+
+    def test_empty(self):
+
+        view = nbt.view(b'\x00')
+
+        self.assertEqual(len(view), 0)
+        self.assertIsNone(view.query('display.Name'))
+
+
+class TestEncoder(unittest.TestCase):
+    def test_round_trip(self):
+
+        for filename in glob.glob(os.path.join(TEST_DATA, '*')):
+
+            data = read_test_data(filename)
+
+            root = nbt.read(data)
+
+            self.assertEqual(root.to_bytes(), data, msg=filename)
+
+    def test_strings(self):
+
+        for value in ('', 'plain', 'ÅÄÖ', 'a\x00b', 'smile \U0001f600'):
+
+            tag = nbt.StringTag('s', value)
+
+            self.assertEqual(nbt.decode(tag.to_bytes())[0].value, value)
+
+        # NUL is never written as a zero byte
+        self.assertEqual(nbt.encode_string('a\x00'), b'a\xc0\x80')
+
+    def test_arrays(self):
+
+        values = [-2 ** 63, -1, 0, 2 ** 63 - 1]
+
+        expected = struct.pack('>4q', *values)
+
+        self.assertEqual(nbt.encode_array(values, 12), expected)
+        self.assertEqual(nbt.encode_array(array('q', values), 12), expected)
+        self.assertEqual(nbt.encode_array(array('q', values).tobytes(), 12), expected)
+
+        # the source array is left alone
+        source = array('i', [1, 2])
+
+        nbt.encode_array(source, 11)
+
+        self.assertEqual(source.tolist(), [1, 2])
+
+
+class TestWriter(unittest.TestCase):
+    def write_bigtest(self, writer, root):
+        '''Write bigtest.nbt a piece at a time.'''
+
+        writer.begin_compound(root.name)
+
+        for tag in root.items:
+
+            if tag.key == nbt.TAG_LIST:
+
+                writer.begin_list(tag.name, tag.subtype, len(tag.items))
+
+                for item in tag.items:
+                    writer.write(item)
+
+                writer.end_list()
+
+            elif tag.key == 7:
+                writer.write_array(tag.name, tag.key, tag.values)
+
+            else:
+                writer.write(tag)
+
+        writer.end_compound()
+
+    def test_streaming(self):
+
+        data = read_test_data('bigtest.nbt')
+        root = nbt.read(data)
+
+        fout = io.BytesIO()
+
+        with nbt.Writer(fout) as writer:
+            self.write_bigtest(writer, root)
+
+        self.assertEqual(fout.getvalue(), data)
+
+    def test_compressed(self):
+
+        data = read_test_data('bigtest.nbt')
+
+        fout = io.BytesIO()
+
+        with nbt.Writer(fout, compress=True) as writer:
+            self.write_bigtest(writer, nbt.read(data))
+
+        self.assertEqual(gzip.decompress(fout.getvalue()), data)
+        self.assertEqual(nbt.read(fout.getvalue()).to_python(), nbt.read(data).to_python())
+
+    def test_list_errors(self):
+
+        writer = nbt.Writer(io.BytesIO())
+
+        writer.begin_compound('root')
+        writer.begin_list('numbers', 3, 2)
+        writer.write(nbt.IntTag(None, 1))
+
+        with self.assertRaises(ValueError):
+            writer.write(nbt.StringTag(None, 'wrong type'))
+
+        with self.assertRaises(ValueError):
+            writer.end_list()
+
+        writer.write(nbt.IntTag(None, 2))
+
+        with self.assertRaises(ValueError):
+            writer.write(nbt.IntTag(None, 3))
+
+        writer.end_list()
+        writer.end_compound()
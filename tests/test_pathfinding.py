@@ -0,0 +1,197 @@
+import unittest
+
+from atoms import Position
+from map_chunk import ChunkManager
+from pathfinding import Navigator, Pathfinder, decode_node, encode_node
+
+
+STONE = 1 << 4
+LAVA = 11 << 4
+
+FLOOR = 63
+
+
+def flat_world(chunks=2):
+    '''A chunks x chunks area with a stone floor at y=63 (so we stand at
+    y=64).'''
+
+    chunk_manager = ChunkManager()
+
+    for chunk_x in range(chunks):
+        for chunk_z in range(chunks):
+
+            chunk_manager.get(chunk_x, chunk_z)
+            chunk_manager.set_blocks(chunk_x, chunk_z, [
+                (x, FLOOR, z, STONE) for x in range(16) for z in range(16)
+            ])
+
+    return chunk_manager
+
+
+def wall(chunk_manager, x, z_range, height=2, y=FLOOR + 1, block=STONE):
+
+    for z in z_range:
+        for dy in range(height):
+            chunk_manager.set_block(x, y + dy, z, block)
+
+
+class TestNodes(unittest.TestCase):
+    def test_round_trip(self):
+
+        for position in ((0, 0, 0), (1, 64, -1), (-33554432, 255, 33554431), (-5, 70, 12)):
+            self.assertEqual(decode_node(encode_node(*position)), position)
+
+
+class TestPathfinder(unittest.TestCase):
+    def setUp(self):
+
+        self.world = flat_world()
+        self.pathfinder = Pathfinder(self.world)
+
+    def assertWalkable(self, path):
+
+        for start, end in zip(path.waypoints, path.waypoints[1:]):
+            self.assertTrue(self.pathfinder.is_valid_move(start, end), msg='{} -> {}'.format(start, end))
+
+    def test_straight_line(self):
+
+        path = self.pathfinder.find_path((1, 64, 1), (11, 64, 1))
+
+        self.assertEqual(path.waypoints[0], (1, 64, 1))
+        self.assertEqual(path.waypoints[-1], (11, 64, 1))
+        self.assertEqual(len(path), 11)
+
+    def test_diagonal(self):
+
+        path = self.pathfinder.find_path((1, 64, 1), (6, 64, 6))
+
+        self.assertEqual(len(path), 6)
+        self.assertWalkable(path)
+
+    def test_detour(self):
+
+        wall(self.world, 5, range(0, 20))
+
+        path = self.pathfinder.find_path((2, 64, 2), (8, 64, 2))
+
+        self.assertEqual(path.waypoints[-1], (8, 64, 2))
+        self.assertWalkable(path)
+
+        for x, y, z in path.waypoints:
+            self.assertFalse(x == 5 and z < 20)
+
+    def test_step_up_and_fall(self):
+
+        # a one block step can be jumped, and dropped off
+        wall(self.world, 5, range(0, 32), height=1)
+
+        path = self.pathfinder.find_path((2, 64, 2), (8, 64, 2))
+
+        self.assertIn((5, 65, 2), path.waypoints)
+        self.assertWalkable(path)
+
+    def test_unreachable(self):
+
+        wall(self.world, 5, range(0, 32), height=2)
+
+        self.assertIsNone(self.pathfinder.find_path((2, 64, 2), (8, 64, 2)))
+
+        # outside of the loaded world
+        self.assertIsNone(self.pathfinder.find_path((2, 64, 2), (40, 64, 2)))
+
+    def test_avoids_hazards(self):
+
+        wall(self.world, 5, range(0, 10), height=1, y=FLOOR, block=LAVA)
+
+        path = self.pathfinder.find_path((2, 64, 2), (8, 64, 2))
+
+        for x, y, z in path.waypoints:
+            self.assertFalse(x == 5 and z < 10)
+
+
+class TestReplanning(unittest.TestCase):
+    def setUp(self):
+
+        self.world = flat_world()
+        self.pathfinder = Pathfinder(self.world)
+
+        self.path = self.pathfinder.find_path((2, 64, 2), (20, 64, 2))
+
+    def test_unrelated_change(self):
+
+        self.world.set_block(10, 64, 10, STONE)
+
+        self.assertTrue(self.path.is_stale(self.world))
+
+        path = self.pathfinder.repair(self.path, 0)
+
+        self.assertIs(path, self.path)
+        self.assertFalse(path.is_stale(self.world))
+
+    def test_blocked(self):
+
+        original = list(self.path.waypoints)
+
+        wall(self.world, 12, range(0, 10))
+
+        path = self.pathfinder.repair(self.path, 3)
+
+        # everything up to the obstruction is kept
+        self.assertEqual(path.waypoints[:10], original[:10])
+        self.assertEqual(path.waypoints[-1], (20, 64, 2))
+        self.assertNotIn((12, 64, 2), path.waypoints)
+
+    def test_snapshot(self):
+
+        snapshot = self.world.snapshot()
+
+        wall(self.world, 12, range(0, 10))
+
+        # planned against the world as it was
+        path = Pathfinder(snapshot).find_path((2, 64, 2), (20, 64, 2))
+
+        self.assertIn((12, 64, 2), path.waypoints)
+        self.assertTrue(path.is_stale(self.world))
+
+    def test_navigator(self):
+
+        navigator = Navigator(self.pathfinder, (2, 64, 2), (4, 64, 2))
+
+        position = Position(2.5, 64.0, 2.5)
+
+        self.assertEqual(navigator.next_waypoint(position), Position(3.5, 64.0, 2.5))
+
+        position = Position(3.5, 64.0, 2.5)
+
+        self.assertEqual(navigator.next_waypoint(position), Position(4.5, 64.0, 2.5))
+
+        position = Position(4.5, 64.0, 2.5)
+
+        self.assertIsNone(navigator.next_waypoint(position))
+        self.assertTrue(navigator.finished)
+
+    def test_navigator_ignores_height(self):
+
+        for x in (4, 5):
+            wall(self.world, x, range(0, 10), height=1)
+
+        navigator = Navigator(self.pathfinder, (2, 64, 2), (5, 65, 2))
+
+        self.assertEqual(navigator.next_waypoint(Position(2.5, 64.0, 2.5)), Position(3.5, 64.0, 2.5))
+
+        # half way up the step onto the next block counts as being there
+        self.assertEqual(navigator.next_waypoint(Position(3.5, 64.0, 2.5)), Position(4.5, 65.0, 2.5))
+        self.assertEqual(navigator.next_waypoint(Position(4.45, 64.6, 2.5)), Position(5.5, 65.0, 2.5))
+
+    def test_given_path(self):
+
+        path = self.pathfinder.find_path((2, 64, 2), (4, 64, 2), world=self.world.snapshot())
+
+        navigator = Navigator(self.pathfinder, (2, 64, 2), (4, 64, 2), path=path)
+
+        self.assertIs(navigator.path, path)
+        self.assertEqual(navigator.next_waypoint(Position(2.5, 64.0, 2.5)), Position(3.5, 64.0, 2.5))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,225 @@
+import unittest
+
+from atoms import Position
+from facing import Facing
+from map_chunk import ChunkManager
+from pathfinding import Navigator, Pathfinder
+from physics import STEP_HEIGHT, PlayerPhysics, offset, player_box
+
+
+STONE = 1 << 4
+
+FLOOR = 63
+
+# yaw facing +x
+EAST = -90.0
+
+
+def flat_world():
+    '''A 2 x 2 chunk area with a stone floor at y=63 (so we stand at y=64).'''
+
+    chunk_manager = ChunkManager()
+
+    for chunk_x in range(2):
+        for chunk_z in range(2):
+
+            chunk_manager.get(chunk_x, chunk_z)
+            chunk_manager.set_blocks(chunk_x, chunk_z, [
+                (x, FLOOR, z, STONE) for x in range(16) for z in range(16)
+            ])
+
+    return chunk_manager
+
+
+def run(physics, position, yaw, ticks):
+
+    for _ in range(ticks):
+        position = physics.step(*position, yaw)
+
+    return position
+
+
+class TestBoxes(unittest.TestCase):
+    def test_offset(self):
+
+        box = player_box(0.5, 64, 0.5)
+
+        # a block in the way
+        self.assertAlmostEqual(offset(box, (1, 64, 0, 2, 65, 1), 0, 1.0), 0.2)
+
+        # a block that isn't
+        self.assertEqual(offset(box, (1, 66, 0, 2, 67, 1), 0, 1.0), 1.0)
+        self.assertEqual(offset(box, (1, 64, 0, 2, 65, 1), 0, -1.0), -1.0)
+
+        # the floor
+        self.assertAlmostEqual(offset(box, (0, 63, 0, 1, 64, 1), 1, -0.5), 0.0)
+
+
+class TestPhysics(unittest.TestCase):
+
+    def setUp(self):
+
+        self.world = flat_world()
+        self.physics = PlayerPhysics(self.world)
+
+    def test_target(self):
+
+        self.physics.on_ground = True
+        self.physics.walk(sprint=True, target=(9.5, 8.5))
+
+        x, y, z = 8.5, 64.0, 8.5
+
+        for _ in range(20):
+            x, y, z = self.physics.step(x, y, z, EAST)
+
+        # it never gets past the target
+        self.assertAlmostEqual(x, 9.5)
+        self.assertEqual(z, 8.5)
+
+    def test_falling(self):
+
+        x, y, z = run(self.physics, (8.5, 70.0, 8.5), 0.0, 40)
+
+        self.assertEqual((x, y, z), (8.5, 64.0, 8.5))
+        self.assertTrue(self.physics.on_ground)
+
+    def test_first_fall(self):
+
+        # the distance fallen after a tick (see the vanilla client)
+        _, y, _ = self.physics.step(8.5, 70.0, 8.5, 0.0)
+
+        self.assertEqual(y, 70.0)
+
+        _, y, _ = self.physics.step(8.5, y, 8.5, 0.0)
+
+        self.assertAlmostEqual(y, 70.0 - 0.0784)
+
+    def test_unloaded(self):
+
+        self.assertEqual(self.physics.step(100.5, 70.0, 100.5, 0.0), (100.5, 70.0, 100.5))
+
+    def test_walking_speed(self):
+
+        position = run(self.physics, (2.5, 64.0, 8.5), EAST, 2)
+
+        self.physics.walk()
+
+        position = run(self.physics, position, EAST, 40)
+
+        x, y, z = self.physics.step(*position, EAST)
+
+        # 4.317 blocks a second
+        self.assertAlmostEqual((x - position[0]) * 20, 4.317, places=2)
+        self.assertEqual((y, z), (64.0, 8.5))
+
+    def test_sprinting_speed(self):
+
+        self.physics.walk(sprint=True)
+
+        position = run(self.physics, (2.5, 64.0, 8.5), EAST, 30)
+
+        x, _, _ = self.physics.step(*position, EAST)
+
+        # 5.612 blocks a second
+        self.assertAlmostEqual((x - position[0]) * 20, 5.612, places=2)
+
+    def test_stopping(self):
+
+        self.physics.walk()
+
+        position = run(self.physics, (2.5, 64.0, 8.5), EAST, 20)
+
+        self.physics.stop()
+
+        position = run(self.physics, position, EAST, 20)
+
+        self.assertEqual((self.physics.motion[0], self.physics.motion[2]), (0.0, 0.0))
+        self.assertEqual(position, self.physics.step(*position, EAST))
+
+    def test_wall(self):
+
+        for y in (64, 65):
+            self.world.set_block(10, y, 8, STONE)
+
+        self.physics.walk()
+
+        x, y, z = run(self.physics, (2.5, 64.0, 8.5), EAST, 60)
+
+        self.assertAlmostEqual(x, 10 - 0.3)
+        self.assertEqual((y, z), (64.0, 8.5))
+
+    def test_step_up(self):
+
+        # a ledge one block high is too high to step up onto...
+        self.world.set_blocks(0, 0, [(x, 64, z, STONE) for x in range(10, 16) for z in range(16)])
+
+        self.physics.walk()
+
+        x, y, _ = run(self.physics, (2.5, 64.0, 8.5), EAST, 60)
+
+        self.assertAlmostEqual(x, 10 - 0.3)
+        self.assertEqual(y, 64.0)
+
+        self.assertLess(STEP_HEIGHT, 1.0)
+
+        # ...but can be jumped onto
+        self.physics.walk(jump=True)
+
+        x, y, _ = run(self.physics, (x, y, 8.5), EAST, 1)
+
+        self.physics.walk()
+
+        x, y, _ = run(self.physics, (x, y, 8.5), EAST, 20)
+
+        self.assertGreater(x, 10.3)
+        self.assertEqual(y, 65.0)
+
+    def test_sliding(self):
+
+        # moving diagonally into a wall slides along it
+        for z in range(16):
+            self.world.set_block(10, 64, z, STONE)
+            self.world.set_block(10, 65, z, STONE)
+
+        self.physics.walk()
+
+        _, _, z = run(self.physics, (2.5, 64.0, 2.5), -45.0, 60)
+
+        self.assertGreater(z, 10.0)
+
+
+class TestNavigating(unittest.TestCase):
+    def test_path(self):
+
+        world = flat_world()
+
+        # a wall to walk around, and a step to jump up
+        for z in range(12):
+            world.set_block(8, 64, z, STONE)
+            world.set_block(8, 65, z, STONE)
+
+        for x in range(12, 16):
+            for z in range(16):
+                world.set_block(x, 64, z, STONE)
+
+        physics = PlayerPhysics(world)
+
+        position = Position(2.5, 64.0, 2.5)
+        facing = Facing()
+
+        navigator = Navigator(Pathfinder(world), (2, 64, 2), (14, 65, 2))
+
+        for _ in range(200):
+
+            waypoint = navigator.next_waypoint(position)
+
+            if waypoint is None:
+                break
+
+            facing.at(position, waypoint)
+            physics.walk(jump=waypoint.y - position.y > STEP_HEIGHT, sprint=True, target=(waypoint.x, waypoint.z))
+
+            position = Position(*physics.step(*position, facing.yaw))
+
+        self.assertTrue(navigator.finished)
+        self.assertEqual((int(position.x), position.y, int(position.z)), (14, 65.0, 2))
@@ -0,0 +1,167 @@
+import unittest
+from types import SimpleNamespace
+
+from rate_limiter import RateLimiter
+
+
+class FakeClock:
+
+    def __init__(self):
+
+        self.now = 0.0
+
+    def __call__(self):
+
+        return self.now
+
+
+class FakeConnection:
+
+    def __init__(self):
+
+        self.sent = []
+
+    def send(self, packet):
+
+        self.sent.append(packet.NAME)
+
+
+def packet(name, on_ground=True):
+
+    return SimpleNamespace(NAME=name, fields=SimpleNamespace(onGround=on_ground))
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+
+        self.clock = FakeClock()
+        self.connection = FakeConnection()
+
+        self.limiter = RateLimiter(self.connection, rate=10.0, burst=3,
+                                   class_limits={'chat': (1.0, 1)}, max_queued=4, clock=self.clock)
+
+    def test_within_limits(self):
+
+        for name in ('block_place', 'use_entity'):
+            self.limiter.send(packet(name))
+
+        self.assertEqual(self.connection.sent, ['block_place', 'use_entity'])
+        self.assertEqual(self.limiter.counters['sent'], 2)
+
+    def test_deferred(self):
+
+        for n in range(5):
+            self.limiter.send(packet('block_place'))
+
+        self.assertEqual(len(self.connection.sent), 3)
+        self.assertEqual(self.limiter.counters['deferred'], 2)
+
+        # nothing's been earned yet
+        self.limiter.flush()
+
+        self.assertEqual(len(self.connection.sent), 3)
+
+        self.clock.now += 0.1
+
+        self.limiter.flush()
+
+        self.assertEqual(len(self.connection.sent), 4)
+
+        self.clock.now += 1.0
+
+        self.limiter.flush()
+
+        self.assertEqual(len(self.connection.sent), 5)
+
+    def test_priorities(self):
+
+        for name in ('block_place', 'block_place', 'block_place', 'chat', 'block_place', 'block_dig'):
+            self.limiter.send(packet(name))
+
+        # keep alives skip the queue even when there aren't any tokens
+        self.limiter.send(packet('keep_alive'))
+
+        self.assertEqual(self.connection.sent[3:], ['keep_alive'])
+
+        self.clock.now += 10.0
+
+        self.limiter.flush()
+
+        self.assertEqual(self.connection.sent[4:], ['block_dig', 'block_place', 'chat'])
+
+    def test_class_limit(self):
+
+        self.limiter.send(packet('chat'))
+        self.limiter.send(packet('chat'))
+        self.limiter.send(packet('block_place'))
+
+        self.assertEqual(self.connection.sent, ['chat'])
+
+        self.clock.now += 0.5
+
+        # the chat waits for its own bucket, but doesn't hold up the rest
+        self.limiter.flush()
+
+        self.assertEqual(self.connection.sent, ['chat', 'block_place'])
+
+        self.clock.now += 0.5
+
+        self.limiter.flush()
+
+        self.assertEqual(self.connection.sent, ['chat', 'block_place', 'chat'])
+
+    def test_dropped(self):
+
+        for name in ['block_place'] * 3 + ['chat'] * 4:
+            self.limiter.send(packet(name))
+
+        # the queue is full of chat, which makes way for something more important
+        self.limiter.send(packet('block_dig'))
+
+        self.assertEqual(self.limiter.counters['dropped'], 1)
+
+        self.limiter.send(packet('chat'))
+
+        self.assertEqual(self.limiter.counters['dropped'], 2)
+
+        self.clock.now += 10.0
+
+        self.limiter.flush()
+
+        self.assertEqual(self.connection.sent[3:], ['block_dig', 'chat'])
+
+    def test_movement_coalesced(self):
+
+        self.limiter.send(packet('position_look'))
+        self.limiter.send(packet('flying'))
+        self.limiter.send(packet('position'))
+        self.limiter.send(packet('look'))
+        self.limiter.send(packet('position'))
+
+        # held until the end of the tick
+        self.assertEqual(self.connection.sent, [])
+
+        self.limiter.flush()
+
+        self.assertEqual(self.connection.sent, ['look', 'position'])
+        self.assertEqual(self.limiter.counters['coalesced'], 3)
+
+        self.limiter.send(packet('flying'))
+        self.limiter.send(packet('flying'))
+        self.limiter.flush()
+
+        self.assertEqual(self.connection.sent, ['look', 'position', 'flying'])
+
+    def test_on_ground_kept(self):
+
+        moved = packet('position', on_ground=True)
+
+        self.limiter.send(moved)
+
+        # landing (or taking off) after moving still gets through
+        self.limiter.send(packet('flying', on_ground=False))
+
+        self.limiter.flush()
+
+        self.assertEqual(self.connection.sent, ['position'])
+        self.assertFalse(moved.fields.onGround)
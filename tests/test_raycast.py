@@ -0,0 +1,131 @@
+import unittest
+
+from atoms import Face, Position
+from map_chunk import ChunkManager
+from raycast import REACH, Raycaster, eye
+
+
+STONE = 1 << 4
+WATER = 9 << 4
+
+FLOOR = 63
+
+
+def flat_world():
+    '''A chunk with a stone floor at y=63 (so we stand at y=64).'''
+
+    chunk_manager = ChunkManager()
+
+    chunk_manager.get(0, 0)
+    chunk_manager.set_blocks(0, 0, [(x, FLOOR, z, STONE) for x in range(16) for z in range(16)])
+
+    return chunk_manager
+
+
+class TestCast(unittest.TestCase):
+    def setUp(self):
+
+        self.world = flat_world()
+        self.raycaster = Raycaster(self.world)
+
+        self.eye = eye(Position(8.5, 64.0, 8.5))
+
+    def test_down(self):
+
+        hit = self.raycaster.cast(self.eye, (0.0, -1.0, 0.0))
+
+        self.assertEqual(hit.location, (8, FLOOR, 8))
+        self.assertEqual(hit.face, Face.Top)
+        self.assertEqual(hit.cursor, (0.5, 1.0, 0.5))
+        self.assertAlmostEqual(hit.distance, 1.62)
+
+    def test_faces(self):
+
+        for direction, location, face in (((1.0, 0.0, 0.0), (10, 65, 8), Face.West),
+                                          ((-1.0, 0.0, 0.0), (6, 65, 8), Face.East),
+                                          ((0.0, 0.0, 1.0), (8, 65, 10), Face.North),
+                                          ((0.0, 0.0, -1.0), (8, 65, 6), Face.South),
+                                          ((0.0, 1.0, 0.0), (8, 67, 8), Face.Bottom)):
+
+            self.world.set_block(*location, STONE)
+
+            hit = self.raycaster.cast(self.eye, direction)
+
+            self.assertEqual((hit.location, hit.face), (location, face))
+
+    def test_cursor(self):
+
+        self.world.set_block(10, 65, 8, STONE)
+
+        hit = self.raycaster.cast_at(self.eye, (10.0, 65.25, 8.75))
+
+        self.assertEqual(hit.location, (10, 65, 8))
+        self.assertEqual(hit.face, Face.West)
+
+        self.assertAlmostEqual(hit.cursor[0], 0.0)
+        self.assertAlmostEqual(hit.cursor[1], 0.25)
+        self.assertAlmostEqual(hit.cursor[2], 0.75)
+
+    def test_misses(self):
+
+        # out of reach
+        self.world.set_block(8, 65, 14, STONE)
+        self.assertIsNone(self.raycaster.cast(self.eye, (0.0, 0.0, 1.0)))
+        self.assertIsNotNone(self.raycaster.cast(self.eye, (0.0, 0.0, 1.0), reach=6.0))
+
+        # through water
+        self.world.set_block(8, 65, 9, WATER)
+        self.assertEqual(self.raycaster.cast(self.eye, (0.0, 0.0, 1.0), reach=6.0).location, (8, 65, 14))
+
+        # into a column that isn't loaded
+        self.assertIsNone(self.raycaster.cast(eye(Position(0.5, 64.0, 0.5)), (-1.0, 0.0, 0.0)))
+
+        self.assertIsNone(self.raycaster.cast(self.eye, (0.0, 0.0, 0.0)))
+
+
+class TestReach(unittest.TestCase):
+    def setUp(self):
+
+        self.world = flat_world()
+        self.raycaster = Raycaster(self.world)
+
+        self.eye = eye(Position(8.5, 64.0, 8.5))
+
+    def test_hidden(self):
+
+        self.world.set_block(11, 64, 8, STONE)
+
+        hit = self.raycaster.reach(self.eye, (11, 64, 8))
+
+        self.assertEqual((hit.location, hit.face), ((11, 64, 8), Face.West))
+
+        # with its side hidden we can still see its top
+        self.world.set_block(10, 64, 8, STONE)
+
+        self.assertEqual(self.raycaster.reach(self.eye, (11, 64, 8)).face, Face.Top)
+
+        # but not once that's covered too
+        self.world.set_block(11, 65, 8, STONE)
+
+        self.assertIsNone(self.raycaster.reach(self.eye, (11, 64, 8)))
+        self.assertEqual(self.raycaster.reach(self.eye, (10, 64, 8)).location, (10, 64, 8))
+
+    def test_nearest_reachable(self):
+
+        ores = [(12, 64, 8), (8, 64, 3), (10, 64, 8), (9, 64, 9)]
+
+        for location in ores:
+            self.world.set_block(*location, STONE)
+
+        # the nearest is walled in
+        self.world.set_blocks(0, 0, [(9, 65, 9, STONE), (9, 64, 10, STONE), (10, 64, 9, STONE),
+                                     (8, 64, 9, STONE), (9, 64, 8, STONE)])
+
+        hit = self.raycaster.nearest_reachable(self.eye, ores)
+
+        self.assertEqual(hit.location, (10, 64, 8))
+
+        self.assertIsNone(self.raycaster.nearest_reachable(self.eye, [(8, 64, 3)]))
+        self.assertIsNone(self.raycaster.nearest_reachable(self.eye, []))
+
+        self.assertGreater(REACH, 4.0)
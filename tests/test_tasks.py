@@ -0,0 +1,263 @@
+from concurrent.futures import Future
+import unittest
+from types import SimpleNamespace
+
+from tasks import Budget, Dig, GoTo, Say, Scheduler, Task, Wait
+
+
+class Recorder(Task):
+    '''Takes a number of ticks, recording what happens to it.'''
+
+    def __init__(self, log, name, ticks=1, packets=0):
+
+        super().__init__()
+
+        self.log = log
+        self.name = name
+        self.ticks = ticks
+        self.packets = packets
+
+    def step(self, budget):
+
+        if not budget.spend(self.packets):
+            return False
+
+        self.log.append(self.name)
+
+        self.ticks -= 1
+
+        return self.ticks <= 0
+
+    def stop(self):
+
+        self.log.append('stop ' + self.name)
+
+
+class TestBudget(unittest.TestCase):
+    def test_spend(self):
+
+        budget = Budget(3)
+
+        self.assertTrue(budget.spend(2))
+        self.assertFalse(budget.spend(2))
+        self.assertTrue(budget.spend())
+        self.assertEqual(budget.remaining, 0)
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+
+        self.log = []
+        self.scheduler = Scheduler(packets_per_tick=2)
+
+    def tick(self, count=1):
+
+        for _ in range(count):
+            self.log.append('|')
+            self.scheduler.tick()
+
+    def test_in_order(self):
+
+        self.scheduler.add(Recorder(self.log, 'a', ticks=2, packets=1))
+        self.scheduler.add(Recorder(self.log, 'b', ticks=1, packets=1))
+        self.scheduler.add(Recorder(self.log, 'c', ticks=1, packets=1))
+
+        self.tick(4)
+
+        # b finished in a's tick, but c had to wait for more packets
+        self.assertEqual(self.log, ['|', 'a', '|', 'a', 'b', '|', 'c', '|'])
+        self.assertTrue(self.scheduler.idle)
+
+    def test_budget(self):
+
+        self.scheduler.add(Say(SimpleNamespace(say=lambda message, recipient: self.log.append(message)), 'hi', 'bob'))
+        self.scheduler.add(Recorder(self.log, 'big', packets=3))
+
+        # a task that needs more than a tick's worth never runs
+        self.tick(3)
+
+        self.assertEqual(self.log, ['|', 'hi', '|', '|'])
+
+    def test_precondition(self):
+
+        blocked = Recorder(self.log, 'blocked')
+        blocked.ready = lambda: self.ready
+
+        self.ready = False
+
+        self.scheduler.add(blocked)
+        self.scheduler.add(Recorder(self.log, 'after'))
+
+        self.tick(2)
+
+        self.ready = True
+
+        self.tick()
+
+        self.assertEqual(self.log, ['|', '|', '|', 'blocked', 'after'])
+
+    def test_cancel(self):
+
+        first = self.scheduler.add(Recorder(self.log, 'first', ticks=5))
+        second = self.scheduler.add(Recorder(self.log, 'second'))
+        third = self.scheduler.add(Recorder(self.log, 'third'))
+
+        self.tick()
+
+        self.scheduler.cancel(second)
+        self.scheduler.cancel(first)
+
+        self.tick()
+
+        self.assertEqual(self.log, ['|', 'first', 'stop first', '|', 'third'])
+        self.assertTrue(first.cancelled and second.cancelled)
+        self.assertTrue(third.finished)
+
+    def test_cancel_all(self):
+
+        self.scheduler.add(Recorder(self.log, 'first', ticks=5))
+        self.scheduler.add(Recorder(self.log, 'second'))
+
+        self.tick()
+
+        self.scheduler.cancel()
+
+        self.tick()
+
+        self.assertEqual(self.log, ['|', 'first', 'stop first', '|'])
+        self.assertTrue(self.scheduler.idle)
+
+    def test_wait(self):
+
+        self.scheduler.add(Wait(2))
+        self.scheduler.add(Recorder(self.log, 'done'))
+
+        self.tick(3)
+
+        self.assertEqual(self.log, ['|', '|', '|', 'done'])
+
+
+class FakeRobot:
+
+    def __init__(self, reachable=True, planned=True):
+
+        self.reachable = reachable
+        self.planned = planned
+        self.navigator = None
+        self.route = None
+
+        self.said = []
+
+        self.model = SimpleNamespace(say=lambda message, recipient: self.said.append(message),
+                                     do_stop=self.arrive)
+
+        self.digger = SimpleNamespace(busy=False, dig=self.dig, cancel=lambda: None,
+                                      tick=lambda budget: None)
+
+    def plan_route(self, destination):
+
+        self.route = Future()
+
+        if self.planned:
+            self.plan()
+
+        return self.route
+
+    def plan(self):
+
+        self.route.set_result(['path'] if self.reachable else None)
+
+    def follow(self, destination, path):
+
+        self.navigator = path
+
+    def arrive(self):
+
+        self.navigator = None
+
+    def dig(self, target):
+
+        self.digger.busy = True
+
+
+class TestRobotTasks(unittest.TestCase):
+    def test_go_to_then_dig(self):
+
+        robot = FakeRobot()
+        scheduler = Scheduler()
+
+        go_to = scheduler.add(GoTo(robot, (1, 2, 3), 'bob', success='on my way'))
+        dig = scheduler.add(Dig(robot, (1, 1, 3)))
+
+        scheduler.tick()
+
+        self.assertEqual(robot.said, ['on my way'])
+        self.assertFalse(dig.started)
+
+        robot.arrive()
+        scheduler.tick()
+
+        self.assertTrue(go_to.finished)
+        self.assertTrue(dig.started)
+        self.assertTrue(robot.digger.busy)
+
+        robot.digger.busy = False
+        scheduler.tick()
+
+        self.assertTrue(dig.finished)
+
+    def test_unreachable(self):
+
+        robot = FakeRobot(reachable=False)
+        scheduler = Scheduler()
+
+        go_to = scheduler.add(GoTo(robot, (1, 2, 3), 'bob'))
+
+        scheduler.tick()
+
+        self.assertTrue(go_to.finished)
+        self.assertEqual(robot.said, ["I can't find a way there."])
+
+    def test_waits_for_the_route(self):
+
+        robot = FakeRobot(planned=False)
+        scheduler = Scheduler()
+
+        go_to = scheduler.add(GoTo(robot, (1, 2, 3), 'bob', success='on my way'))
+
+        scheduler.tick()
+        scheduler.tick()
+
+        self.assertFalse(go_to.finished)
+        self.assertEqual(robot.said, [])
+
+        robot.plan()
+        scheduler.tick()
+
+        self.assertEqual(robot.said, ['on my way'])
+        self.assertEqual(robot.navigator, ['path'])
+
+    def test_reply_waits_for_the_budget(self):
+
+        robot = FakeRobot(reachable=False)
+
+        go_to = GoTo(robot, (1, 2, 3), 'bob')
+
+        self.assertFalse(go_to.start(Budget(0)))
+        self.assertEqual(robot.said, [])
+
+        self.assertTrue(go_to.step(Budget(1)))
+        self.assertEqual(robot.said, ["I can't find a way there."])
+
+    def test_cancel_while_planning(self):
+
+        robot = FakeRobot(planned=False)
+        scheduler = Scheduler()
+
+        go_to = scheduler.add(GoTo(robot, (1, 2, 3), 'bob'))
+
+        scheduler.tick()
+        scheduler.cancel()
+
+        self.assertTrue(go_to.cancelled)
+        self.assertTrue(robot.route.cancelled())
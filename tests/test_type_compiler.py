@@ -0,0 +1,178 @@
+import struct
+import unittest
+
+from type_compiler import TypeCompiler, UnsupportedTypeException
+
+
+# a cut down version of the "types" section of protocol.json
+TYPES = {
+    'varint': 'native',
+    'i8': 'native',
+    'u8': 'native',
+    'i16': 'native',
+    'i32': 'native',
+    'bool': 'native',
+    'string': 'native',
+    'container': 'native',
+    'switch': 'native',
+    'option': 'native',
+    'array': 'native',
+    'bitfield': 'native',
+    'mapper': 'native',
+    'void': 'native',
+    'nbt': 'native',
+    'optionalNbt': 'native',
+    'pstring': 'native',
+    'buffer': 'native',
+    'entityMetadataLoop': 'native',
+    'vec': ['container', [
+        {'name': 'x', 'type': 'i8'},
+        {'name': 'y', 'type': 'i8'},
+    ]],
+    'tagged': ['switch', {
+        'compareTo': '$compareTo',
+        'fields': {
+            '0': 'i8',
+            '1': 'string',
+        }
+    }],
+    'metadata': ['entityMetadataLoop', {
+        'endVal': 255,
+        'type': ['container', [
+            {'name': 'key', 'type': 'u8'},
+            {'name': 'type', 'type': 'i8'},
+            {'name': 'value', 'type': ['tagged', {'compareTo': 'type'}]},
+        ]]
+    }],
+}
+
+
+class TestTypeCompiler(unittest.TestCase):
+    def setUp(self):
+
+        self.compiler = TypeCompiler(TYPES)
+
+    def decode(self, spec, data):
+
+        value, offset = self.compiler.compile(spec)(data, 0, len(data), [])
+
+        self.assertEqual(offset, len(data))
+
+        return value
+
+    def test_container(self):
+
+        spec = ['container', [
+            {'name': 'a', 'type': 'varint'},
+            {'name': 'b', 'type': 'vec'},
+            {'anon': True, 'type': ['container', [{'name': 'c', 'type': 'bool'}]]},
+        ]]
+
+        value = self.decode(spec, b'\x05\x01\x02\x01')
+
+        self.assertEqual(value, {'a': 5, 'b': {'x': 1, 'y': 2}, 'c': True})
+
+    def test_switch(self):
+
+        spec = ['container', [
+            {'name': 'action', 'type': 'varint'},
+            {'name': 'data', 'type': ['switch', {
+                'compareTo': 'action',
+                'fields': {
+                    '0': 'i32',
+                    '1': ['container', [
+                        {'name': 'nested', 'type': ['switch', {
+                            'compareTo': '../action',
+                            'fields': {'1': 'i8'},
+                        }]},
+                    ]],
+                },
+                'default': 'void',
+            }]},
+        ]]
+
+        self.assertEqual(self.decode(spec, b'\x00\x00\x00\x00\x07'), {'action': 0, 'data': 7})
+        self.assertEqual(self.decode(spec, b'\x01\x09'), {'action': 1, 'data': {'nested': 9}})
+        self.assertEqual(self.decode(spec, b'\x02'), {'action': 2, 'data': None})
+
+    def test_option(self):
+
+        spec = ['option', 'i16']
+
+        self.assertEqual(self.decode(spec, b'\x00'), None)
+        self.assertEqual(self.decode(spec, b'\x01\xff\xfe'), -2)
+
+    def test_arrays(self):
+
+        self.assertEqual(
+            self.decode(['array', {'countType': 'varint', 'type': 'i16'}], b'\x02\x00\x01\xff\xff'),
+            [1, -1])
+
+        self.assertEqual(
+            self.decode(['array', {'countType': 'varint', 'type': 'string'}], b'\x02\x01a\x02bc'),
+            ['a', 'bc'])
+
+        self.assertEqual(
+            self.decode(['array', {'count': 2, 'type': 'vec'}], b'\x01\x02\x03\x04'),
+            [{'x': 1, 'y': 2}, {'x': 3, 'y': 4}])
+
+        spec = ['container', [
+            {'name': 'count', 'type': 'u8'},
+            {'name': 'values', 'type': ['array', {'count': 'count', 'type': 'u8'}]},
+        ]]
+
+        self.assertEqual(self.decode(spec, b'\x03\x01\x02\x03'), {'count': 3, 'values': [1, 2, 3]})
+
+        self.assertEqual(self.decode(['array', {'count': 3, 'type': 'i16'}], b'\x00\x01\xff\xff\x00\x02'),
+                         [1, -1, 2])
+
+    def test_inline_cache(self):
+
+        spec = ['array', {'countType': 'varint', 'type': ['container', [{'name': 'x', 'type': 'i8'}]]}]
+
+        decoder = self.compiler.compile(spec)
+
+        # an equal spec (i.e. from another packet) shares the decoder
+        self.assertIs(self.compiler.compile(list(spec)), decoder)
+        self.assertIsNot(self.compiler.compile(['array', {'countType': 'varint', 'type': 'i8'}]), decoder)
+
+        self.assertEqual(self.decode(spec, b'\x02\x01\xff'), [{'x': 1}, {'x': -1}])
+
+    def test_bitfield(self):
+
+        spec = ['bitfield', [
+            {'name': 'x', 'size': 26, 'signed': True},
+            {'name': 'y', 'size': 12, 'signed': True},
+            {'name': 'z', 'size': 26, 'signed': False},
+        ]]
+
+        data = struct.pack('>Q', (0x3ffffff << 38) | (5 << 26) | 7)
+
+        self.assertEqual(self.decode(spec, data), {'x': -1, 'y': 5, 'z': 7})
+
+    def test_mapper(self):
+
+        spec = ['mapper', {'type': 'varint', 'mappings': {'0x00': 'first', '0x01': 'second'}}]
+
+        self.assertEqual(self.decode(spec, b'\x01'), 'second')
+
+    def test_nbt(self):
+
+        compound = b'\x0a\x00\x00\x01\x00\x01a\x05\x00'
+
+        self.assertEqual(self.decode('nbt', compound), compound)
+        self.assertEqual(self.decode('optionalNbt', b'\x00'), None)
+
+    def test_parameterized_metadata(self):
+
+        data = b'\x00\x00\x05' + b'\x02\x01\x02hi' + b'\xff'
+
+        self.assertEqual(self.decode('metadata', data), [
+            {'key': 0, 'type': 0, 'value': 5},
+            {'key': 2, 'type': 1, 'value': 'hi'},
+        ])
+
+    def test_unsupported(self):
+
+        with self.assertRaises(UnsupportedTypeException):
+            self.compiler.compile(['noSuchType', {}])
@@ -0,0 +1,246 @@
+from array import array
+import os
+import tempfile
+from types import SimpleNamespace
+import unittest
+
+from map_chunk import ChunkManager
+from world_cache import GROWTH_PAGES, WorldCache
+
+
+STONE = 1 << 4
+DIRT = 3 << 4
+
+
+def section(value):
+
+    return array('H', [value]) * 4096
+
+
+class TestWorldCache(unittest.TestCase):
+    def setUp(self):
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = WorldCache(self.directory.name)
+
+    def tearDown(self):
+
+        self.cache.close()
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+
+        sections = [None] * 16
+        sections[0] = section(STONE)
+        sections[3] = section(DIRT)
+        sections[3][100] = STONE
+
+        self.cache.store_column(0, -3, 40, sections, timestamp=1234.0)
+
+        self.assertIn((0, -3, 40), self.cache)
+        self.assertNotIn((0, -3, 41), self.cache)
+        self.assertNotIn((-1, -3, 40), self.cache)
+
+        loaded, written = self.cache.load_column(0, -3, 40)
+
+        self.assertEqual(loaded, sections)
+        self.assertEqual(written, 1234.0)
+
+        self.assertIsNone(self.cache.load_column(0, 100, 100))
+
+    def test_reopen(self):
+
+        for chunk_x in range(8):
+            self.cache.store_column(0, chunk_x, 0, [section(chunk_x)] * 16)
+
+        self.cache.close()
+
+        self.cache = WorldCache(self.directory.name)
+
+        for chunk_x in range(8):
+            self.assertEqual(self.cache.load_column(0, chunk_x, 0)[0], [section(chunk_x)] * 16)
+
+    def test_pages_are_reused(self):
+
+        self.cache.store_column(0, 0, 0, [section(STONE)] * 16)
+
+        region = self.cache._region(0, 0, 0)
+        pages = region.page_count
+
+        self.assertGreater(pages, 0)
+        self.assertLess(pages, GROWTH_PAGES)
+
+        # unchanged, changed, emptied and refilled sections keep their pages
+        self.cache.store_column(0, 0, 0, [section(STONE)] * 16)
+        self.cache.store_column(0, 0, 0, [section(DIRT)] * 16)
+        self.cache.store_column(0, 0, 0, [None] * 16)
+
+        self.assertEqual(self.cache.load_column(0, 0, 0)[0], [None] * 16)
+
+        self.cache.store_column(0, 0, 0, [section(DIRT)] * 16)
+
+        self.assertEqual(self.cache.load_column(0, 0, 0)[0], [section(DIRT)] * 16)
+        self.assertEqual(region.page_count, pages)
+
+    def test_corruption(self):
+
+        self.cache.store_column(0, 0, 0, [section(STONE)] + [None] * 15)
+
+        self.cache.store_column(0, 1, 0, [section(DIRT)] + [None] * 15)
+
+        region = self.cache._region(0, 0, 0)
+        region._map[region._page_offset(1)] ^= 0xff
+
+        # a damaged section isn't air, the whole column has to be sent again
+        self.assertIsNone(self.cache.load_column(0, 0, 0))
+        self.assertNotIn((0, 0, 0), self.cache)
+
+        # and it stays forgotten after reopening
+        self.cache.close()
+        self.cache = WorldCache(self.directory.name)
+
+        self.assertNotIn((0, 0, 0), self.cache)
+        self.assertEqual(self.cache.load_column(0, 1, 0)[0][0], section(DIRT))
+
+        # storing it again works as usual
+        self.cache.store_column(0, 0, 0, [section(STONE)] + [None] * 15)
+
+        self.assertEqual(self.cache.load_column(0, 0, 0)[0][0], section(STONE))
+
+
+class TestWarmStart(unittest.TestCase):
+    def setUp(self):
+
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+
+        self.directory.cleanup()
+
+    def test_warm_start(self):
+
+        cache = WorldCache(self.directory.name)
+
+        chunk_manager = ChunkManager(cache=cache)
+        chunk_manager.get(1, 2)
+        chunk_manager.set_blocks(1, 2, [(x, 63, z, STONE) for x in range(16) for z in range(16)])
+
+        chunk_manager.save()
+        cache.close()
+
+        # a new connection can see the world as soon as it knows where it is
+        cache = WorldCache(self.directory.name)
+        chunk_manager = ChunkManager(cache=cache)
+
+        # the queries themselves never load anything
+        self.assertIsNone(chunk_manager.get_block(20, 63, 40))
+        self.assertNotIn((1, 2), chunk_manager.columns)
+
+        chunk_manager.set_center(0.5, 0.5)
+
+        self.assertEqual(chunk_manager.get_block(20, 63, 40), STONE)
+        self.assertTrue(chunk_manager.is_standable(20, 64, 40))
+        self.assertEqual(chunk_manager.height(20, 40), 64)
+        self.assertIsNotNone(chunk_manager.get_column(1, 2).cached_at)
+
+        # but not where it hasn't been
+        self.assertIsNone(chunk_manager.get_block(0, 63, 0))
+
+        cache.close()
+
+    def test_unload_saves(self):
+
+        cache = WorldCache(self.directory.name)
+
+        chunk_manager = ChunkManager(cache=cache)
+        chunk_manager.get(0, 0)
+        chunk_manager.set_block(1, 1, 1, DIRT)
+
+        chunk_manager.unload(0, 0)
+
+        self.assertIn((0, 0, 0), cache)
+        self.assertTrue(os.path.exists(os.path.join(self.directory.name, '0', 'r.0.0.dat')))
+
+        chunk_manager.warm(0, 0, 0)
+
+        self.assertEqual(chunk_manager.get_block(1, 1, 1), DIRT)
+
+        cache.close()
+
+    def test_warm_distance(self):
+
+        cache = WorldCache(self.directory.name)
+
+        chunk_manager = ChunkManager(cache=cache)
+
+        for chunk_x in (0, 3):
+            chunk_manager.get(chunk_x, 0)
+            chunk_manager.set_block(chunk_x * 16, 1, 1, DIRT)
+
+        chunk_manager.flush()
+
+        chunk_manager = ChunkManager(cache=cache, unload_distance=2)
+        chunk_manager.set_center(0, 0)
+
+        self.assertEqual(sorted(chunk_manager.columns), [(0, 0)])
+
+        # moving into another chunk picks up the ones that are now close enough
+        chunk_manager.set_center(16, 0)
+
+        self.assertEqual(sorted(chunk_manager.columns), [(0, 0), (3, 0)])
+
+        cache.close()
+
+    def test_eviction_spills(self):
+
+        cache = WorldCache(self.directory.name)
+
+        chunk_manager = ChunkManager(cache=cache, unload_distance=1)
+        chunk_manager.set_center(0, 0)
+
+        chunk_manager.get(3, 0)
+        chunk_manager.set_block(48, 1, 1, DIRT)
+
+        chunk_manager.evict()
+
+        self.assertNotIn((3, 0), chunk_manager.columns)
+        self.assertIn((0, 3, 0), cache)
+
+        cache.close()
+
+    def test_evicted_are_stale(self):
+
+        cache = WorldCache(self.directory.name)
+
+        chunk_manager = ChunkManager(cache=cache, unload_distance=1)
+        chunk_manager.set_center(0, 0)
+
+        chunk_manager.get(3, 0)
+        chunk_manager.set_block(48, 1, 1, DIRT)
+
+        chunk_manager.evict()
+
+        # the server still has the column loaded, but the change is lost
+        location = SimpleNamespace(x=48, y=1, z=1)
+        chunk_manager.on_block_change(SimpleNamespace(packet=SimpleNamespace(
+            fields=SimpleNamespace(location=location, type=STONE))))
+
+        # so the old copy isn't picked up on the way back
+        chunk_manager.set_center(48, 0)
+
+        self.assertNotIn((3, 0), chunk_manager.columns)
+        self.assertIsNone(chunk_manager.get_block(48, 1, 1))
+
+        # until the server sends it again
+        chunk_manager.world.resent(chunk_manager.dimension, 3, 0)
+        chunk_manager.warm(3, 0, 0)
+
+        self.assertEqual(chunk_manager.get_block(48, 1, 1), DIRT)
+
+        # columns the server unloaded itself are up to date
+        chunk_manager.get(5, 0)
+        chunk_manager.unload(5, 0)
+
+        self.assertNotIn((0, 5, 0), chunk_manager.world.stale)
+
+        cache.close()
@@ -0,0 +1,506 @@
+'''
+'''
+
+import functools
+import json
+import struct
+
+from datatypes import DATA_TYPE_REGISTRY, StructDataType
+from nbt.nbt import tag_end
+
+
+# how many Structs for arrays of numbers (one per count and type) are kept
+ARRAY_STRUCT_CACHE_SIZE = 1024
+
+
+class UnsupportedTypeException(RuntimeError):
+    pass
+
+
+@functools.lru_cache(maxsize=ARRAY_STRUCT_CACHE_SIZE)
+def _array_struct(count, code):
+    '''Return the Struct for count numbers of the struct type code.'''
+
+    return struct.Struct('!{}{}'.format(count, code))
+
+
+def _parse_key(key):
+    '''minecraft-data uses strings for all of its mapping/switch keys,
+    these can be decimal, hexadecimal or plain names.'''
+
+    if key == 'true':
+        return True
+
+    if key == 'false':
+        return False
+
+    try:
+        return int(key, 0)
+    except ValueError:
+        pass
+
+    try:
+        return int(key)
+    except ValueError:
+        return key
+
+
+def _substitute(spec, arguments):
+    '''Replace the "$name" placeholders in a parameterized type definition.'''
+
+    if isinstance(spec, str):
+
+        if spec.startswith('$'):
+            return arguments[spec[1:]]
+
+        return spec
+
+    if isinstance(spec, list):
+        return [_substitute(item, arguments) for item in spec]
+
+    if isinstance(spec, dict):
+        return {key: _substitute(value, arguments) for key, value in spec.items()}
+
+    return spec
+
+
+def _resolver(path):
+    '''Return a function that looks up a field referenced by a relative
+    path (i.e. "action" or "../action") within the current scope.'''
+
+    parts = path.split('/')
+    depth = 1
+
+    while parts and parts[0] == '..':
+        depth += 1
+        parts.pop(0)
+
+    if len(parts) == 1:
+
+        key = parts[0]
+
+        def resolve_field(scope):
+            return scope[-depth][key]
+
+        return resolve_field
+
+    def resolve_path(scope):
+
+        value = scope[-depth]
+
+        for part in parts:
+            value = value[part]
+
+        return value
+
+    return resolve_path
+
+
+class TypeCompiler:
+    '''Builds decoders for the minecraft-data (ProtoDef) type grammar.
+
+    Every decoder has the signature:
+
+        decoder(data, offset, fullsize, scope) --> (value, new_offset)
+
+    where scope is the stack of containers being decoded (innermost last),
+    which is what switches and counted arrays use to find the fields they
+    refer to.
+
+    Types that have a codec in DATA_TYPE_REGISTRY always use that codec,
+    everything else is compiled from the "types" section of protocol.json.
+    Named types, and inline ones that are compiled more than once, are
+    compiled once and then shared.
+    '''
+
+    def __init__(self, types):
+
+        self.types = types
+
+        self._cache = {}
+
+        self._builders = {
+            'container': self._container,
+            'switch': self._switch,
+            'option': self._option,
+            'array': self._array,
+            'buffer': self._buffer,
+            'pstring': self._pstring,
+            'bitfield': self._bitfield,
+            'mapper': self._mapper,
+            'entityMetadataLoop': self._entity_metadata_loop,
+        }
+
+        self._natives = {
+            'void': self._void,
+            'nbt': self._nbt,
+            'optionalNbt': self._optional_nbt,
+        }
+
+    def compile(self, spec):
+
+        if isinstance(spec, str):
+
+            decoder = self._cache.get(spec)
+
+            if decoder is None:
+                decoder = self._cache[spec] = self._compile_name(spec)
+
+            return decoder
+
+        if not isinstance(spec, list) or len(spec) != 2:
+            raise UnsupportedTypeException('Malformed type: {!r}'.format(spec))
+
+        # inline types are plain JSON, so the JSON stands in for them as a key
+        key = json.dumps(spec, sort_keys=True)
+
+        decoder = self._cache.get(key)
+
+        if decoder is None:
+            decoder = self._cache[key] = self._compile_inline(spec)
+
+        return decoder
+
+    def _compile_inline(self, spec):
+
+        name, arguments = spec
+
+        builder = self._builders.get(name)
+
+        if builder is not None:
+            return builder(arguments)
+
+        definition = self.types.get(name)
+
+        if isinstance(definition, list):
+            return self.compile(_substitute(definition, arguments))
+
+        raise UnsupportedTypeException('Unknown type "{}".'.format(name))
+
+    def _compile_name(self, name):
+
+        data_type = DATA_TYPE_REGISTRY.get(name)
+
+        if data_type is not None:
+            return self._registered(data_type)
+
+        if name in self._natives:
+            return self._natives[name]()
+
+        definition = self.types.get(name)
+
+        if definition is None or definition == 'native':
+            raise UnsupportedTypeException('Unknown type "{}".'.format(name))
+
+        return self.compile(definition)
+
+    #
+    # native types
+    #
+
+    @staticmethod
+    def _registered(data_type):
+
+        from_wire = data_type.from_wire
+
+        def decode_registered(data, offset, fullsize, scope):
+
+            value, consumed = from_wire(data, offset, fullsize)
+
+            return value, offset + consumed
+
+        return decode_registered
+
+    @staticmethod
+    def _void():
+
+        def decode_void(data, offset, fullsize, scope):
+            return None, offset
+
+        return decode_void
+
+    @staticmethod
+    def _nbt():
+
+        def decode_nbt(data, offset, fullsize, scope):
+
+            end = tag_end(data, offset)
+
+            return bytes(data[offset:end]), end
+
+        return decode_nbt
+
+    @staticmethod
+    def _optional_nbt():
+
+        def decode_optional_nbt(data, offset, fullsize, scope):
+
+            end = tag_end(data, offset)
+
+            if end - offset == 1:
+                return None, end
+
+            return bytes(data[offset:end]), end
+
+        return decode_optional_nbt
+
+    #
+    # compound types
+    #
+
+    def _container(self, fields):
+
+        compiled = tuple(self._container_fields(fields))
+
+        def decode_container(data, offset, fullsize, scope):
+
+            values = {}
+            scope.append(values)
+
+            for name, anon, decoder in compiled:
+
+                value, offset = decoder(data, offset, fullsize, scope)
+
+                if not anon:
+                    values[name] = value
+                elif isinstance(value, dict):
+                    values.update(value)
+
+            scope.pop()
+
+            return values, offset
+
+        return decode_container
+
+    def _container_fields(self, fields):
+
+        compiled = []
+
+        for field in fields:
+
+            spec = field['type']
+
+            # the fields of anonymous containers are merged into ours
+            if field.get('anon') and isinstance(spec, list) and spec[0] == 'container':
+                compiled.extend(self._container_fields(spec[1]))
+            else:
+                compiled.append((field.get('name'), bool(field.get('anon')), self.compile(spec)))
+
+        return compiled
+
+    def _switch(self, arguments):
+
+        if 'compareTo' in arguments:
+            resolve = _resolver(arguments['compareTo'])
+        else:
+            constant = arguments['compareToValue']
+
+            def resolve(scope):
+                return constant
+
+        cases = {}
+
+        for key, spec in arguments['fields'].items():
+
+            decoder = self.compile(spec)
+
+            cases[key] = decoder
+            cases.setdefault(_parse_key(key), decoder)
+
+        default = self.compile(arguments.get('default', 'void'))
+
+        def decode_switch(data, offset, fullsize, scope):
+
+            return cases.get(resolve(scope), default)(data, offset, fullsize, scope)
+
+        return decode_switch
+
+    def _option(self, spec):
+
+        decoder = self.compile(spec)
+
+        def decode_option(data, offset, fullsize, scope):
+
+            if data[offset] == 0:
+                return None, offset + 1
+
+            return decoder(data, offset + 1, fullsize, scope)
+
+        return decode_option
+
+    def _counter(self, arguments):
+        '''Return a decoder for the element count of an array/buffer/string.'''
+
+        if 'countType' in arguments:
+            return self.compile(arguments['countType'])
+
+        count = arguments['count']
+
+        if isinstance(count, int):
+
+            def decode_fixed_count(data, offset, fullsize, scope):
+                return count, offset
+
+            return decode_fixed_count
+
+        resolve = _resolver(count)
+
+        def decode_count_field(data, offset, fullsize, scope):
+            return resolve(scope), offset
+
+        return decode_count_field
+
+    def _array(self, arguments):
+
+        decode_count = self._counter(arguments)
+
+        element_spec = arguments['type']
+        element_type = None
+
+        if isinstance(element_spec, str) and element_spec not in self._natives:
+            element_type = DATA_TYPE_REGISTRY.get(element_spec)
+
+        if element_type is not None and issubclass(element_type, StructDataType):
+
+            # arrays of numbers are unpacked in a single call
+            code = element_type.STRUCT.format.lstrip('!>')
+
+            count = arguments.get('count')
+
+            if 'countType' not in arguments and isinstance(count, int):
+
+                fixed = _array_struct(count, code)
+                unpack_fixed = fixed.unpack_from
+                fixed_size = fixed.size
+
+                def decode_fixed_number_array(data, offset, fullsize, scope):
+                    return list(unpack_fixed(data, offset)), offset + fixed_size
+
+                return decode_fixed_number_array
+
+            def decode_number_array(data, offset, fullsize, scope):
+
+                count, offset = decode_count(data, offset, fullsize, scope)
+
+                array_struct = _array_struct(count, code)
+
+                return list(array_struct.unpack_from(data, offset)), offset + array_struct.size
+
+            return decode_number_array
+
+        decode_element = self.compile(element_spec)
+
+        def decode_array(data, offset, fullsize, scope):
+
+            count, offset = decode_count(data, offset, fullsize, scope)
+
+            values = []
+            append = values.append
+
+            for _ in range(count):
+
+                value, offset = decode_element(data, offset, fullsize, scope)
+                append(value)
+
+            return values, offset
+
+        return decode_array
+
+    def _buffer(self, arguments):
+
+        decode_count = self._counter(arguments)
+
+        def decode_buffer(data, offset, fullsize, scope):
+
+            count, offset = decode_count(data, offset, fullsize, scope)
+
+            return data[offset:offset + count], offset + count
+
+        return decode_buffer
+
+    def _pstring(self, arguments):
+
+        decode_count = self._counter(arguments)
+
+        def decode_pstring(data, offset, fullsize, scope):
+
+            count, offset = decode_count(data, offset, fullsize, scope)
+
+            return str(data[offset:offset + count], 'utf-8'), offset + count
+
+        return decode_pstring
+
+    def _bitfield(self, fields):
+
+        total_bits = sum(field['size'] for field in fields)
+
+        if total_bits % 8:
+            raise UnsupportedTypeException('Bitfield is not byte aligned: {!r}'.format(fields))
+
+        byte_count = total_bits // 8
+
+        # (name, shift, mask, sign bit) for each field, most significant first
+        layout = []
+        shift = total_bits
+
+        for field in fields:
+
+            size = field['size']
+            shift -= size
+
+            sign_bit = (1 << (size - 1)) if field.get('signed') else None
+
+            layout.append((field['name'], shift, (1 << size) - 1, sign_bit))
+
+        layout = tuple(layout)
+
+        def decode_bitfield(data, offset, fullsize, scope):
+
+            value = int.from_bytes(data[offset:offset + byte_count], 'big')
+
+            values = {}
+
+            for name, field_shift, mask, sign_bit in layout:
+
+                field_value = (value >> field_shift) & mask
+
+                if sign_bit is not None and field_value & sign_bit:
+                    field_value -= (sign_bit << 1)
+
+                values[name] = field_value
+
+            return values, offset + byte_count
+
+        return decode_bitfield
+
+    def _mapper(self, arguments):
+
+        decoder = self.compile(arguments['type'])
+
+        mappings = {_parse_key(key): value for key, value in arguments['mappings'].items()}
+
+        def decode_mapper(data, offset, fullsize, scope):
+
+            value, offset = decoder(data, offset, fullsize, scope)
+
+            return mappings.get(value, value), offset
+
+        return decode_mapper
+
+    def _entity_metadata_loop(self, arguments):
+
+        end_value = arguments['endVal']
+        decode_item = self.compile(arguments['type'])
+
+        def decode_entity_metadata_loop(data, offset, fullsize, scope):
+
+            items = []
+
+            while data[offset] != end_value:
+
+                item, offset = decode_item(data, offset, fullsize, scope)
+                items.append(item)
+
+            return items, offset + 1
+
+        return decode_entity_metadata_loop
@@ -0,0 +1,309 @@
+'''
+'''
+
+from array import array
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+
+# columns per side of a region file
+REGION_SIZE = 32
+
+SECTIONS_PER_COLUMN = 16
+
+# a section is 4096 little-endian block states
+BLOCKS_PER_SECTION = 16 * 16 * 16
+PAGE_SIZE = BLOCKS_PER_SECTION * 2
+
+MAGIC = b'MCWC'
+VERSION = 1
+
+# magic, version, pages in use
+_FILE_HEADER = struct.Struct('<4sII4x')
+
+# page (1 based, see below), crc32 of the page, time written
+_ENTRY = struct.Struct('<IId')
+
+# page values with a special meaning
+NOT_STORED = 0
+EMPTY_SECTION = 0xffffffff
+
+# set on the page of a section that has since become empty, so that the
+# page can be reused if it fills up again
+EMPTY_FLAG = 0x80000000
+
+_COLUMN_ENTRIES_SIZE = SECTIONS_PER_COLUMN * _ENTRY.size
+_NOT_STORED_COLUMN = bytes(_COLUMN_ENTRIES_SIZE)
+
+HEADER_SIZE = _FILE_HEADER.size + REGION_SIZE * REGION_SIZE * _COLUMN_ENTRIES_SIZE
+
+# the file is grown this many pages at a time to keep remapping rare
+GROWTH_PAGES = 64
+
+_SWAP_BYTES = sys.byteorder == 'big'
+
+
+class Region:
+    '''A memory-mapped file holding the sections of a 32x32 area of columns.
+
+    The file starts with a header of fixed size entries (one per section)
+    followed by the pages holding the sections that have been stored.
+    Rewriting a section reuses its page.
+    '''
+
+    def __init__(self, path):
+
+        self.path = path
+
+        mode = 'r+b' if os.path.exists(path) else 'w+b'
+
+        self._file = open(path, mode)
+
+        self._file.seek(0, os.SEEK_END)
+
+        if self._file.tell() < HEADER_SIZE:
+            self._reset()
+
+        self._map = mmap.mmap(self._file.fileno(), 0)
+
+        magic, version, self.page_count = _FILE_HEADER.unpack_from(self._map, 0)
+
+        if magic != MAGIC or version != VERSION:
+
+            self._map.close()
+            self._reset()
+            self._map = mmap.mmap(self._file.fileno(), 0)
+
+            self.page_count = 0
+
+        # index (z * REGION_SIZE + x) of the columns that are stored
+        self.stored = {
+            index for index in range(REGION_SIZE * REGION_SIZE)
+            if self._map[self._column_offset(index):self._column_offset(index) + _COLUMN_ENTRIES_SIZE] != _NOT_STORED_COLUMN
+        }
+
+    def _reset(self):
+
+        self._file.truncate(0)
+        self._file.seek(0)
+        self._file.write(_FILE_HEADER.pack(MAGIC, VERSION, 0))
+        self._file.truncate(HEADER_SIZE)
+        self._file.flush()
+
+    def _column_offset(self, index):
+
+        return _FILE_HEADER.size + index * _COLUMN_ENTRIES_SIZE
+
+    def _page_offset(self, page):
+
+        return HEADER_SIZE + (page - 1) * PAGE_SIZE
+
+    def _allocate(self):
+
+        self.page_count += 1
+
+        needed = self._page_offset(self.page_count + 1)
+
+        if len(self._map) < needed:
+
+            # remap rather than mmap.resize(), which isn't available everywhere
+            self._map.flush()
+            self._map.close()
+
+            self._file.truncate(needed + (GROWTH_PAGES - 1) * PAGE_SIZE)
+
+            self._map = mmap.mmap(self._file.fileno(), 0)
+
+        _FILE_HEADER.pack_into(self._map, 0, MAGIC, VERSION, self.page_count)
+
+        return self.page_count
+
+    def read_column(self, local_x, local_z):
+        '''Return (list of 16 arrays of block states or None, time written),
+        or None if the column isn't stored.
+
+        If any section's data doesn't match its checksum the whole column
+        is forgotten (and None returned), so that it's taken from the
+        server again rather than a damaged section being read as air.'''
+
+        index = local_z * REGION_SIZE + local_x
+
+        if index not in self.stored:
+            return None
+
+        offset = self._column_offset(index)
+
+        sections = []
+        written = 0.0
+
+        for section in range(SECTIONS_PER_COLUMN):
+
+            page, crc, timestamp = _ENTRY.unpack_from(self._map, offset + section * _ENTRY.size)
+
+            written = max(written, timestamp)
+
+            if page == NOT_STORED or page & EMPTY_FLAG:
+                sections.append(None)
+                continue
+
+            start = self._page_offset(page)
+            data = self._map[start:start + PAGE_SIZE]
+
+            if zlib.crc32(data) != crc:
+                self._forget(index)
+                return None
+
+            blocks = array('H')
+            blocks.frombytes(data)
+
+            if _SWAP_BYTES:
+                blocks.byteswap()
+
+            sections.append(blocks)
+
+        return sections, written
+
+    def _forget(self, index):
+        '''Mark a column as not stored (its pages aren't reused).'''
+
+        offset = self._column_offset(index)
+
+        self._map[offset:offset + _COLUMN_ENTRIES_SIZE] = _NOT_STORED_COLUMN
+
+        self.stored.discard(index)
+
+    def write_column(self, local_x, local_z, sections, timestamp=None):
+        '''Store a column's sections (arrays of block states, or None for
+        empty sections).  Sections that haven't changed aren't rewritten.'''
+
+        if timestamp is None:
+            timestamp = time.time()
+
+        index = local_z * REGION_SIZE + local_x
+        offset = self._column_offset(index)
+
+        for section, blocks in enumerate(sections):
+
+            entry_offset = offset + section * _ENTRY.size
+
+            page, crc, _ = _ENTRY.unpack_from(self._map, entry_offset)
+
+            if blocks is None:
+
+                if page in (NOT_STORED, EMPTY_SECTION):
+                    page = EMPTY_SECTION
+                else:
+                    page |= EMPTY_FLAG
+
+                _ENTRY.pack_into(self._map, entry_offset, page, crc, timestamp)
+                continue
+
+            if _SWAP_BYTES:
+                blocks = array('H', blocks)
+                blocks.byteswap()
+
+            data = blocks.tobytes()
+            new_crc = zlib.crc32(data)
+
+            if page in (NOT_STORED, EMPTY_SECTION):
+                page = self._allocate()
+            else:
+
+                page &= ~EMPTY_FLAG
+
+                if new_crc == crc:
+                    _ENTRY.pack_into(self._map, entry_offset, page, crc, timestamp)
+                    continue
+
+            start = self._page_offset(page)
+            self._map[start:start + PAGE_SIZE] = data
+
+            _ENTRY.pack_into(self._map, entry_offset, page, new_crc, timestamp)
+
+        self.stored.add(index)
+
+    def flush(self):
+
+        self._map.flush()
+
+    def close(self):
+
+        self._map.flush()
+        self._map.close()
+        self._file.close()
+
+
+class WorldCache:
+    '''Persists the sections of columns to disk, in one Region file per
+    32x32 columns (per dimension), so that a robot can make use of what it
+    saw last time before the server has sent everything again.'''
+
+    def __init__(self, directory):
+
+        self.directory = directory
+
+        # (dimension, region x, region z) --> Region (or None if there isn't
+        # a file for it)
+        self._regions = {}
+
+    def _region(self, dimension, chunk_x, chunk_z, create=False):
+
+        key = (dimension, chunk_x // REGION_SIZE, chunk_z // REGION_SIZE)
+
+        region = self._regions.get(key)
+
+        if region is None and (create or key not in self._regions):
+
+            path = os.path.join(self.directory, str(dimension), 'r.{}.{}.dat'.format(key[1], key[2]))
+
+            if create:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            if create or os.path.exists(path):
+                region = Region(path)
+
+            self._regions[key] = region
+
+        return region
+
+    def __contains__(self, key):
+
+        dimension, chunk_x, chunk_z = key
+
+        region = self._region(dimension, chunk_x, chunk_z)
+
+        return region is not None and (chunk_z % REGION_SIZE) * REGION_SIZE + (chunk_x % REGION_SIZE) in region.stored
+
+    def load_column(self, dimension, chunk_x, chunk_z):
+        '''Return (list of 16 arrays of block states or None, time written)
+        for a column, or None if it isn't in the cache.'''
+
+        region = self._region(dimension, chunk_x, chunk_z)
+
+        if region is None:
+            return None
+
+        return region.read_column(chunk_x % REGION_SIZE, chunk_z % REGION_SIZE)
+
+    def store_column(self, dimension, chunk_x, chunk_z, sections, timestamp=None):
+
+        region = self._region(dimension, chunk_x, chunk_z, create=True)
+
+        region.write_column(chunk_x % REGION_SIZE, chunk_z % REGION_SIZE, sections, timestamp)
+
+    def flush(self):
+
+        for region in self._regions.values():
+            if region is not None:
+                region.flush()
+
+    def close(self):
+
+        for region in self._regions.values():
+            if region is not None:
+                region.close()
+
+        self._regions = {}